@@ -1,5 +1,8 @@
 #region Imports
 #pygame
+import os
+# Keep the pygame banner out of the JSON reports printed to stdout
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
 import pygame
 from pygame import event, surface, display, image, Rect, time, mixer, font
 from pygame.key import ScancodeWrapper
@@ -9,17 +12,44 @@ from pygame.surface import SurfaceType
 # Path
 from os import path
 
+# Asset cache and recordings
+import hashlib
+import json
+import struct
+
+# Background loading
+import threading
+
+# Command line and timing
+import argparse
+import sys
+import tracemalloc
+from time import perf_counter, thread_time, sleep, time as unix_time
+
+# Networked matches
+import socket
+import selectors
+import select
+
+# Warnings raised by SDL
+import warnings
+
 # Typing
-from typing import Union
+from typing import Union, Callable, Iterator
 
 # Class types
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+import bisect
 
 # Math
 import random
 import numpy as np
 import math
+import numbers
+from fractions import Fraction
 #endregion
 
 @dataclass
@@ -34,15 +64,52 @@ class configuration:
     title : str = "Icy Tower Python Remake"
     # Background image
     background_image_path : str = './assets/BackgroundGradient.png'
+    # Restore and present only the changed regions of the window instead of redrawing the full frame
+    dirty_rect_rendering : bool = True
+    # Fraction of the window area above which a dirty frame is redrawn and presented in full
+    dirty_rect_full_redraw_ratio : float = 0.6
+    # Scroll the background in parallax layers with the platforms, False for a static background
+    parallax_background : bool = True
+    # Scroll speed of the sky gradient relative to the platforms, the sky starts at the bottom of the image
+    background_sky_speed : float = 0.05
+    # Width and scroll speed of the tower walls at the window edges
+    background_wall_width : int = 40
+    background_wall_speed : float = 1.0
+    # Width, scroll speed and color multiplier of the farther walls next to them
+    background_inner_wall_width : int = 20
+    background_inner_wall_speed : float = 0.5
+    background_inner_wall_shade : (int, int, int) = (140, 140, 160)
+    # Color behind the transparent parts of the wall tiles
+    background_wall_color : (int, int, int) = (40, 30, 25)
+    # Number of scaled surfaces kept for rendering below the window resolution
+    render_scaled_image_cache_size : int = 256
+    # Largest block of window pixels a render scale is approximated on (e.g. 0.5 scales blocks of 2 pixels to 1)
+    render_scale_max_block : int = 16
+
+
+    # Asset cache
+    # Directory of the converted sprite atlas and background, rebuilt whenever the source assets change
+    asset_cache_directory : str = './asset_cache'
 
     # Audio and music
+    # Play audio, disabled by the benchmarks
+    audio_enabled : bool = True
+    # Mixer sample rate (Hz) and buffer size (samples per channel), a small buffer keeps the effect latency low
+    audio_frequency : int = 44100
+    audio_buffer_size : int = 512
+    # Number of mixer channels in the sound effect pool
+    audio_channel_count : int = 8
+    # Sound effect files as (game event name, path) pairs, effects without a file are synthesized
+    sound_effect_paths : tuple = ()
+    # Sound effect volume
+    sound_effect_volume : float = 0.4
     background_music_path : str = './assets/jump_higher_run_faster.ogg'
 
 
     # Player
 
     # Character sprite sheet
-    character_sprite_sheet: str = r'.\assets\character.png'
+    character_sprite_sheet: str = './assets/character.png'
     # Character sprite sheet offset
     character_sprite_offset: (float, float) = (0, 13)
     # Character sprite sheet size
@@ -59,7 +126,7 @@ class configuration:
     # Platform
 
     # Platform sprite path
-    platform_sprite_path: str = r'.\assets\tile_00.png'
+    platform_sprite_path: str = './assets/tile_00.png'
     # Platform texture size
     platform_texture_size: (float, float) = (64, 64)
     # Platform texture render height (It as assumed to be square so only one dimension is defined)
@@ -74,6 +141,20 @@ class configuration:
     skip_platform_count : int = 4
     # Number of platforms per screen
     number_of_platforms: int = 4
+    # Number of pre-composited platform strips (one per platform width) kept for rendering
+    platform_strip_cache_size : int = 16
+    # Initial number of platform slots in the platform store, grown when exceeded
+    platform_store_capacity : int = 2 * number_of_platforms
+    # Height of a row of the platform collision index
+    collision_cell_height : float = 2 * platform_render_height
+    # Number of platforms the tower generator produces at once
+    tower_chunk_size : int = 16
+    # Maximum number of generated platforms buffered ahead of the camera
+    tower_lookahead : int = 2 * tower_chunk_size
+    # Difficulty profiles of the tower as (first tower level, platform width factors), a tower level spans
+    # level_number_of_platforms platforms and the last profile whose first level is reached applies.
+    # The levels before the first profile use platform_random_factor.
+    difficulty_profiles : tuple = ((5, (0.2, 0.6)), (10, (0.15, 0.5)), (20, (0.1, 0.4)))
 
     # Score  control
     # Score font color
@@ -88,10 +169,680 @@ class configuration:
     font_size : int = 36
     # Score coordinates
     score_coordinates : (float,float) = (0,10)
-    # Score data file path
+    # Legacy high score file, imported into an empty leaderboard
     score_data_file_path : str = r'./score_data.dat'
+    # Leaderboard append-only log, one line per finished game
+    leaderboard_log_path : str = r'./leaderboard.log'
+    # Number of best entries kept in the leaderboard index and after a compaction
+    leaderboard_size : int = 10
+    # Number of log lines that triggers the compaction of the log to the best entries
+    leaderboard_compaction_lines : int = 200
+    # Number of leaderboard entries listed on the game over screen
+    leaderboard_game_over_entries : int = 5
+    # Line height of the leaderboard on the game over screen
+    leaderboard_line_height : int = 30
     # game over screen coordinates
     game_over_coordinates : (float,float) = (30,300)
+    # Number of rendered values kept per HUD text field
+    hud_text_cache_size : int = 32
+    # Rate at which the paused and game over screens wake up without events (Hz)
+    idle_tick_rate : float = 4
+
+    # Input
+    # Time a jump press is kept until the player can jump, so presses shortly before landing are not lost (ms)
+    input_jump_buffer_time : float = 100
+    # Number of input-to-photon latencies the statistics are computed on
+    input_latency_window : int = 600
+    # Interval at which the event queue is polled during the frame wait, each event is timestamped within it (ms)
+    input_poll_interval : float = 2
+
+    # Simulation
+    # Fixed physics update rate, independent of the render rate (Hz)
+    simulation_tick_rate : float = 240
+    # Fixed simulation step (ms)
+    simulation_step_delta : float = 1000 / simulation_tick_rate
+    # Longest frame time fed into the simulation, longer hitches are dropped to bound the number of steps (ms)
+    max_frame_delta : float = 250
+    # Step the simulation on its own thread and render from the snapshots it publishes
+    simulation_thread : bool = False
+
+    # Frame pacing
+    # Waiting strategy: 'sleep' (clock.tick), 'busy_loop' (clock.tick_busy_loop) or 'vsync' (display vsync, sleep if unavailable)
+    frame_pacing : str = 'sleep'
+    # Frame deltas are snapped to whole frame periods, carrying up to this much of the difference to the next frames (ms)
+    frame_delta_snap_tolerance : float = 1.0
+    # A frame longer than this many frame periods missed its deadline
+    frame_missed_deadline_ratio : float = 1.25
+    # Number of recent frames whose median frame time is the snapping period
+    frame_delta_snap_frames : int = 31
+    # Number of frames the pacing statistics are computed on
+    frame_pacing_window : int = 600
+
+    # Capture
+    # Captured frames are written as raw video in a single file ('raw') or as numbered images of this extension ('png', 'bmp', 'tga')
+    capture_format : str = 'raw'
+    # Number of preallocated frame buffers between the game and the writer thread, a frame waits when all of them are full
+    capture_ring_frames : int = 32
+    # Number of recent frames the copy time statistics of the capture are computed on
+    capture_stats_window : int = 600
+
+    # Profiler
+    # Time each stage of the frame
+    profiler_enabled : bool = False
+    # Show the profiler overlay, toggled with F3
+    profiler_overlay : bool = True
+    # Number of frames in the rolling window the percentiles are computed on
+    profiler_window_size : int = 600
+    # Interval between two refreshes of the profiler overlay (ms)
+    profiler_overlay_refresh : float = 500
+    # Per-frame timings are written to this CSV file on exit, empty to disable the export
+    profiler_csv_path : str = './frame_timings.csv'
+    # Profiler overlay font size
+    profiler_font_size : int = 20
+
+    # Benchmark
+    # Frames (or ticks for the headless configuration) of each measured benchmark pass
+    benchmark_frames : int = 2000
+    # Frames run before measuring, to warm up the caches
+    benchmark_warmup_frames : int = 120
+    # Frames of the allocation tracking pass (tracemalloc slows it down, so it is not timed)
+    benchmark_allocation_frames : int = 300
+    # Seed of the first benchmark tower, the next towers after a game over use the following seeds
+    benchmark_seed : int = 1
+    # JSON file the benchmark results are written to, empty to print them
+    benchmark_output_path : str = ''
+
+    # Headless simulation
+    # Fixed delta used for each headless simulation step (ms)
+    headless_delta : float = simulation_step_delta
+    # Maximum number of ticks a single headless session may run (one hour of simulated time)
+    headless_max_ticks : int = int(60 * 60 * simulation_tick_rate)
+    # Number of sessions run by the headless command line mode
+    headless_sessions : int = 100
+
+    # Bot evaluation
+    # Number of worker processes, 0 for one per core
+    evaluation_workers : int = 0
+    # Number of seeds sent to a worker at once, 0 to split the seeds in about 8 batches per worker
+    evaluation_batch_size : int = 0
+
+    # Agent environment
+    # Number of simulation ticks run per environment step with the same action
+    environment_action_repeat : int = 4
+    # Number of nearest platforms in an observation
+    environment_observed_platforms : int = 4
+
+    # Networked head-to-head matches
+    # Address the match server listens on and clients connect to
+    network_host : str = '127.0.0.1'
+    network_port : int = 50007
+    # Delay between the pairing of the players and the start of the match on the server (ms), so stamped input
+    # changes reach the server before their tick
+    network_input_delay : float = 100
+    # Number of snapshots per second sent to each client
+    network_snapshot_rate : float = 20
+    # Remote players are drawn this many snapshot intervals behind the latest snapshot, hiding late packets
+    network_interpolation_snapshots : int = 2
+    # Number of snapshots kept by a client for interpolation
+    network_snapshot_buffer : int = 8
+    # Positions are sent in fixed point with this many steps per pixel
+    network_position_scale : int = 8
+    # Opacity of the rival drawn over the local tower (0-255)
+    network_ghost_alpha : int = 110
+    # Rival score coordinates, below the score panel
+    network_rival_coordinates : (float,float) = (0, platform_render_height + 10)
+    # Duration of the network benchmark match (s)
+    network_benchmark_seconds : float = 5
+
+    # Quality governor
+    # Adapt the quality tier to the measured frame times
+    quality_governor_enabled : bool = True
+    # Quality tiers from the highest, as (internal render scale of the window size, character sprite fps, parallax background),
+    # each measured cheaper than the one above (a 0.75 scale costs more than full resolution with dirty rectangles)
+    quality_tiers : tuple = ((1.0, character_sprite_fps, True), (1.0, character_sprite_fps, False), (0.5, 6, False))
+    # Initial quality tier
+    quality_tier : int = 0
+    # Number of frames measured for each governor decision
+    quality_window_frames : int = 60
+    # The quality is lowered when the 90th percentile frame work time exceeds this fraction of the frame budget
+    quality_downgrade_ratio : float = 0.85
+    # The quality is raised after quality_upgrade_windows windows in a row below this fraction of the frame budget
+    quality_upgrade_ratio : float = 0.4
+    quality_upgrade_windows : int = 5
+
+#region Rendering
+@dataclass
+class RenderItem:
+    """
+    A surface drawn at a position of the window, the key identifies the drawn object between frames
+    """
+    image : surface = None # The surface to draw
+    position : (float, float) = (0, 0) # Top left coordinates in the window
+    key : object = None # Identifies the same object across frames
+
+    @property
+    def rect(self) -> Rect:
+        return self.image.get_rect(topleft=(int(self.position[0]), int(self.position[1])))
+
+class FrameRenderer:
+    """
+    Composes frames from render items drawn in order over a static background.
+    With dirty rectangles enabled only the regions where an item moved, changed its surface, appeared
+    or disappeared are restored from the background, redrawn and presented with display.update.
+    """
+
+    def __init__(self, window : surface, background : surface, dirty_rects : bool = configuration.dirty_rect_rendering):
+        """
+        :param window: the display surface
+        :param background: the background, at least as large as the window
+        :param dirty_rects: False to always redraw and flip the full window
+        """
+        self.window : surface = window
+        self.background : surface = background
+        self.window_rect : Rect = window.get_rect()
+        self.dirty_rects : bool = dirty_rects
+        self._full_redraw_requested : bool = True
+        self._previous_items : dict = {} # key -> (rect, image) of the last presented frame
+
+        # Internal resolution, below 1 frames are drawn to a smaller canvas and scaled to the window.
+        # The scale is the ratio of a block of canvas pixels to a block of window pixels, regions aligned to the
+        # blocks are scaled to the same pixels as the full canvas.
+        self.scale : float = 1
+        self.scale_blocks : (int, int) = (1, 1) # (canvas pixels, window pixels)
+        self.canvas : surface = None
+        self.scaled_background : surface = None
+        self._scaled_images : OrderedDict = OrderedDict() # id of the surface -> (surface, scaled surface)
+
+    def request_full_redraw(self) -> None:
+        self._full_redraw_requested = True
+
+    def set_scale(self, scale : float) -> None:
+        """
+        :param scale: the internal resolution as a fraction of the window size, 1 to draw to the window directly
+        """
+        self.scale = scale
+        self.canvas = None
+        self._scaled_images.clear()
+        if scale != 1:
+            ratio : Fraction = Fraction(scale).limit_denominator(configuration.render_scale_max_block)
+            self.scale_blocks = (ratio.numerator, ratio.denominator)
+            canvas_size : (int, int) = (round(self.window_rect.width * scale), round(self.window_rect.height * scale))
+            self.canvas = surface.Surface(canvas_size).convert()
+            self.scaled_background = surface.Surface(canvas_size).convert()
+        self.set_background(self.background)
+
+    def set_background(self, background : surface) -> None:
+        self.background = background
+        if self.canvas is not None:
+            pygame.transform.scale(self.background.subsurface(self.window_rect), self.canvas.get_size(), self.scaled_background)
+        self.request_full_redraw()
+
+    def get_scaled_image(self, image : surface) -> surface:
+        """
+        :return: the image scaled to the internal resolution, scaled once while it is in use
+        """
+        entry = self._scaled_images.get(id(image))
+        if entry is not None and entry[0] is image:
+            self._scaled_images.move_to_end(id(image))
+            return entry[1]
+        scaled_size : (int, int) = (max(1, round(image.get_width() * self.scale)), max(1, round(image.get_height() * self.scale)))
+        scaled_image : surface = pygame.transform.scale(image, scaled_size)
+        # The entry keeps the image alive, so its id is not reused while cached
+        self._scaled_images[id(image)] = (image, scaled_image)
+        if len(self._scaled_images) > configuration.render_scaled_image_cache_size:
+            self._scaled_images.popitem(last=False)
+        return scaled_image
+
+    def get_scaled_items(self, items : list[RenderItem]) -> list[(surface, Rect)]:
+        """
+        :return: the scaled image of each item and its rectangle on the canvas
+        """
+        scaled_items : list = []
+        for item in items:
+            scaled_image : surface = self.get_scaled_image(item.image)
+            scaled_items.append((scaled_image, scaled_image.get_rect(topleft=(round(item.position[0] * self.scale),
+                                                                              round(item.position[1] * self.scale)))))
+        return scaled_items
+
+    def get_canvas_rect(self, window_rect : Rect) -> Rect:
+        """
+        :return: the canvas rectangle covering a window rectangle
+        """
+        canvas_pixels, window_pixels = self.scale_blocks
+        left, top = window_rect.left * canvas_pixels // window_pixels, window_rect.top * canvas_pixels // window_pixels
+        right = -(-window_rect.right * canvas_pixels // window_pixels)
+        bottom = -(-window_rect.bottom * canvas_pixels // window_pixels)
+        return Rect(left, top, right - left, bottom - top).clip(self.canvas.get_rect())
+
+    def get_block_rect(self, canvas_rect : Rect) -> Rect:
+        """
+        :return: the window rectangle of whole scaling blocks covering a canvas rectangle
+        """
+        canvas_pixels, window_pixels = self.scale_blocks
+        left, top = canvas_rect.left // canvas_pixels * window_pixels, canvas_rect.top // canvas_pixels * window_pixels
+        right = -(-canvas_rect.right // canvas_pixels) * window_pixels
+        bottom = -(-canvas_rect.bottom // canvas_pixels) * window_pixels
+        return Rect(left, top, right - left, bottom - top).clip(self.window_rect)
+
+    def render_scaled(self, scaled_items : list[(surface, Rect)], background_changed : bool) -> None:
+        """
+        Draws the full frame at the internal resolution and scales it to the window
+        """
+        if background_changed:
+            pygame.transform.scale(self.background.subsurface(self.window_rect), self.canvas.get_size(), self.scaled_background)
+        self.canvas.blit(self.scaled_background, (0, 0))
+        for scaled_image, canvas_rect in scaled_items:
+            self.canvas.blit(scaled_image, canvas_rect)
+        pygame.transform.scale(self.canvas, self.window_rect.size, self.window)
+        display.flip()
+
+    def render_scaled_dirty(self, scaled_items : list[(surface, Rect)], block_rects : list[Rect], background_changed : bool) -> None:
+        """
+        Redraws the dirty regions on the canvas and scales only them to the window
+        :param block_rects: the dirty window regions, aligned to the scaling blocks
+        :param background_changed: the background changed in the dirty regions, they are scaled again
+        """
+        for block_rect in block_rects:
+            canvas_rect : Rect = self.get_canvas_rect(block_rect)
+            if background_changed:
+                pygame.transform.scale(self.background.subsurface(block_rect), canvas_rect.size,
+                                       self.scaled_background.subsurface(canvas_rect))
+            self.canvas.set_clip(canvas_rect)
+            self.canvas.blit(self.scaled_background, canvas_rect, canvas_rect)
+            for scaled_image, item_rect in scaled_items:
+                if canvas_rect.colliderect(item_rect):
+                    self.canvas.blit(scaled_image, item_rect)
+            pygame.transform.scale(self.canvas.subsurface(canvas_rect), block_rect.size, self.window.subsurface(block_rect))
+        self.canvas.set_clip(None)
+        display.update(block_rects)
+
+    def present_scaled(self, items : list[RenderItem], background_dirty : list[Rect]) -> dict:
+        """
+        Presents the frame at the internal resolution. The items are compared by their rectangles on the canvas,
+        their positions are rounded at the internal resolution. A dirty region is redrawn in whole scaling blocks,
+        scaled on its own to the same pixels as the full canvas.
+        :return: the rectangle and image of each item on the canvas by key
+        """
+        scaled_items : list = self.get_scaled_items(items)
+        current_items : dict = {item.key : (canvas_rect, item.image) for item, (_, canvas_rect) in zip(items, scaled_items)}
+        if not self.dirty_rects or self._full_redraw_requested:
+            self.render_scaled(scaled_items, bool(background_dirty))
+            return current_items
+
+        dirty : list[Rect] = [self.get_block_rect(rect) for rect in self._find_dirty_rects(current_items, self.canvas.get_rect())]
+        if background_dirty:
+            dirty.extend(self.get_block_rect(self.get_canvas_rect(rect.clip(self.window_rect))) for rect in background_dirty)
+        dirty = self._merge_rects(dirty)
+        dirty_area : int = sum(rect.width * rect.height for rect in dirty)
+        if dirty_area > configuration.dirty_rect_full_redraw_ratio * self.window_rect.width * self.window_rect.height:
+            self.render_scaled(scaled_items, bool(background_dirty))
+        elif dirty:
+            self.render_scaled_dirty(scaled_items, dirty, bool(background_dirty))
+        return current_items
+
+    def _find_dirty_rects(self, current_items : dict, bounds : Rect = None) -> list[Rect]:
+        """
+        :param bounds: the drawn area the rectangles are clipped to, the window if None
+        """
+        bounds = self.window_rect if bounds is None else bounds
+        dirty : list[Rect] = []
+        for key, (rect, image) in current_items.items():
+            previous = self._previous_items.get(key)
+            if previous is None:
+                dirty.append(rect)
+            elif previous[0] != rect or previous[1] is not image:
+                dirty.append(previous[0])
+                dirty.append(rect)
+        for key, (rect, image) in self._previous_items.items():
+            if key not in current_items:
+                dirty.append(rect)
+        return self._merge_rects([rect.clip(bounds) for rect in dirty if rect.colliderect(bounds)])
+
+    @staticmethod
+    def _merge_rects(rects : list[Rect]) -> list[Rect]:
+        """
+        Merges overlapping rectangles so no region is restored twice
+        """
+        merged : list[Rect] = []
+        for rect in rects:
+            rect = Rect(rect)
+            index : int = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def render_full(self, items : list[RenderItem]) -> None:
+        self.window.blit(self.background, (0, 0))
+        for item in items:
+            self.window.blit(item.image, item.rect)
+        display.flip()
+
+    def render_dirty(self, items : list[RenderItem], dirty : list[Rect]) -> None:
+        for rect in dirty:
+            self.window.set_clip(rect)
+            self.window.blit(self.background, rect, rect)
+            for item in items:
+                item_rect : Rect = item.rect
+                if rect.colliderect(item_rect):
+                    self.window.blit(item.image, item_rect)
+        self.window.set_clip(None)
+        display.update(dirty)
+
+    def present(self, items : list[RenderItem], background_dirty : list[Rect] = None) -> None:
+        """
+        Draws the items over the background and presents the frame
+        :param items: the render items of the frame in drawing order
+        :param background_dirty: the regions of the background that changed since the last frame
+        :return: None
+        """
+        if self.canvas is not None:
+            current_items : dict = self.present_scaled(items, background_dirty)
+        else:
+            current_items : dict = {item.key : (item.rect, item.image) for item in items}
+            if not self.dirty_rects or self._full_redraw_requested:
+                self.render_full(items)
+            else:
+                dirty : list[Rect] = self._find_dirty_rects(current_items)
+                if background_dirty:
+                    dirty = self._merge_rects(dirty + [rect.clip(self.window_rect) for rect in background_dirty])
+                dirty_area : int = sum(rect.width * rect.height for rect in dirty)
+                if dirty_area > configuration.dirty_rect_full_redraw_ratio * self.window_rect.width * self.window_rect.height:
+                    self.render_full(items)
+                elif dirty:
+                    self.render_dirty(items, dirty)
+
+        self._full_redraw_requested = False
+        self._previous_items = current_items
+#endregion
+
+#region Assets
+class AssetCache:
+    """
+    Converted surfaces persisted as raw pixels, keyed by a hash of their source files and build settings
+    """
+
+    def __init__(self, directory : str = configuration.asset_cache_directory):
+        self.directory : str = directory
+
+    @staticmethod
+    def make_key(source_paths : list[str], settings : object) -> str:
+        """
+        :param source_paths: the files the cached surface is built from
+        :param settings: any settings the build depends on, compared through repr
+        :return: the cache key
+        """
+        digest = hashlib.sha1()
+        for source_path in source_paths:
+            with open(source_path, 'rb') as source_file:
+                digest.update(source_file.read())
+        digest.update(repr(settings).encode())
+        return digest.hexdigest()[:16]
+
+    def _get_paths(self, name : str, key : str) -> (str, str):
+        base_path : str = path.join(self.directory, f'{name}-{key}')
+        return base_path + '.json', base_path + '.bin'
+
+    def load(self, name : str, key : str) -> (surface, dict):
+        """
+        :return: the cached surface (not yet converted) and its metadata, None if there is no valid cache entry
+        """
+        metadata_path, pixels_path = self._get_paths(name, key)
+        try:
+            with open(metadata_path, 'r') as metadata_file:
+                metadata : dict = json.load(metadata_file)
+            with open(pixels_path, 'rb') as pixels_file:
+                pixels : bytes = pixels_file.read()
+            cached_surface : surface = image.frombytes(pixels, tuple(metadata['size']), metadata['format'])
+        except (OSError, ValueError, KeyError):
+            return None
+        return cached_surface, metadata
+
+    def save(self, name : str, key : str, cached_surface : surface, metadata : dict = None) -> None:
+        """
+        Stores the surface and removes the entries of the same name with other keys.
+        The metadata file is written last, so an interrupted save is never loaded.
+        """
+        metadata_path, pixels_path = self._get_paths(name, key)
+        pixel_format : str = 'RGBA' if cached_surface.get_flags() & pygame.SRCALPHA else 'RGB'
+        metadata = dict(metadata or {}, size=list(cached_surface.get_size()), format=pixel_format)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for file_name in os.listdir(self.directory):
+                if file_name.startswith(f'{name}-') and not file_name.startswith(f'{name}-{key}.'):
+                    os.remove(path.join(self.directory, file_name))
+            with open(pixels_path, 'wb') as pixels_file:
+                pixels_file.write(image.tobytes(cached_surface, pixel_format))
+            with open(metadata_path + '.tmp', 'w') as metadata_file:
+                json.dump(metadata, metadata_file)
+            os.replace(metadata_path + '.tmp', metadata_path)
+        except OSError:
+            # The cache is an optimization only, the assets are rebuilt on the next run
+            pass
+
+class SpriteAtlas:
+    """
+    All sprites packed in one surface in display format. The sprites are subsurfaces of the atlas.
+    """
+
+    # Name of the platform tile in the atlas
+    platform_tile : str = 'platform_tile'
+
+    def __init__(self, atlas_surface : surface, layout : dict):
+        """
+        :param atlas_surface: the converted atlas surface
+        :param layout: sprite name -> list of (x, y, width, height) rectangles in the atlas
+        """
+        self.surface : surface = atlas_surface
+        self.layout : dict = layout
+        self._frames : dict = {name : [atlas_surface.subsurface(Rect(rectangle)) for rectangle in rectangles]
+                               for name, rectangles in layout.items()}
+
+    def get_frames(self, name : str) -> list[surface]:
+        return self._frames[name]
+
+    @staticmethod
+    def pack(sprites : dict) -> 'SpriteAtlas':
+        """
+        Packs each list of sprites in its own row of a new atlas
+        :param sprites: sprite name -> list of surfaces
+        :return: the atlas converted to the display format
+        """
+        atlas_width : int = max(sum(sprite.get_width() for sprite in frames) for frames in sprites.values())
+        atlas_height : int = sum(max(sprite.get_height() for sprite in frames) for frames in sprites.values())
+        atlas_surface : surface = surface.Surface((atlas_width, atlas_height), pygame.SRCALPHA)
+        atlas_surface.fill((0, 0, 0, 0))
+
+        layout : dict = {}
+        y_coord : int = 0
+        for name, frames in sprites.items():
+            x_coord : int = 0
+            layout[name] = []
+            for sprite in frames:
+                atlas_surface.blit(sprite, (x_coord, y_coord))
+                layout[name].append((x_coord, y_coord, sprite.get_width(), sprite.get_height()))
+                x_coord += sprite.get_width()
+            y_coord += max(sprite.get_height() for sprite in frames)
+
+        return SpriteAtlas(atlas_surface.convert_alpha(), layout)
+
+def load_sprite_atlas(cache : AssetCache = None) -> SpriteAtlas:
+    """
+    Loads the character animations (including the flipped ones) and the scaled platform tile as one atlas,
+    from the asset cache if the source assets did not change. Requires the display mode to be set.
+    :param cache: the asset cache, the default cache directory if None
+    :return: the sprite atlas
+    """
+    cache = cache if cache is not None else AssetCache()
+    key : str = AssetCache.make_key([configuration.character_sprite_sheet, configuration.platform_sprite_path],
+                                    (PlayerAnimations.animations_key_in_sprite_sheet,
+                                     configuration.character_sprite_offset,
+                                     configuration.character_sprite_sheet_size,
+                                     configuration.platform_render_height))
+    cached = cache.load('sprite_atlas', key)
+    if cached is not None:
+        atlas_surface, metadata = cached
+        return SpriteAtlas(atlas_surface.convert_alpha(), metadata['layout'])
+
+    # Extract the frames from the sprite sheet and scale the tile
+    sprites : dict = PlayerAnimations(load_frames=False).extract_animations()
+    tile_size : int = int(configuration.platform_render_height)
+    platform_texture : surface = image.load(configuration.platform_sprite_path).convert_alpha()
+    sprites[SpriteAtlas.platform_tile] = [pygame.transform.scale(platform_texture, (tile_size, tile_size))]
+
+    atlas : SpriteAtlas = SpriteAtlas.pack(sprites)
+    cache.save('sprite_atlas', key, atlas.surface, {'layout' : atlas.layout})
+    return atlas
+
+def load_background_image(window_size : (float, float), cache : AssetCache = None) -> surface:
+    """
+    Loads the background columns visible in the window, over the full image height, in display format,
+    from the asset cache if the image did not change
+    :param window_size: the size of the window the background is drawn on
+    :param cache: the asset cache, the default cache directory if None
+    :return: the background surface
+    """
+    cache = cache if cache is not None else AssetCache()
+    key : str = AssetCache.make_key([configuration.background_image_path], ('columns', tuple(window_size)))
+    cached = cache.load('background', key)
+    if cached is not None:
+        return cached[0].convert()
+
+    background_image : surface = image.load(configuration.background_image_path)
+    visible_rect : Rect = Rect(0, 0, window_size[0], background_image.get_height()).clip(background_image.get_rect())
+    background_image = background_image.subsurface(visible_rect).convert()
+    cache.save('background', key, background_image)
+    return background_image
+#endregion
+
+#region Background
+class BackgroundLayer:
+    """
+    A vertical band of the background scrolled at a fraction of the platform scroll.
+    The source is repeated vertically, or clamped to its height when not repeating.
+    """
+
+    def __init__(self, source : surface, x_coord : int, speed : float, repeat : bool = True, start : int = 0):
+        """
+        :param source: the band content in display format, as wide as the band
+        :param x_coord: the left x-coordinate of the band in the window
+        :param speed: the scroll speed relative to the platforms
+        :param repeat: repeat the source vertically, its height must be a multiple of its pattern height
+        :param start: the source row shown at the top of the window before any scroll
+        """
+        self.source : surface = source
+        self.x_coord : int = x_coord
+        self.speed : float = speed
+        self.repeat : bool = repeat
+        self.start : int = start
+        self.width : int = source.get_width()
+        self.period : int = source.get_height()
+        self.view_top : int = None # Source row shown at the top of the window, None before the first draw
+
+    def get_view_top(self, scroll_offset : float, window_height : int) -> int:
+        # Climbing moves the view up the source, so its content moves down the window
+        view_top : int = self.start - int(scroll_offset * self.speed)
+        if self.repeat:
+            return view_top % self.period
+        return min(max(view_top, 0), self.period - window_height)
+
+    def draw_rows(self, target : surface, view_top : int, top : int, bottom : int) -> None:
+        """
+        Draws the window rows [top, bottom) of the band from the source
+        """
+        y_coord : int = top
+        while y_coord < bottom:
+            source_y_coord : int = (view_top + y_coord) % self.period if self.repeat else view_top + y_coord
+            height : int = min(bottom - y_coord, self.period - source_y_coord)
+            target.blit(self.source, (self.x_coord, y_coord), Rect(0, source_y_coord, self.width, height))
+            y_coord += height
+
+class ParallaxBackground:
+    """
+    Background of vertical bands scrolling at different fractions of the platform scroll, composed in one surface.
+    When a band moves, its pixels are moved with Surface.scroll and only the exposed rows are drawn from the layer,
+    so the background is never recomposed over the full window.
+    """
+
+    def __init__(self, window_size : (int, int), layers : list[BackgroundLayer]):
+        self.surface : surface = surface.Surface(window_size).convert()
+        self.window_height : int = window_size[1]
+        self.layers : list[BackgroundLayer] = layers
+        self.update(0)
+
+    def update(self, scroll_offset : float) -> list[Rect]:
+        """
+        :param scroll_offset: the accumulated platform scroll
+        :return: the bands that changed
+        """
+        changed : list[Rect] = []
+        for layer in self.layers:
+            view_top : int = layer.get_view_top(scroll_offset, self.window_height)
+            if view_top == layer.view_top:
+                continue
+
+            band : Rect = Rect(layer.x_coord, 0, layer.width, self.window_height)
+            shift : int = self.window_height
+            if layer.view_top is not None:
+                shift = layer.view_top - view_top
+                if layer.repeat:
+                    # Take the short way around the repeated source
+                    shift = (shift + layer.period // 2) % layer.period - layer.period // 2
+            if abs(shift) >= self.window_height:
+                layer.draw_rows(self.surface, view_top, 0, self.window_height)
+            else:
+                self.surface.set_clip(band)
+                self.surface.scroll(0, shift)
+                self.surface.set_clip(None)
+                if shift > 0:
+                    layer.draw_rows(self.surface, view_top, 0, shift)
+                else:
+                    layer.draw_rows(self.surface, view_top, self.window_height + shift, self.window_height)
+            layer.view_top = view_top
+            changed.append(band)
+        return changed
+
+def build_wall_source(tile : surface, width : int, height : int, shade : (int, int, int) = None) -> surface:
+    """
+    :param tile: the wall tile, repeated down the band
+    :param width: the band width, the tile is cropped to it
+    :param height: the minimum height, rounded up to a multiple of the tile height so the source repeats seamlessly
+    :param shade: color multiplied into the wall, None to keep the tile colors
+    :return: the opaque wall source in display format
+    """
+    tile_height : int = tile.get_height()
+    wall : surface = surface.Surface((width, math.ceil(height / tile_height) * tile_height)).convert()
+    wall.fill(configuration.background_wall_color)
+    for y_coord in range(0, wall.get_height(), tile_height):
+        wall.blit(tile, (0, y_coord))
+    if shade is not None:
+        wall.fill(shade, special_flags=pygame.BLEND_MULT)
+    return wall
+
+def build_parallax_background(window_size : (int, int), sky : surface, atlas : SpriteAtlas) -> ParallaxBackground:
+    """
+    Lays out the outer walls, the farther inner walls and the sky between them
+    :param sky: the background image as returned by load_background_image
+    :param atlas: the sprite atlas holding the wall tile
+    """
+    width, height = window_size
+    tile : surface = atlas.get_frames(SpriteAtlas.platform_tile)[0]
+    wall_width : int = configuration.background_wall_width
+    inner_width : int = configuration.background_inner_wall_width
+    wall : surface = build_wall_source(tile, wall_width, height)
+    inner_wall : surface = build_wall_source(tile, inner_width, height, configuration.background_inner_wall_shade)
+
+    sky_rect : Rect = Rect(wall_width + inner_width, 0, width - 2 * (wall_width + inner_width), sky.get_height())
+    layers : list[BackgroundLayer] = [
+        BackgroundLayer(sky.subsurface(sky_rect), sky_rect.x, configuration.background_sky_speed,
+                        repeat=False, start=sky.get_height() - height),
+        BackgroundLayer(inner_wall, wall_width, configuration.background_inner_wall_speed),
+        BackgroundLayer(inner_wall, width - wall_width - inner_width, configuration.background_inner_wall_speed),
+        BackgroundLayer(wall, 0, configuration.background_wall_speed),
+        BackgroundLayer(wall, width - wall_width, configuration.background_wall_speed)]
+    return ParallaxBackground(window_size, layers)
+#endregion
 
 #region Platform
 @dataclass
@@ -158,72 +909,411 @@ class Platform:
         """
         self._bottom = self.y_coord + self.height
         return self._bottom
+class PlatformStripCache:
+    """
+    Platform strips pre-composited from the tile texture, keyed by platform width.
+    The least recently used strip is evicted once the cache is full.
+    """
+
+    def __init__(self, tile : surface, tile_size : float, max_size : int = configuration.platform_strip_cache_size):
+        """
+        :param tile: the tile texture, already scaled to the tile size
+        :param tile_size: the size of a square tile
+        :param max_size: the maximum number of strips kept
+        """
+        self.tile : surface = tile
+        self.tile_size : int = int(tile_size)
+        self.max_size : int = max_size
+        self._strips : OrderedDict = OrderedDict() # width -> strip surface
+
+    def _build_strip(self, width : int) -> surface:
+        strip : surface = surface.Surface((width, self.tile_size), pygame.SRCALPHA).convert_alpha()
+        for x_coord in range(0, width, self.tile_size):
+            strip.blit(self.tile, (x_coord, 0))
+        return strip
+
+    def get_strip(self, width : float) -> surface:
+        """
+        :param width: the platform width
+        :return: the strip surface covering the width with whole tiles
+        """
+        # Whole tiles are drawn, the last one may overflow the platform width
+        strip_width : int = math.ceil(width / self.tile_size) * self.tile_size
+        strip : surface = self._strips.get(strip_width)
+        if strip is None:
+            strip = self._build_strip(strip_width)
+            self._strips[strip_width] = strip
+            if len(self._strips) > self.max_size:
+                self._strips.popitem(last=False)
+        else:
+            self._strips.move_to_end(strip_width)
+        return strip
+
+    def clear(self) -> None:
+        self._strips.clear()
+
+class PlatformSpatialIndex:
+    """
+    Broad-phase index of platform slots bucketed in rows of the tower.
+
+    Platforms are indexed by their tower y-coordinate (screen y-coordinate minus the accumulated scroll),
+    which does not change while the platforms scroll, so a platform is only touched when it is added or removed.
+    """
+
+    def __init__(self, cell_height : float = configuration.collision_cell_height):
+        self.cell_height : float = cell_height
+        self._rows : dict = {} # row -> {slot : (serial, slot)}
+        self._slot_rows : dict = {} # slot -> rows covered by the platform in the slot
+
+    def _row_range(self, top : float, bottom : float) -> range:
+        return range(math.floor(top / self.cell_height), math.floor(bottom / self.cell_height) + 1)
+
+    def insert(self, slot : int, serial : int, tower_top : float, tower_bottom : float) -> None:
+        """
+        :param slot: the platform slot in the platform store
+        :param serial: the creation number of the platform, used to order query results
+        :param tower_top: the top y-coordinate of the platform in tower coordinates
+        :param tower_bottom: the bottom y-coordinate of the platform in tower coordinates
+        """
+        rows : range = self._row_range(tower_top, tower_bottom)
+        entry : (int, int) = (serial, slot)
+        for row in rows:
+            self._rows.setdefault(row, {})[slot] = entry
+        self._slot_rows[slot] = rows
+
+    def remove(self, slot : int) -> None:
+        for row in self._slot_rows.pop(slot, ()):
+            bucket : dict = self._rows[row]
+            del bucket[slot]
+            if not bucket:
+                del self._rows[row]
+
+    def query(self, top : float, bottom : float) -> list[int]:
+        """
+        :param top: top of the queried span in tower coordinates
+        :param bottom: bottom of the queried span in tower coordinates
+        :return: the slots of the platforms in the rows covering the span, in creation order
+        """
+        candidates : dict = {}
+        for row in self._row_range(top, bottom):
+            bucket : dict = self._rows.get(row)
+            if bucket:
+                candidates.update(bucket)
+        return [slot for _, slot in sorted(candidates.values())]
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._slot_rows.clear()
+
+class PlatformStore:
+    """
+    Struct-of-arrays storage of the platforms, one slot per platform in each array.
+    Slots of culled platforms are queued in a ring of free slots and recycled for new platforms.
+    """
+
+    def __init__(self, capacity : int = configuration.platform_store_capacity):
+        self.x_coord : np.ndarray = np.zeros(capacity) # Left x-coordinate of each platform
+        self.y_coord : np.ndarray = np.zeros(capacity) # Top y-coordinate of each platform
+        self.width : np.ndarray = np.zeros(capacity) # Width of each platform
+        self.visited : np.ndarray = np.zeros(capacity, dtype=bool) # Used for score calculation
+        self.active : np.ndarray = np.zeros(capacity, dtype=bool) # True for the slots holding a platform
+        self.serial : np.ndarray = np.zeros(capacity, dtype=np.int64) # Creation number of each platform
+        self._free_slots : deque = deque(range(capacity))
+        self._next_serial : int = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.active)
+
+    @property
+    def count(self) -> int:
+        return self.capacity - len(self._free_slots)
+
+    def _grow(self, capacity : int) -> None:
+        old_capacity : int = self.capacity
+        for name in ('x_coord', 'y_coord', 'width', 'visited', 'active', 'serial'):
+            array : np.ndarray = getattr(self, name)
+            grown : np.ndarray = np.zeros(capacity, dtype=array.dtype)
+            grown[:old_capacity] = array
+            setattr(self, name, grown)
+        self._free_slots.extend(range(old_capacity, capacity))
+
+    def allocate(self, x_coords : np.ndarray, y_coords : np.ndarray, widths : np.ndarray) -> np.ndarray:
+        """
+        Stores new platforms in free slots, growing the arrays if needed
+        :return: the slots of the new platforms
+        """
+        count : int = len(x_coords)
+        if count > len(self._free_slots):
+            self._grow(max(2 * self.capacity, self.count + count))
+        slots : np.ndarray = np.array([self._free_slots.popleft() for _ in range(count)], dtype=np.intp)
+        self.x_coord[slots] = x_coords
+        self.y_coord[slots] = y_coords
+        self.width[slots] = widths
+        self.visited[slots] = False
+        self.active[slots] = True
+        self.serial[slots] = np.arange(self._next_serial, self._next_serial + count)
+        self._next_serial += count
+        return slots
+
+    def release(self, slots : np.ndarray) -> None:
+        self.active[slots] = False
+        self._free_slots.extend(slots.tolist())
+
+    def active_slots(self) -> np.ndarray:
+        """
+        :return: the slots holding a platform, in creation order
+        """
+        slots : np.ndarray = np.flatnonzero(self.active)
+        return slots[np.argsort(self.serial[slots])]
+
+def get_difficulty_profiles() -> tuple:
+    """
+    :return: the difficulty profiles of the configuration, starting with platform_random_factor at level 1
+    """
+    return ((1, tuple(configuration.platform_random_factor)),) + tuple(configuration.difficulty_profiles)
+
+class TowerGenerator:
+    """
+    Seeded procedural tower, generated in chunks of platforms and consumed in order.
+    Every other platform is placed on a side of the window, alternating between left and right, the others are centered.
+    The platform widths follow the difficulty profile of the tower level the platform belongs to.
+
+    Chunks are generated into a bounded lookahead buffer with prefetch, so the generation cost can be spread over
+    frames instead of landing on the frame a platform is needed. The tower only depends on the seed.
+    """
+
+    def __init__(self, seed : int = None, window_width : float = configuration.window_size[0],
+                 tile_size : float = configuration.platform_render_height, chunk_size : int = None,
+                 lookahead : int = None, profiles : tuple = None):
+        """
+        The settings left to None are read from the configuration when the tower is created, so configuration
+        overrides apply to the next tower.
+        :param seed: seed of the tower, None for a random tower
+        :param window_width: width of the window the platforms are placed in
+        :param tile_size: platform widths are rounded up to a multiple of the tile size
+        :param chunk_size: number of platforms generated at once, configuration.tower_chunk_size if None
+        :param lookahead: maximum number of buffered platforms, at least one chunk, configuration.tower_lookahead if None
+        :param profiles: the difficulty profiles as (first tower level, (min, max) width factor), by ascending level,
+                         platform_random_factor from level 1 followed by configuration.difficulty_profiles if None
+        """
+        self.seed : int = seed
+        self.random : random.Random = random.Random(seed)
+        self.window_width : float = window_width
+        self.tile_size : float = tile_size
+        self.chunk_size : int = configuration.tower_chunk_size if chunk_size is None else chunk_size
+        self.lookahead : int = max(configuration.tower_lookahead if lookahead is None else lookahead, self.chunk_size)
+        self.profiles : tuple = get_difficulty_profiles() if profiles is None else profiles
+
+        # Layout state carried from chunk to chunk
+        self.side_left : bool = self.random.choice([True,False])
+        self.side : bool = self.random.choice([True,False])
+        self.generated_count : int = 0
+
+        # Generated and not yet consumed platforms as (x-coordinate, width)
+        self._buffer : deque = deque()
+        self._chunks : Iterator[tuple] = self.generate_chunks()
+
+    def get_width_factors(self, tower_level : int) -> (float, float):
+        """
+        :return: the (min, max) platform width factor of the tower level
+        """
+        width_factors : (float, float) = self.profiles[0][1]
+        for first_level, level_width_factors in self.profiles:
+            if tower_level < first_level:
+                break
+            width_factors = level_width_factors
+        return width_factors
+
+    def generate_chunks(self) -> Iterator[tuple]:
+        """
+        Generates the tower chunk by chunk, without end
+        :return: an iterator over the (x-coordinates, widths) arrays of each chunk
+        """
+        while True:
+            count : int = self.chunk_size
+            tower_levels : list = [1 + index // configuration.level_number_of_platforms
+                                   for index in range(self.generated_count, self.generated_count + count)]
+            random_factors : np.ndarray = np.array([self.random.uniform(*self.get_width_factors(tower_level))
+                                                    for tower_level in tower_levels])
+            widths : np.ndarray = np.ceil(random_factors * self.window_width / self.tile_size) * self.tile_size
+
+            on_side : np.ndarray = (np.arange(count) % 2 == 0) == self.side
+            previous_side_platforms : np.ndarray = np.cumsum(on_side) - on_side
+            on_left : np.ndarray = (previous_side_platforms % 2 == 0) == self.side_left
+            x_coords : np.ndarray = np.where(on_side,
+                                             np.where(on_left, 0, self.window_width - widths),
+                                             self.window_width / 2 - widths / 2)
+            self.side = self.side != bool(count % 2)
+            self.side_left = self.side_left != bool(np.count_nonzero(on_side) % 2)
+            self.generated_count += count
+            yield x_coords, widths
+
+    def prefetch(self) -> bool:
+        """
+        Generates one chunk into the buffer if it has room for it
+        :return: True if a chunk was generated
+        """
+        if len(self._buffer) + self.chunk_size > self.lookahead:
+            return False
+        x_coords, widths = next(self._chunks)
+        self._buffer.extend(zip(x_coords.tolist(), widths.tolist()))
+        return True
+
+    def take(self, count : int) -> (np.ndarray, np.ndarray):
+        """
+        Consumes the next platforms of the tower, chunks missing in the buffer are generated immediately
+        :return: the x-coordinates and widths of the platforms
+        """
+        while len(self._buffer) < count:
+            x_coords, widths = next(self._chunks)
+            self._buffer.extend(zip(x_coords.tolist(), widths.tolist()))
+        platforms : list = [self._buffer.popleft() for _ in range(count)]
+        return np.array([x_coord for x_coord, _ in platforms], dtype=float), np.array([width for _, width in platforms], dtype=float)
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+        :return: an iterator consuming the tower platform by platform as (x-coordinate, width)
+        """
+        while True:
+            x_coords, widths = self.take(1)
+            yield float(x_coords[0]), float(widths[0])
+
+    @property
+    def buffered_count(self) -> int:
+        return len(self._buffer)
+
 class PlatformManager:
 
-    def __init__(self, window : surface):
-        # Platform list
-        self.platforms : list[Platform] = list()
+    def __init__(self, window : surface = None, atlas : SpriteAtlas = None, seed : int = None):
+        """
+        :param window: the surface platforms are rendered on, None to run headless (no textures are loaded)
+        :param atlas: the sprite atlas holding the platform tile, loaded if None and not headless
+        :param seed: seed of the procedural generation, None for a random tower
+        """
+        # Platform storage
+        self.store : PlatformStore = PlatformStore()
 
         # Window and screen variables
         self.window : window = window
-        self.window_size : (float,float) = self.window.get_size()
+        self.headless : bool = window is None
+        self.window_size : (float,float) = configuration.window_size if self.headless else self.window.get_size()
 
         # Platform geometries
-        self.max_platform_width : float = configuration.platform_random_factor[1] * self.window_size[0]
-        self.min_platform_width : float = configuration.platform_random_factor[0] * self.window_size[0]
         self.platform_height : float = configuration.platform_render_height
 
         # Procedural generation settings
-        self.side_left : bool = random.choice([True,False])
-        self.side : bool = random.choice([True,False])
+        self.seed : int = seed
+        self.tower : TowerGenerator = TowerGenerator(seed, self.window_size[0], self.platform_height)
         self.skip_platform_count : int = configuration.skip_platform_count
         self.platform_speed : float = configuration.platform_speed
 
-        # Load platform texture
-        self.platform_texture : surface = image.load(configuration.platform_sprite_path)
+        # Collision broad-phase, the scroll offset maps screen to tower y-coordinates
+        self.scroll_offset : float = 0
+        self.spatial_index : PlatformSpatialIndex = PlatformSpatialIndex()
+
+        # Lowest platform top y-coordinate, culling only runs once it leaves the screen
+        self._lowest_y_coord : float = -math.inf
+
+        # Platform texture, already scaled to the tile size in the sprite atlas, and the composited platform strips
+        self.platform_texture : surface = None
         self.platform_texture_size : (float, float) = configuration.platform_texture_size
+        self.strip_cache : PlatformStripCache = None
+        if not self.headless:
+            atlas = atlas if atlas is not None else load_sprite_atlas()
+            self.platform_texture = atlas.get_frames(SpriteAtlas.platform_tile)[0]
+            self.strip_cache = PlatformStripCache(self.platform_texture, self.platform_height)
 
         # Initialize the first set platforms
         self.update_and_return_platforms()
 
+    def add_platforms(self, y_coords : np.ndarray) -> np.ndarray:
+        """
+        Adds the next platforms of the tower, one per y-coordinate
+        :param y_coords: the top y-coordinates of the new platforms
+        :return: the slots of the new platforms
+        """
+        x_coords, widths = self.tower.take(len(y_coords))
+        slots : np.ndarray = self.store.allocate(x_coords, y_coords, widths)
+        for slot, serial, y_coord in zip(slots.tolist(), self.store.serial[slots].tolist(), y_coords.tolist()):
+            tower_y_coord : float = y_coord - self.scroll_offset
+            self.spatial_index.insert(slot, serial, tower_y_coord, tower_y_coord + self.platform_height)
+        self._lowest_y_coord = max(self._lowest_y_coord, float(np.max(y_coords)))
+        return slots
 
     def add_platform(self, y_coord : float = 0):
-        random_platform_width : float = random.uniform(self.min_platform_width, self.max_platform_width)
-        width : float = math.ceil(random_platform_width/ self.platform_height) * self.platform_height
-        x_coord : float = 0
-        if (self.side):
-            if self.side_left:
-                x_coord = 0
-            else:
-                x_coord = self.window_size[0] - width
-            self.side_left = not self.side_left  #
-        else:
-            x_coord = self.window_size[0] / 2 - width / 2
-        self.side = not self.side
+        self.add_platforms(np.array([y_coord], dtype=float))
 
-        self.platforms.append(Platform(x_coord=x_coord, y_coord=y_coord, width=width, height=self.platform_height))
+    def cull_platforms(self) -> None:
+        """
+        Releases the platforms that left the screen and adds a new platform at the top for each of them
+        """
+        culled : np.ndarray = np.flatnonzero(self.store.active & (self.store.y_coord >= self.window_size[1]))
+        self.store.release(culled)
+        for slot in culled.tolist():
+            self.spatial_index.remove(slot)
+        self._lowest_y_coord = float(np.max(self.store.y_coord[self.store.active], initial=-math.inf))
+        self.add_platforms(np.full(len(culled), self.platform_height))
 
     def update_and_return_platforms(self, delta : float = 1/60*1000, speed_multiplier : float = 1, update_position : bool = False):
 
-        if self.platforms == []:
-            for platform_i in np.arange(1,configuration.number_of_platforms * self.skip_platform_count,self.skip_platform_count):
-                y_coord : float = platform_i * self.platform_height
-                self.add_platform(y_coord=y_coord)
+        if self.store.count == 0:
+            y_coords : np.ndarray = np.arange(1, configuration.number_of_platforms * self.skip_platform_count,
+                                              self.skip_platform_count) * self.platform_height
+            self.add_platforms(y_coords.astype(float))
         else:
             if update_position:
-                for platform in self.platforms:
-                    platform.y_coord += configuration.platform_speed * speed_multiplier * delta
-                    if platform.y_coord >= self.window_size[1]:
-                        self.platforms.remove(platform)
-                        self.add_platform(y_coord=self.platform_height)
+                scroll : float = configuration.platform_speed * speed_multiplier * delta
+                self.scroll_offset += scroll
+                self.store.y_coord += scroll
+                self._lowest_y_coord += scroll
+                if self._lowest_y_coord >= self.window_size[1]:
+                    self.cull_platforms()
+                else:
+                    self.tower.prefetch()
+
+    def get_platform_bounds(self, slot : int) -> (float, float, float, float):
+        """
+        :param slot: the platform slot
+        :return: the (left, top, right, bottom) coordinates of the platform
+        """
+        left : float = float(self.store.x_coord[slot])
+        top : float = float(self.store.y_coord[slot])
+        return left, top, left + float(self.store.width[slot]), top + self.platform_height
 
-    def render_platforms(self):
-        # Scale the sprite to the desired tile size
-        scaled_sprite : surface = pygame.transform.scale(self.platform_texture, (self.platform_height, self.platform_height))
+    @property
+    def platforms(self) -> list[Platform]:
+        """
+        :return: a snapshot of the active platforms in creation order, for inspection only
+        """
+        return [Platform(x_coord=float(self.store.x_coord[slot]), y_coord=float(self.store.y_coord[slot]),
+                         width=float(self.store.width[slot]), height=self.platform_height,
+                         visited_by_player=bool(self.store.visited[slot]))
+                for slot in self.store.active_slots()]
+
+    def get_platforms_in_span(self, top : float, bottom : float) -> list[int]:
+        """
+        Broad-phase collision query
+        :param top: top screen y-coordinate of the span
+        :param bottom: bottom screen y-coordinate of the span
+        :return: the slots of the platforms that may vertically overlap the span, in creation order
+        """
+        return self.spatial_index.query(top - self.scroll_offset, bottom - self.scroll_offset)
 
-        for platform in self.platforms:
-            for x_coord in np.arange(platform.x_coord,platform.x_coord + platform.width,platform.height):
-                self.window.blit(scaled_sprite,(x_coord,platform.y_coord))
+    def get_render_items(self) -> list[RenderItem]:
+        """
+        :return: a render item per platform
+        """
+        slots : np.ndarray = self.store.active_slots()
+        return [RenderItem(self.strip_cache.get_strip(width), (x_coord, y_coord), serial)
+                for x_coord, y_coord, width, serial in zip(self.store.x_coord[slots].tolist(),
+                                                           self.store.y_coord[slots].tolist(),
+                                                           self.store.width[slots].tolist(),
+                                                           self.store.serial[slots].tolist())]
+
+    def render_platforms(self):
+        for item in self.get_render_items():
+            self.window.blit(item.image, item.position)
 
             #pygame.draw.rect(self.window,
             #                 platform.platform_color, Rect(platform.x_coord,
@@ -232,6 +1322,258 @@ class PlatformManager:
             #                                                     platform.height))
 #endregion
 
+#region HUD
+class TextField:
+    """
+    Text rendered with a fixed font and color, each distinct text is rasterised once and the most recent ones are cached
+    """
+
+    def __init__(self, text_font : font.Font, color : (float,float,float), cache_size : int = configuration.hud_text_cache_size):
+        self.font : font.Font = text_font
+        self.color : (float,float,float) = color
+        self.cache_size : int = cache_size
+        self._surfaces : OrderedDict = OrderedDict() # text -> rendered surface
+
+    def render(self, text : str) -> surface:
+        """
+        :param text: the text to render
+        :return: the cached surface of the text, rendered on the first request
+        """
+        text_surface : surface = self._surfaces.get(text)
+        if text_surface is None:
+            text_surface = self.font.render(text, True, self.color)
+            self._surfaces[text] = text_surface
+            if len(self._surfaces) > self.cache_size:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(text)
+        return text_surface
+
+class Hud:
+    """
+    Score panel and game over text. The font is created once per session, labels are rendered once
+    and the panel is only recomposed when one of its values changes.
+    """
+
+    def __init__(self):
+        self.font : font.Font = pygame.font.Font(None, configuration.font_size)
+        self.label_field : TextField = TextField(self.font, configuration.score_font_color)
+        self.score_field : TextField = TextField(self.font, configuration.score_font_color)
+        self.level_field : TextField = TextField(self.font, configuration.score_font_color)
+        self.speed_field : TextField = TextField(self.font, configuration.score_font_color)
+        self.game_over_field : TextField = TextField(self.font, configuration.score_font_color, cache_size=1)
+        self.paused_field : TextField = TextField(self.font, configuration.score_font_color, cache_size=1)
+        self.rival_field : TextField = TextField(self.font, configuration.score_font_color)
+        self.leaderboard_field : TextField = TextField(self.font, configuration.score_font_color,
+                                                       cache_size=2 * configuration.leaderboard_size)
+
+        self._panel_values : tuple = None
+        self._panel : surface = None
+        self._game_over_values : tuple = None
+        self._game_over : surface = None
+
+    def render_score_panel(self, score : int, level : int, speed_multiplier : float) -> surface:
+        """
+        :return: the score panel, a new surface is only created when a value changed
+        """
+        values : tuple = (score, level, speed_multiplier)
+        if values == self._panel_values:
+            return self._panel
+
+        # Render background rectangle
+        panel : surface = surface.Surface((configuration.window_size[0], configuration.platform_render_height))
+        panel.fill(configuration.score_panel_background_color)
+
+        # Lay out the labels and values in a row
+        x_coord, y_coord = configuration.score_coordinates
+        for text_surface in (self.label_field.render('Score : '), self.score_field.render(str(score)),
+                             self.label_field.render(' Level : '), self.level_field.render(str(level)),
+                             self.label_field.render(' Speed X : '), self.speed_field.render(str(speed_multiplier))):
+            panel.blit(text_surface, (x_coord, y_coord))
+            x_coord += text_surface.get_width()
+
+        self._panel_values = values
+        self._panel = panel
+        return panel
+
+    def render_game_over(self, score : int, high_score : int, entries : tuple = ()) -> surface:
+        """
+        :param entries: the best leaderboard entries listed below the game over text
+        :return: the game over text with the leaderboard, a new surface is only created when a value changed
+        """
+        title : surface = self.game_over_field.render(f'Game Over! - Score: {score} - High Score: {high_score}')
+        if not entries:
+            return title
+
+        values : tuple = (title, entries)
+        if values == self._game_over_values:
+            return self._game_over
+
+        lines : list = [title] + [self.leaderboard_field.render(f'{rank}. {entry.score} (Level {entry.level})')
+                                  for rank, entry in enumerate(entries, 1)]
+        game_over : surface = surface.Surface((max(line.get_width() for line in lines),
+                                               len(lines) * configuration.leaderboard_line_height), pygame.SRCALPHA)
+        for index, line in enumerate(lines):
+            game_over.blit(line, (0, index * configuration.leaderboard_line_height))
+
+        self._game_over_values = values
+        self._game_over = game_over
+        return game_over
+
+    def render_paused(self) -> surface:
+        return self.paused_field.render('Paused - Press P to resume')
+
+    def render_rival(self, score : int, level : int, game_over : bool) -> surface:
+        return self.rival_field.render(f'Rival : {score} (Level {level})' + (' - Game Over' if game_over else ''))
+#endregion
+
+#region Leaderboard
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    """
+    Outcome of a finished game
+    """
+    score : int = 0
+    level : int = 1
+    timestamp : float = 0 # Unix time of the game end
+
+class Leaderboard:
+    """
+    Scores of finished games kept as an in-memory index of the best entries, backed by an append-only log.
+
+    Each game end appends one line to the log on a background writer, so the game thread never waits on storage.
+    When the log grows past the compaction threshold it is rewritten to the best entries in a temporary file
+    that atomically replaces the log, an interrupted write can only lose its trailing line.
+    """
+
+    # Open leaderboards by log path, shared by all games of a session
+    _instances : dict = {}
+
+    def __init__(self, log_path : str = configuration.leaderboard_log_path, size : int = configuration.leaderboard_size,
+                 compaction_lines : int = configuration.leaderboard_compaction_lines):
+        self.log_path : str = log_path
+        self.size : int = size
+        self.compaction_lines : int = compaction_lines
+
+        # Best entries by descending score, ties in the order they were recorded
+        self._entries : list[LeaderboardEntry] = []
+        self._keys : list[int] = [] # negated scores of the entries, ascending for bisect
+        self._log_lines : int = 0
+
+        self._writer : ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='leaderboard')
+        self._pending : Future = None
+
+        self._load()
+
+    @classmethod
+    def open(cls, log_path : str = None) -> 'Leaderboard':
+        """
+        :param log_path: the log file, the configured path if None
+        :return: the leaderboard of the log, loaded on the first request
+        """
+        log_path = configuration.leaderboard_log_path if log_path is None else log_path
+        leaderboard : Leaderboard = cls._instances.get(log_path)
+        if leaderboard is None:
+            leaderboard = cls(log_path)
+            cls._instances[log_path] = leaderboard
+        return leaderboard
+
+    def _load(self) -> None:
+        needs_compaction : bool = False
+        try:
+            with open(self.log_path, 'r') as log_file:
+                log : str = log_file.read()
+        except OSError:
+            log = ''
+            if path.exists(configuration.score_data_file_path):
+                # Import the high score of the single value score file
+                with open(configuration.score_data_file_path, 'r') as score_data_file:
+                    high_score : str = score_data_file.read().strip()
+                if high_score.isdigit():
+                    self._insert(LeaderboardEntry(score=int(high_score)))
+                    needs_compaction = True
+
+        for line in log.splitlines():
+            try:
+                score, level, timestamp = json.loads(line)
+                self._insert(LeaderboardEntry(int(score), int(level), float(timestamp)))
+            except (ValueError, TypeError):
+                # Trailing line of an interrupted write
+                needs_compaction = True
+            self._log_lines += 1
+
+        if log and not log.endswith('\n'):
+            needs_compaction = True
+        if needs_compaction or self._log_lines >= self.compaction_lines:
+            self._pending = self._writer.submit(self._compact, tuple(self._entries))
+            self._log_lines = len(self._entries)
+
+    def _insert(self, entry : LeaderboardEntry) -> None:
+        index : int = bisect.bisect_right(self._keys, -entry.score)
+        if index >= self.size:
+            return
+        self._keys.insert(index, -entry.score)
+        self._entries.insert(index, entry)
+        if len(self._entries) > self.size:
+            self._keys.pop()
+            self._entries.pop()
+
+    def record(self, score : int, level : int) -> LeaderboardEntry:
+        """
+        Adds a finished game, the index is updated immediately and the log is written in the background
+        :return: the recorded entry
+        """
+        entry : LeaderboardEntry = LeaderboardEntry(score, level, unix_time())
+        self._insert(entry)
+        self._log_lines += 1
+        if self._log_lines >= self.compaction_lines:
+            self._pending = self._writer.submit(self._compact, tuple(self._entries))
+            self._log_lines = len(self._entries)
+        else:
+            self._pending = self._writer.submit(self._append, entry)
+        return entry
+
+    def _append(self, entry : LeaderboardEntry) -> None:
+        try:
+            with open(self.log_path, 'a') as log_file:
+                log_file.write(json.dumps([entry.score, entry.level, entry.timestamp]) + '\n')
+                log_file.flush()
+                os.fsync(log_file.fileno())
+        except OSError:
+            # The entry stays in the index of this session
+            pass
+
+    def _compact(self, entries : tuple) -> None:
+        temporary_path : str = self.log_path + '.tmp'
+        try:
+            with open(temporary_path, 'w') as log_file:
+                log_file.writelines(json.dumps([entry.score, entry.level, entry.timestamp]) + '\n' for entry in entries)
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            os.replace(temporary_path, self.log_path)
+        except OSError:
+            # The log keeps its previous content, appends continue on it
+            pass
+
+    def flush(self) -> None:
+        """
+        Waits for the pending log writes
+        """
+        if self._pending is not None:
+            self._pending.result()
+
+    @property
+    def get_personal_best(self) -> int:
+        return self._entries[0].score if self._entries else 0
+
+    def get_top(self, count : int = None) -> tuple:
+        """
+        :param count: the number of entries, all indexed entries if None
+        :return: the best entries by descending score
+        """
+        return tuple(self._entries if count is None else self._entries[:count])
+#endregion
+
 #region Player
 class PlayerAnimationState(Enum):
     idle = "idle"
@@ -242,7 +1584,19 @@ class PlayerAnimationState(Enum):
     jumping_up_or_down = "jumping_up_or_down"
 class PlayerAnimations:
 
-    def __init__(self):
+    # Animation name -> ((x, y) of the first frame in the sprite sheet, number of frames, flipped)
+    animations_key_in_sprite_sheet : dict = {"idle" : ((4,0),3, False),
+                                             "moving_right" : ((112,0),4, False),
+                                             "moving_left": ((112, 0), 4, True),
+                                             "jumping_up_right" : ((265, 0),4, False),
+                                             "jumping_up_left": ((265, 0), 4, True),
+                                             "jumping_up_or_down": ((265,0), 1,  False)}
+
+    def __init__(self, load_frames : bool = True, atlas : SpriteAtlas = None):
+        """
+        :param load_frames: load the animation frames, disabled when running headless
+        :param atlas: the sprite atlas holding the animation frames, loaded if None
+        """
         # General properties
         self.sprite_offset: (float, float) = configuration.character_sprite_offset
         self.player_sprite_path: str = configuration.character_sprite_sheet
@@ -255,17 +1609,12 @@ class PlayerAnimations:
         self.current_player_sprite : surface = None
         self.character_sprite: surface = None
         self.character_animations_frames : dict = {}
-        self.animations_key_in_sprite_sheet = {"idle" : ((4,0),3, False),
-                                               "moving_right" : ((112,0),4, False),
-                                               "moving_left": ((112, 0), 4, True),
-                                               "jumping_up_right" : ((265, 0),4, False),
-                                               "jumping_up_left": ((265, 0), 4, True),
-                                               "jumping_up_or_down": ((265,0), 1,  False)}
 
         self._current_running_animation : PlayerAnimationState = PlayerAnimationState.moving_left
 
         # Animations
-        self.load_animations()
+        if load_frames:
+            self.load_animations(atlas)
 
     def load_sprite_sheet(self) -> Union[SurfaceType]:
 
@@ -304,11 +1653,16 @@ class PlayerAnimations:
             frames.append(frame_sprite)
         return frames
 
-    def load_animations(self) -> None:
+    def extract_animations(self) -> dict:
+        """
+        Slices, flips and colour-keys the animation frames from the sprite sheet
+        :return: animation name -> list of frames
+        """
         sprite_sheet : surface = self.load_sprite_sheet()
+        animations : dict = {}
 
         for animation in PlayerAnimationState:
-            self.character_animations_frames[animation.value] = self.extract_frames(
+            animations[animation.value] = self.extract_frames(
                                                        sprite_sheet=sprite_sheet,
                                                        offset_x=self.animations_key_in_sprite_sheet[animation.value][0][0],
                                                        offset_Y=self.animations_key_in_sprite_sheet[animation.value][0][1],
@@ -316,6 +1670,12 @@ class PlayerAnimations:
                                                        frame_height=self.player_size[1],
                                                        num_frames=self.animations_key_in_sprite_sheet[animation.value][1],
                                                        flip_vertical= self.animations_key_in_sprite_sheet[animation.value][2])
+        return animations
+
+    def load_animations(self, atlas : SpriteAtlas = None) -> None:
+        atlas = atlas if atlas is not None else load_sprite_atlas()
+        for animation in PlayerAnimationState:
+            self.character_animations_frames[animation.value] = atlas.get_frames(animation.value)
 
     def update_player_sprite(self, delta : float) -> surface:
         self.character_sprite_timer += delta
@@ -331,6 +1691,10 @@ class PlayerAnimations:
 
         return self.current_player_sprite
 
+    @property
+    def current_animation(self) -> PlayerAnimationState:
+        return self._current_running_animation
+
     def change_animation_state(self, new_animation_state : PlayerAnimationState) -> None:
         if not self._current_running_animation == new_animation_state:
             self._current_running_animation = new_animation_state
@@ -343,10 +1707,21 @@ class PlayerJumpState(Enum):
     idle = 0
     jumping_up = 1
     jumping_down = 2
+class GameEvent(Enum):
+    jump = 0
+    land = 1
+    combo = 2
+    booster = 3
+    level_up = 4
+    game_over = 5
 
 class PlayerScoreControl:
 
-    def __init__(self, window : surface):
+    def __init__(self, window : surface = None, persistent : bool = True):
+        """
+        :param window: the surface the score is rendered on, None to run headless
+        :param persistent: load the high score from the leaderboard and record the game in it
+        """
 
         #private attributes
         self._high_score : int = 0
@@ -364,24 +1739,36 @@ class PlayerScoreControl:
         self._level : int = 1
         self._tmp_speed_multiplier : float = 0
         self._paused : bool = False
+        self._persistent : bool = persistent
+        self._score_saved : bool = False
 
-        self._load_score_data()
+        # Receives the game events of the score (e.g. to play sounds), None when nobody listens
+        self.event_listener : Callable[[GameEvent], None] = None
 
-    def _load_score_data(self):
-        if path.exists(configuration.score_data_file_path):
-            with open(configuration.score_data_file_path, 'r') as score_data_file_path:
-                high_score = score_data_file_path.read()
-            if high_score.isdigit():
-                self._high_score = int(high_score)
-            else:
-                self._high_score = 0
-        else:
-            self._high_score = 0
+        # Cached HUD text, not used when running headless
+        self.hud : Hud = None if window is None else Hud()
+
+        self._leaderboard : Leaderboard = Leaderboard.open() if self._persistent else None
+        if self._leaderboard is not None:
+            self._high_score = self._leaderboard.get_personal_best
 
     def check_and_save_high_score(self):
-        if self._current_score > self._high_score:
-            with open(configuration.score_data_file_path, 'w') as score_data_file_path:
-                score_data_file_path.write(str(self._current_score))
+        """
+        Records the finished game once, later calls of the same game are ignored
+        """
+        if self._score_saved:
+            return
+        self._score_saved = True
+        self.emit_event(GameEvent.game_over)
+        self._high_score = max(self._high_score, self._current_score)
+        if self._leaderboard is not None:
+            self._leaderboard.record(self._current_score, self._level)
+
+    def get_top_scores(self, count : int) -> tuple:
+        """
+        :return: the best leaderboard entries, empty when not persistent
+        """
+        return () if self._leaderboard is None else self._leaderboard.get_top(count)
 
     def pause_game(self):
         self._paused = True
@@ -400,9 +1787,15 @@ class PlayerScoreControl:
     def increment_score_increment(self):
         self._current_score_multiplier *= 2
 
+    def emit_event(self, game_event : GameEvent) -> None:
+        if self.event_listener is not None:
+            self.event_listener(game_event)
+
     def increment_score(self):
         self._current_score += self._current_score_increment * self._current_score_multiplier
         if ((self._timestamp - self._last_score_inc_stamp) <= self._booster_threshold):
+            # A quick score starts the booster, further quick scores while it is on chain a combo
+            self.emit_event(GameEvent.combo if self._booster_on else GameEvent.booster)
             self._booster_on = True
             self._booster_enabled_time_stamp = self._timestamp
         self._last_score_inc_stamp = self._timestamp
@@ -411,6 +1804,7 @@ class PlayerScoreControl:
             self._number_visited_platforms_since_last_speed_mult_inc = 0
             self._speed_multiplier = np.round(self._speed_multiplier * 1.2,1)
             self._level += 1
+            self.emit_event(GameEvent.level_up)
         else:
             self._number_visited_platforms_since_last_speed_mult_inc += 1
 
@@ -430,28 +1824,55 @@ class PlayerScoreControl:
     def get_high_score(self) -> int:
         return self._high_score
 
-    def render_score(self) -> None:
-        # Choose a font and size
-        font = pygame.font.Font(None, configuration.font_size)
-
-        # Render background rectangle
-        pygame.draw.rect(self._window, configuration.score_panel_background_color, (0,0,configuration.window_size[0], configuration.platform_render_height))
+    @property
+    def get_level(self) -> int:
+        return self._level
 
-        # Render the text into an image (Surface)
+    def get_render_item(self) -> RenderItem:
+        """
+        :return: the score panel as a render item
+        """
         #text_surface = font.render(f'Score : {self._current_score} Level : {self._level} Booster : {"ON" if self._booster_on else "OFF"}', True, configuration.score_font_color)
-        text_surface = font.render(f'Score : {self._current_score} Level : {self._level} Speed X : {self._speed_multiplier}',
-                                   True, configuration.score_font_color)
+        panel : surface = self.hud.render_score_panel(self._current_score, self._level, self._speed_multiplier)
+        return RenderItem(panel, (0, 0), 'score')
 
-        self._window.blit(text_surface, configuration.score_coordinates)
+    def render_score(self) -> None:
+        item : RenderItem = self.get_render_item()
+        self._window.blit(item.image, item.position)
+
+@dataclass
+class PlayerInput:
+    """
+    Input state read by the player on each tick
+    """
+    left : bool = False # Move left key is held
+    right : bool = False # Move right key is held
+    jump : bool = False # Jump key is held
+
+    @staticmethod
+    def from_keys(keys : ScancodeWrapper) -> 'PlayerInput':
+        """
+        :param keys: the pressed keys as returned by pygame.key.get_pressed
+        :return: the player input of the pressed keys
+        """
+        return PlayerInput(left=bool(keys[pygame.K_LEFT]), right=bool(keys[pygame.K_RIGHT]), jump=bool(keys[pygame.K_SPACE]))
 
 class Player:
 
-    def __init__(self, window : surface, platform_manager : PlatformManager):
+    def __init__(self, window : surface, platform_manager : PlatformManager, atlas : SpriteAtlas = None,
+                 persistent : bool = None):
+        """
+        :param window: the surface the player is rendered on, None to run headless (no sprites, fonts or score file)
+        :param platform_manager: the platforms the player collides with
+        :param atlas: the sprite atlas holding the animation frames, loaded if None and not headless
+        :param persistent: load and save the high score, None to persist unless headless
+        """
 
         # General settings
         self.window : surface = window
+        self.headless : bool = window is None
         self.platform_manager : PlatformManager = platform_manager
-        self.window_size = self.window.get_size()
+        self.window_size = configuration.window_size if self.headless else self.window.get_size()
         self.move_platforms : bool = False
 
         # Player draw settings
@@ -461,6 +1882,11 @@ class Player:
         # Player coordinates
         self.x_coord : float = self.player_size[0]
         self.y_coord : float = self.window_size[1] - self.player_size[1]
+        # Player coordinates before the last simulation step, used for render interpolation and swept collision
+        self.previous_x_coord : float = self.x_coord
+        self.previous_y_coord : float = self.y_coord
+        # Platform scroll offset of the last collision check, maps the previous coordinates to the tower
+        self.collision_scroll_offset : float = 0
 
         # Player movement settings
         self.tmp_jump_height : float = 0
@@ -474,31 +1900,42 @@ class Player:
         self.allow_jumping : bool = True
 
         # Character sprite
-        self.character_animation_controller : PlayerAnimations =  PlayerAnimations()
+        self.character_animation_controller : PlayerAnimations =  PlayerAnimations(load_frames=not self.headless, atlas=atlas)
         self.character_sprite : surface = None
 
         # Score control
-        self.score_controller = PlayerScoreControl(self.window)
+        self.score_controller = PlayerScoreControl(self.window, persistent=not self.headless if persistent is None else persistent)
 
     def player_key_press(self, keys : ScancodeWrapper):
+        self.apply_input(PlayerInput.from_keys(keys))
+
+    def apply_input(self, player_input : PlayerInput) -> bool:
+        """
+        Updates the movement and jump states from the given input
+        :param player_input: the input state of the current tick
+        :return: whether the input started a jump
+        """
         if self.score_controller.is_paused:
-            return
+            return False
 
         self.player_movement_state = PlayerMovementState.idle
 
-        if keys[pygame.K_RIGHT]:
+        if player_input.right:
             self.player_movement_state = PlayerMovementState.moving_right
 
-        if keys[pygame.K_LEFT]:
+        if player_input.left:
             self.player_movement_state = PlayerMovementState.moving_left
 
-        if keys[pygame.K_SPACE]:
+        if player_input.jump:
             if not self.move_platforms:
                 self.move_platforms = True
             if self.allow_jumping == True:
                 self.player_jumping_state = PlayerJumpState.jumping_up
                 self.tmp_jump_height = 0
                 self.allow_jumping = False
+                self.score_controller.emit_event(GameEvent.jump)
+                return True
+        return False
 
     def update_player_outer_bounds(self):
         self.left : float = self.x_coord
@@ -513,7 +1950,6 @@ class Player:
             if self.move_platforms:
                 self.score_controller.pause_game()
                 self.score_controller.check_and_save_high_score()
-                self.render_game_over()
 
         if self.right >= self.window_size[0]:
             self.allow_jumping = True
@@ -526,43 +1962,110 @@ class Player:
             self.x_coord = 0
             self.player_jumping_state = PlayerJumpState.jumping_down
 
-    def check_platform_collision_bottom(self, platform : Platform) -> None:
+    @staticmethod
+    def overlaps_horizontally(player_left : float, player_right : float, left : float, right : float) -> bool:
+        return (left <= player_left <= right) or (left <= player_right <= right)
+
+    def hit_platform_bottom(self, bottom : float) -> None:
+        """
+        Pushes the player below the platform and ends the jump
+        :param bottom: the bottom y-coordinate of the platform
+        """
+        self.y_coord = bottom + self.player_size[1]
+        self.player_jumping_state = PlayerJumpState.jumping_down
+
+    def land_on_platform(self, slot : int, top : float) -> None:
+        """
+        Puts the player on the platform and scores it on the first landing
+        :param top: the top y-coordinate of the platform
+        """
+        self.y_coord = top - self.player_size[1]
+        self.player_jumping_state = PlayerJumpState.jumping_down
+        if not self.allow_jumping:
+            self.score_controller.emit_event(GameEvent.land)
+        self.allow_jumping = True
+        if not self.platform_manager.store.visited[slot]:
+            self.score_controller.increment_score()
+            self.platform_manager.store.visited[slot] = True
+
+    def check_platform_collision_bottom(self, slot : int) -> None:
         """
         Adjusts the player y-coordinate based on collision with the given platform from the top side
-        :param platform: the target platform
+        :param slot: the target platform slot
         :return: None
         """
-        if self.top <= platform.bottom and self.top >= platform.top:
-            if (self.left <= platform.right and self.left >= platform.left) or\
-                    (self.right >= platform.left and self.right <= platform.right):
-                self.y_coord = platform.bottom + self.player_size[1]
-                self.player_jumping_state = PlayerJumpState.jumping_down
+        left, top, right, bottom = self.platform_manager.get_platform_bounds(slot)
+        if self.top <= bottom and self.top >= top and self.overlaps_horizontally(self.left, self.right, left, right):
+            self.hit_platform_bottom(bottom)
 
-    def check_platform_collision_top(self, platform : Platform) -> None:
+    def check_platform_collision_top(self, slot : int) -> None:
         """
         Adjusts the player y-coordinate based on collision with the given platform from the down side
-        :param platform: the target platform
+        :param slot: the target platform slot
         :return: None
         """
-        if self.top >= platform.top - self.player_size[1] and self.bottom <= platform.bottom:
-            if (self.left <= platform.right and self.left >= platform.left) or\
-                    (self.right >= platform.left and self.right <= platform.right):
-                self.y_coord = platform.top - self.player_size[1]
-                self.player_jumping_state = PlayerJumpState.jumping_down
-                self.allow_jumping = True
-                if not platform.visited_by_player:
-                    self.score_controller.increment_score()
-                    platform.visited_by_player = True
+        left, top, right, bottom = self.platform_manager.get_platform_bounds(slot)
+        if self.top >= top - self.player_size[1] and self.bottom <= bottom and \
+                self.overlaps_horizontally(self.left, self.right, left, right):
+            self.land_on_platform(slot, top)
 
+    def sweep_platform_collision(self) -> None:
+        """
+        Continuous collision for the displacements the overlap tests miss (high speed multipliers or long steps).
+        Platforms do not move in tower coordinates, so the player box is swept from its previous to its current
+        tower position and resolved against the platform surface it crosses first (time of impact). The horizontal
+        overlap is tested at the time of impact, the horizontal movement of the rest of the step is kept.
+        Displacements shorter than a platform cannot skip one, they are left to the overlap tests.
+        Runs before the frame collision, so a player crossing a platform on the way to the floor lands on it.
+        :return: None
+        """
+        scroll_offset : float = self.platform_manager.scroll_offset
+        height : float = self.player_size[1]
+        start_x, end_x = self.previous_x_coord, self.x_coord
+        start_y : float = self.previous_y_coord - self.collision_scroll_offset
+        end_y : float = self.y_coord - scroll_offset
+        displacement : float = end_y - start_y
+        if abs(displacement) < self.platform_manager.platform_height:
+            return
+
+        # Earliest crossed surface as (time of impact, slot, surface y-coordinate on screen)
+        impact : (float, int, float) = None
+        sweep_top, sweep_bottom = min(start_y, end_y) + scroll_offset, max(start_y, end_y) + height + scroll_offset
+        for slot in self.platform_manager.get_platforms_in_span(sweep_top, sweep_bottom):
+            left, top, right, bottom = self.platform_manager.get_platform_bounds(slot)
+            if displacement > 0:
+                # Falling: the player bottom crosses the platform top
+                surface_y : float = top
+                time_of_impact : float = (top - scroll_offset - (start_y + height)) / displacement
+            else:
+                # Rising: the player top crosses the platform bottom
+                surface_y : float = bottom
+                time_of_impact : float = (bottom - scroll_offset - start_y) / displacement
+            if not 0 <= time_of_impact <= 1 or (impact is not None and time_of_impact >= impact[0]):
+                continue
+            x_coord : float = start_x + (end_x - start_x) * time_of_impact
+            if self.overlaps_horizontally(x_coord, x_coord + self.player_size[0], left, right):
+                impact = (time_of_impact, slot, surface_y)
+
+        if impact is None:
+            return
+        time_of_impact, slot, surface_y = impact
+        if displacement > 0:
+            self.land_on_platform(slot, surface_y)
+        else:
+            self.hit_platform_bottom(surface_y)
+        self.update_player_outer_bounds()
 
     def check_collision_with_platforms(self) -> None:
         """
-        Loops on all platforms and checks player collision with them from the top and the bottom
+        Checks player collision from the top and the bottom with the platforms near the player
         :return: None
         """
-        for platform in self.platform_manager.platforms:
-            self.check_platform_collision_bottom(platform)
-            self.check_platform_collision_top(platform)
+        # One pixel margin keeps touching platforms despite floating point drift between screen and tower coordinates
+        for slot in self.platform_manager.get_platforms_in_span(self.top - 1, self.bottom + 1):
+            self.check_platform_collision_bottom(slot)
+            self.check_platform_collision_top(slot)
+        self.collision_scroll_offset = self.platform_manager.scroll_offset
 
     def update_player_x_coord(self, delta : float) -> None:
         if self.player_movement_state == PlayerMovementState.moving_right:
@@ -596,6 +2099,10 @@ class Player:
         :return: None
         """
 
+        # 0. Keep the previous state for render interpolation
+        self.previous_x_coord = self.x_coord
+        self.previous_y_coord = self.y_coord
+
         # 1 Movement
         # 1.1 X-coordinate control
         self.update_player_x_coord(delta)
@@ -608,10 +2115,13 @@ class Player:
 
         # 3. Collision detection
 
-        # 3.1 Check collision with the frame
+        # 3.1 Sweep the step against the platforms
+        self.sweep_platform_collision()
+
+        # 3.2 Check collision with the frame
         self.check_frame_collision()
 
-        # 3.2 Check collision with platforms
+        # 3.3 Check collision with platforms
         self.check_collision_with_platforms()
 
         # 4. Update platforms
@@ -622,122 +2132,2910 @@ class Player:
         # 5. Update score
         self.score_controller.update_score(delta)
 
-    def render_game_over(self) -> None:
-        font = pygame.font.Font(None, configuration.font_size)
+    @property
+    def is_game_over(self) -> bool:
+        return self.move_platforms and self.score_controller.is_paused
+
+    def get_game_over_render_item(self) -> RenderItem:
+        text_game_over : surface = self.score_controller.hud.render_game_over(
+            self.score_controller.get_score, self.score_controller.get_high_score,
+            self.score_controller.get_top_scores(configuration.leaderboard_game_over_entries))
 
-        text_game_over = font.render(f'Game Over! - Score: {self.score_controller.get_score} - High Score: {self.score_controller.get_high_score}',
-                                   True, configuration.score_font_color)
+        return RenderItem(text_game_over, configuration.game_over_coordinates, 'game_over')
 
-        self.window.blit(text_game_over, configuration.game_over_coordinates)
+    def render_game_over(self) -> None:
+        item : RenderItem = self.get_game_over_render_item()
+        self.window.blit(item.image, item.position)
 
-    def render_player(self, delta: float) -> None:
+    def interpolated_coords(self, alpha : float) -> (float, float):
         """
-        Renders the player
+        :param alpha: position between the previous (0) and the current (1) simulation step
+        :return: the interpolated (x, y) coordinates of the player
+        """
+        return (self.previous_x_coord + (self.x_coord - self.previous_x_coord) * alpha,
+                self.previous_y_coord + (self.y_coord - self.previous_y_coord) * alpha)
+
+    def get_render_items(self, delta : float, alpha : float = 1, include_score : bool = True) -> list[RenderItem]:
+        """
+        Advances the sprite animation and returns the player, game over and score render items
         :param delta: time since last frame render
-        :return: none
+        :param alpha: interpolation factor between the last two simulation steps
+        :param include_score: False to leave out the score panel
+        :return: the render items in drawing order
         """
         if not self.score_controller.is_paused:
             self.character_sprite = self.character_animation_controller.update_player_sprite(delta)
-        self.process_player_state(delta)
-        self.window.blit(self.character_sprite,(self.x_coord,self.y_coord))
-        self.score_controller.render_score()
+        items : list[RenderItem] = [RenderItem(self.character_sprite, self.interpolated_coords(alpha), 'player')]
+        if self.is_game_over:
+            items.append(self.get_game_over_render_item())
+        if include_score:
+            items.append(self.score_controller.get_render_item())
+        return items
+
+    def render_player(self, delta: float, alpha : float = 1) -> None:
+        """
+        Renders the player
+        :param delta: time since last frame render
+        :param alpha: interpolation factor between the last two simulation steps
+        :return: none
+        """
+        for item in self.get_render_items(delta, alpha):
+            self.window.blit(item.image, item.position)
 
         #pygame.draw.circle(self.window, self.player_color,
         #                   (self.x_coord, self.y_coord), self.player_size[1]/2)
 #endregion
 
+#region Simulation
+@dataclass
+class SimulationResult:
+    """
+    Outcome of a single simulation session
+    """
+    score : int = 0 # Final score
+    high_score : int = 0 # High score known to the session
+    level : int = 1 # Level reached
+    ticks : int = 0 # Number of simulation steps run
+    elapsed_time : float = 0 # Simulated time (ms)
+    game_over : bool = False # True if the session ended with a game over, False if it hit the tick limit
+    seed : int = None # Seed of the tower
+
+class GameSimulation:
+    """
+    Game core (platforms, player and score) stepped without rendering, audio or frame cap.
+    Pass the window to share the core with the windowed game or None to run headless.
+    """
+
+    def __init__(self, window : surface = None, step_delta : float = configuration.simulation_step_delta,
+                 seed : int = None, atlas : SpriteAtlas = None, persistent : bool = None,
+                 event_listener : Callable[[GameEvent], None] = None):
+        """
+        :param window: the window to render on, None to run headless
+        :param step_delta: the fixed simulation step in ms
+        :param seed: seed of the tower, a random seed is drawn if None so every session can be reproduced
+        :param atlas: the sprite atlas, loaded if None and not headless
+        :param persistent: load and save the high score, None to persist unless headless
+        :param event_listener: called with the game events (jump, land, combo, ...) as they happen, e.g. to play sounds
+        """
+        self.seed : int = seed if seed is not None else random.randrange(2 ** 32)
+        if atlas is None and window is not None:
+            atlas = load_sprite_atlas()
+        self.platform_manager : PlatformManager = PlatformManager(window, atlas, self.seed)
+        self.player : Player = Player(window, self.platform_manager, atlas, persistent)
+        self.ticks : int = 0
+        self.elapsed_time : float = 0 # ms
+
+        # Input of the last step, an input provider supplies the input of steps run without one
+        self.last_input : PlayerInput = PlayerInput()
+        self.input_provider : Callable[['GameSimulation'], PlayerInput] = None
+
+        # Input recording of the session, None when not recording
+        self.recording : 'InputRecording' = None
+
+        # Receives the game events of the session, None when nobody listens
+        self.player.score_controller.event_listener = event_listener
+
+        # Number of ticks after which advance stops stepping, None for no limit (end of a replay)
+        self.tick_limit : int = None
+
+        # Fixed timestep control
+        self.step_delta : float = step_delta # ms
+        self.accumulator : float = 0 # Frame time not yet consumed by a simulation step (ms)
+
+    @property
+    def score_controller(self) -> PlayerScoreControl:
+        return self.player.score_controller
+
+    @property
+    def is_game_over(self) -> bool:
+        return self.player.is_game_over
+
+    def step(self, delta : float, player_input : PlayerInput = None) -> None:
+        """
+        Advances the simulation by one tick
+        :param delta: the simulated time of the tick in ms
+        :param player_input: the input of the tick, None to ask the input provider or else repeat the previous input
+        :return: whether the player started a jump on this tick
+        """
+        if player_input is None:
+            player_input = self.input_provider(self) if self.input_provider is not None else self.last_input
+        self.last_input = player_input
+        if self.recording is not None:
+            self.recording.append(player_input)
+        jumped : bool = self.player.apply_input(player_input)
+        self.player.process_player_state(delta)
+        self.ticks += 1
+        self.elapsed_time += delta
+        return jumped
+
+    def advance(self, frame_delta : float, player_input : PlayerInput = None) -> float:
+        """
+        Runs as many fixed steps as fit in the accumulated frame time, so physics results do not depend on the render rate.
+        No step is run after game over, so the last tick does not depend on the frame timing either.
+        :param frame_delta: the time since the last rendered frame in ms
+        :param player_input: the input applied to every step of the frame, None to ask the input provider on each step.
+            Once a step jumped, the following steps get it without the jump, so a buffered press jumps only once.
+        :return: the interpolation factor between the last two simulation steps for rendering
+        """
+        self.accumulator += min(frame_delta, configuration.max_frame_delta)
+        while self.accumulator >= self.step_delta:
+            if self.is_game_over or (self.tick_limit is not None and self.ticks >= self.tick_limit):
+                self.accumulator = 0
+                break
+            if self.step(self.step_delta, player_input) and player_input is not None:
+                player_input = replace(player_input, jump=False)
+            self.accumulator -= self.step_delta
+        return self.accumulator / self.step_delta
+
+    def start_recording(self) -> 'InputRecording':
+        """
+        Records the input of every following step
+        :return: the recording, filled as the simulation steps
+        """
+        self.recording = InputRecording(self.seed, self.step_delta)
+        return self.recording
+
+    def result(self) -> SimulationResult:
+        return SimulationResult(score=self.score_controller.get_score,
+                                high_score=self.score_controller.get_high_score,
+                                level=self.score_controller.get_level,
+                                ticks=self.ticks,
+                                elapsed_time=self.elapsed_time,
+                                game_over=self.is_game_over,
+                                seed=self.seed)
+
+    def run(self, input_provider : Callable[['GameSimulation'], PlayerInput],
+            delta : float = configuration.headless_delta,
+            max_ticks : int = configuration.headless_max_ticks) -> SimulationResult:
+        """
+        Steps the simulation as fast as possible until game over or the tick limit
+        :param input_provider: returns the player input for the next tick of the given simulation
+        :param delta: the simulated time of each tick in ms
+        :param max_ticks: the maximum number of ticks to run
+        :return: the result of the session
+        """
+        while self.ticks < max_ticks and not self.is_game_over:
+            self.step(delta, input_provider(self))
+        return self.result()
+
+def platform_climber_input(simulation : GameSimulation) -> PlayerInput:
+    """
+    Scripted input that climbs the tower. It waits beside an edge of the next platform above, jumps,
+    and steers onto the platform once the head of the player is above it (jumping from below bumps the head).
+    The input only depends on the simulation state, so seeded sessions are reproducible.
+    :param simulation: the simulation requesting the input
+    :return: the player input for the next tick
+    """
+    player : Player = simulation.player
+    store : PlatformStore = simulation.platform_manager.store
+    player_width, player_height = player.player_size
+    x_coord : float = player.x_coord
+
+    # The next platform is the lowest one clearly above the feet of the player
+    slots : np.ndarray = np.flatnonzero(store.active & (store.y_coord < player.y_coord + player_height - 8))
+    if len(slots) == 0:
+        return PlayerInput()
+    slot : int = int(slots[np.argmax(store.y_coord[slots])])
+    top, left = float(store.y_coord[slot]), float(store.x_coord[slot])
+    right : float = left + float(store.width[slot])
+
+    # Head above the platform, steer onto its center
+    if player.y_coord < top:
+        target_x_coord : float = (left + right) / 2 - player_width / 2
+        return PlayerInput(left=x_coord > target_x_coord + 2, right=x_coord < target_x_coord - 2)
+
+    # Below the platform, walk next to its closest free edge and jump from there
+    window_width : float = simulation.platform_manager.window_size[0]
+    spots : list[float] = [spot for spot in (left - player_width - 3, right + 3) if 0 < spot and spot + player_width < window_width]
+    target_x_coord : float = min(spots, key=lambda spot: abs(spot - x_coord)) if spots else x_coord
+    return PlayerInput(left=x_coord > target_x_coord + 2, right=x_coord < target_x_coord - 2,
+                       jump=abs(x_coord - target_x_coord) < 3 and player.allow_jumping)
+
+def run_headless_sessions(sessions : int = configuration.headless_sessions,
+                          input_provider : Callable[[GameSimulation], PlayerInput] = platform_climber_input,
+                          delta : float = configuration.headless_delta,
+                          max_ticks : int = configuration.headless_max_ticks,
+                          seed : int = None) -> list[SimulationResult]:
+    """
+    Runs several independent headless sessions one after the other
+    :param seed: seed of the first session, the following sessions use the next seeds; random towers if None
+    :return: the result of each session
+    """
+    return [GameSimulation(seed=None if seed is None else seed + session).run(input_provider, delta=delta, max_ticks=max_ticks)
+            for session in range(sessions)]
+
+@dataclass(frozen=True)
+class SimulationSnapshot:
+    """
+    Immutable state of the game core after a simulation step, everything the renderer draws from it
+    """
+    ticks : int = 0
+    published_time : float = 0 # perf_counter time at which the snapshot was published (s)
+    step_delta : float = configuration.simulation_step_delta # ms
+    platforms : tuple = () # (x, y, width, serial) of each active platform
+    previous_player_position : (float, float) = (0, 0)
+    player_position : (float, float) = (0, 0)
+    animation : PlayerAnimationState = PlayerAnimationState.idle
+    score : int = 0
+    level : int = 1
+    speed_multiplier : float = 1
+    scroll_offset : float = 0
+    game_over : bool = False
+
+    @classmethod
+    def capture(cls, simulation : GameSimulation) -> 'SimulationSnapshot':
+        platform_manager : PlatformManager = simulation.platform_manager
+        store : PlatformStore = platform_manager.store
+        slots : np.ndarray = store.active_slots()
+        player : Player = simulation.player
+        score_controller : PlayerScoreControl = simulation.score_controller
+        return cls(ticks=simulation.ticks,
+                   published_time=perf_counter(),
+                   step_delta=simulation.step_delta,
+                   platforms=tuple(zip(store.x_coord[slots].tolist(), store.y_coord[slots].tolist(),
+                                       store.width[slots].tolist(), store.serial[slots].tolist())),
+                   previous_player_position=(player.previous_x_coord, player.previous_y_coord),
+                   player_position=(player.x_coord, player.y_coord),
+                   animation=player.character_animation_controller.current_animation,
+                   score=score_controller.get_score,
+                   level=score_controller.get_level,
+                   speed_multiplier=score_controller.get_speed_multiplier,
+                   scroll_offset=platform_manager.scroll_offset,
+                   game_over=simulation.is_game_over)
+
+    def interpolated_player_position(self, time_scale : float = 1) -> (float, float):
+        """
+        :param time_scale: the speed of the simulation relative to real time
+        :return: the player position between the previous and the current step, by the time since the snapshot was published
+        """
+        alpha : float = 1 if self.game_over else \
+            min(1.0, (perf_counter() - self.published_time) * 1000 * time_scale / self.step_delta)
+        (previous_x, previous_y), (x_coord, y_coord) = self.previous_player_position, self.player_position
+        return previous_x + (x_coord - previous_x) * alpha, previous_y + (y_coord - previous_y) * alpha
+
+class SimulationThread:
+    """
+    Steps a simulation on its own thread at the fixed tick rate, so slow blits and display flips do not delay
+    the physics. After every step an immutable snapshot is built aside and published by swapping a single
+    reference: the render loop reads the newest complete state without locking and never waits for a step.
+    The thread stops stepping at game over or at the tick limit of the simulation, like advance.
+    """
+
+    def __init__(self, simulation : GameSimulation, time_scale : float = 1,
+                 input_listener : Callable[[int, PlayerInput], None] = None):
+        """
+        :param time_scale: multiplies the simulation speed, above 1 to replay faster than real time
+        :param input_listener: called on the simulation thread with the tick and the input of each step
+        """
+        self.simulation : GameSimulation = simulation
+        self.time_scale : float = time_scale
+        self.input_listener : Callable[[int, PlayerInput], None] = input_listener
+
+        # Input of the next steps, None to ask the input provider of the simulation on each step
+        self.player_input : PlayerInput = None if simulation.input_provider is not None else PlayerInput()
+
+        # Newest published snapshot
+        self.snapshot : SimulationSnapshot = SimulationSnapshot.capture(simulation)
+
+        self._running : threading.Event = threading.Event()
+        self._running.set()
+        self._stopped : bool = False
+        self._thread : threading.Thread = threading.Thread(target=self.run, name='simulation', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def set_input(self, player_input : PlayerInput) -> None:
+        self.player_input = player_input
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def join(self) -> None:
+        """
+        Waits for the thread to end, the simulation may then be read from the calling thread
+        """
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._running.set()
+        self.join()
+
+    def run(self) -> None:
+        simulation : GameSimulation = self.simulation
+        step : float = simulation.step_delta / 1000 / self.time_scale # s
+        next_tick : float = perf_counter()
+        while not self._stopped:
+            if not self._running.is_set():
+                # Paused, the paused time is not caught up
+                self._running.wait()
+                next_tick = perf_counter()
+                continue
+            if simulation.is_game_over or (simulation.tick_limit is not None and simulation.ticks >= simulation.tick_limit):
+                break
+
+            wait : float = next_tick - perf_counter()
+            if wait > 0:
+                sleep(wait)
+            player_input : PlayerInput = self.player_input
+            if simulation.step(simulation.step_delta, player_input) and player_input is not None and self.player_input is player_input:
+                # The jump is consumed, the next steps wait for the input of the next frame to jump again
+                self.player_input = replace(player_input, jump=False)
+            if self.input_listener is not None:
+                self.input_listener(simulation.ticks - 1, simulation.last_input)
+            self.snapshot = SimulationSnapshot.capture(simulation)
+
+            # Drop the steps that can no longer be caught up, like the frame delta limit of advance
+            next_tick = max(next_tick + step, perf_counter() - configuration.max_frame_delta / 1000)
+#endregion
+
+#region Recording
+def encode_varint(value : int, data : bytearray) -> None:
+    """
+    Appends the unsigned value as LEB128, 7 bits per byte, the high bit marks a following byte
+    """
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+def decode_varint(data : bytes, offset : int) -> (int, int):
+    """
+    :return: the unsigned LEB128 value at the offset and the offset after it
+    """
+    value : int = 0
+    shift : int = 0
+    while True:
+        byte : int = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+class InputRecording:
+    """
+    Per-tick player input of a session with the seed of its tower, stored as runs of identical input states.
+
+    Binary file layout (little endian): the magic and version, seed (int64), step delta (float64),
+    recorded outcome (score uint32, level uint32, ticks uint32, game over uint8), number of runs (uint32),
+    then each run as an input state byte followed by its length as an unsigned LEB128 varint.
+    """
+
+    magic : bytes = b'ITRC'
+    version : int = 1
+    _header : struct.Struct = struct.Struct('<4sBqdIIIBI')
+
+    # Input state bits
+    left_bit : int = 1
+    right_bit : int = 2
+    jump_bit : int = 4
+
+    # Decoded input of each state, shared by all ticks
+    _inputs : tuple = tuple(PlayerInput(left=bool(state & 1), right=bool(state & 2), jump=bool(state & 4)) for state in range(8))
+
+    def __init__(self, seed : int, step_delta : float, runs : list = None, result : SimulationResult = None):
+        """
+        :param seed: seed of the recorded tower
+        :param step_delta: fixed simulation step of the recorded session (ms)
+        :param runs: list of [input state, number of ticks]
+        :param result: the recorded outcome, compared against replays
+        """
+        self.seed : int = seed
+        self.step_delta : float = step_delta
+        self.runs : list = runs if runs is not None else []
+        self.result : SimulationResult = result
+
+    @classmethod
+    def encode_input(cls, player_input : PlayerInput) -> int:
+        return ((cls.left_bit if player_input.left else 0) | (cls.right_bit if player_input.right else 0) |
+                (cls.jump_bit if player_input.jump else 0))
+
+    @classmethod
+    def decode_input(cls, state : int) -> PlayerInput:
+        return cls._inputs[state]
+
+    def append(self, player_input : PlayerInput) -> None:
+        """
+        Records the input of the next tick
+        """
+        state : int = self.encode_input(player_input)
+        if self.runs and self.runs[-1][0] == state:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([state, 1])
+
+    @property
+    def tick_count(self) -> int:
+        return sum(length for _, length in self.runs)
+
+    def iter_inputs(self) -> Iterator[PlayerInput]:
+        """
+        :return: an iterator over the input of each tick
+        """
+        for state, length in self.runs:
+            player_input : PlayerInput = self._inputs[state]
+            for _ in range(length):
+                yield player_input
+
+    def save(self, file_path : str, result : SimulationResult = None) -> None:
+        """
+        :param file_path: the recording file
+        :param result: the outcome of the session, the stored result if None
+        """
+        self.result = result if result is not None else self.result
+        recorded : SimulationResult = self.result if self.result is not None else SimulationResult()
+        data : bytearray = bytearray(self._header.pack(self.magic, self.version, self.seed, self.step_delta,
+                                                       recorded.score, recorded.level, recorded.ticks,
+                                                       recorded.game_over, len(self.runs)))
+        for state, length in self.runs:
+            data.append(state)
+            encode_varint(length, data)
+        with open(file_path, 'wb') as recording_file:
+            recording_file.write(data)
+
+    @classmethod
+    def load(cls, file_path : str) -> 'InputRecording':
+        with open(file_path, 'rb') as recording_file:
+            data : bytes = recording_file.read()
+        magic, version, seed, step_delta, score, level, ticks, game_over, run_count = cls._header.unpack_from(data)
+        if magic != cls.magic or version != cls.version:
+            raise ValueError(f'{file_path} is not an input recording of version {cls.version}')
+
+        runs : list = []
+        offset : int = cls._header.size
+        for _ in range(run_count):
+            state : int = data[offset]
+            length, offset = decode_varint(data, offset + 1)
+            runs.append([state, length])
+
+        result : SimulationResult = SimulationResult(score=score, level=level, ticks=ticks, game_over=bool(game_over), seed=seed)
+        return cls(seed, step_delta, runs, result)
+
+class InputReplay:
+    """
+    Input provider feeding a recording back tick by tick, the input is idle once the recording is exhausted
+    """
+
+    def __init__(self, recording : InputRecording):
+        self.recording : InputRecording = recording
+        self._inputs : Iterator[PlayerInput] = recording.iter_inputs()
+        self.finished : bool = False
+
+    def __call__(self, simulation : GameSimulation) -> PlayerInput:
+        player_input : PlayerInput = next(self._inputs, None)
+        if player_input is None:
+            self.finished = True
+            return PlayerInput()
+        return player_input
+
+def replay_headless(recording : InputRecording) -> SimulationResult:
+    """
+    Replays the recording on a headless simulation as fast as possible
+    :return: the outcome of the replay
+    """
+    simulation : GameSimulation = GameSimulation(seed=recording.seed, step_delta=recording.step_delta)
+    for player_input in recording.iter_inputs():
+        simulation.step(recording.step_delta, player_input)
+    return simulation.result()
+
+def replay_matches(recording : InputRecording, result : SimulationResult) -> bool:
+    """
+    :return: True if the replay outcome equals the recorded outcome
+    """
+    recorded : SimulationResult = recording.result
+    return recorded is not None and (recorded.score, recorded.level, recorded.ticks, recorded.game_over) == \
+        (result.score, result.level, result.ticks, result.game_over)
+#endregion
+
+#region Environment
+class GameEnvironment:
+    """
+    Headless game as an agent environment with a Gym-style reset and step.
+
+    An action is an input state of InputRecording (left 1, right 2, jump 4, combined as bits), held for
+    action_repeat simulation ticks. The reward is the score gained during the step, an episode terminates with
+    the game over and is truncated after max_ticks ticks.
+
+    An observation is a float32 array of the player x, y (normalized by the window size), jumping up, jumping down,
+    jump allowed and speed multiplier, followed by the x, y and width (normalized) of the nearest platforms
+    by vertical distance, zero padded when there are fewer platforms.
+    """
+
+    action_count : int = 8
+    player_features : int = 6
+    platform_features : int = 3
+
+    def __init__(self, action_repeat : int = configuration.environment_action_repeat,
+                 observed_platforms : int = configuration.environment_observed_platforms,
+                 max_ticks : int = configuration.headless_max_ticks):
+        self.action_repeat : int = action_repeat
+        self.observed_platforms : int = observed_platforms
+        self.max_ticks : int = max_ticks
+        self.observation_shape : (int,) = (self.player_features + self.platform_features * observed_platforms,)
+        self.simulation : GameSimulation = None
+        self.random : random.Random = random.Random()
+        self._scale : np.ndarray = None
+
+    def reset(self, seed : int = None) -> (np.ndarray, dict):
+        """
+        Starts a new episode
+        :param seed: seed of the tower, also reseeds the towers of the following episodes; None for the next tower
+        :return: the first observation and the episode info
+        """
+        if seed is not None:
+            self.random.seed(seed)
+        else:
+            seed = self.random.randrange(2 ** 32)
+        self.simulation = GameSimulation(seed=seed)
+        width, height = self.simulation.platform_manager.window_size
+        self._scale = np.array([width, height, width], dtype=np.float32)
+        return self.observe(), self.get_info()
+
+    def step(self, action : int) -> (np.ndarray, float, bool, bool, dict):
+        """
+        :param action: the input state held during the step, in [0, action_count)
+        :return: observation, reward, terminated, truncated and info
+        """
+        if not isinstance(action, numbers.Integral) or not 0 <= action < self.action_count:
+            raise ValueError(f'Invalid action {action}, the actions are 0 to {self.action_count - 1}')
+        simulation : GameSimulation = self.simulation
+        player_input : PlayerInput = InputRecording.decode_input(int(action))
+        score : int = simulation.score_controller.get_score
+        for _ in range(self.action_repeat):
+            simulation.step(simulation.step_delta, player_input)
+            if simulation.is_game_over or simulation.ticks >= self.max_ticks:
+                break
+        terminated : bool = simulation.is_game_over
+        truncated : bool = not terminated and simulation.ticks >= self.max_ticks
+        return self.observe(), float(simulation.score_controller.get_score - score), terminated, truncated, self.get_info()
+
+    def observe(self, observation : np.ndarray = None) -> np.ndarray:
+        """
+        :param observation: the array the observation is written to, a new array if None
+        :return: the observation of the current state
+        """
+        observation = np.zeros(self.observation_shape, dtype=np.float32) if observation is None else observation
+        player : Player = self.simulation.player
+        store : PlatformStore = self.simulation.platform_manager.store
+        width, height = self._scale[0], self._scale[1]
+        observation[:self.player_features] = (player.x_coord / width, player.y_coord / height,
+                                              player.player_jumping_state == PlayerJumpState.jumping_up,
+                                              player.player_jumping_state == PlayerJumpState.jumping_down,
+                                              player.allow_jumping, self.simulation.score_controller.get_speed_multiplier)
+
+        slots : np.ndarray = np.flatnonzero(store.active)
+        if len(slots) > self.observed_platforms:
+            distances : np.ndarray = np.abs(store.y_coord[slots] - player.y_coord)
+            slots = slots[np.argpartition(distances, self.observed_platforms)[:self.observed_platforms]]
+        slots = slots[np.argsort(np.abs(store.y_coord[slots] - player.y_coord), kind='stable')]
+        platforms : np.ndarray = observation[self.player_features:].reshape(self.observed_platforms, self.platform_features)
+        platforms[:len(slots), 0] = store.x_coord[slots]
+        platforms[:len(slots), 1] = store.y_coord[slots]
+        platforms[:len(slots), 2] = store.width[slots]
+        platforms[:len(slots)] /= self._scale
+        platforms[len(slots):] = 0
+        return observation
+
+    def get_info(self) -> dict:
+        return {'score' : self.simulation.score_controller.get_score, 'level' : self.simulation.score_controller.get_level,
+                'ticks' : self.simulation.ticks, 'seed' : self.simulation.seed}
+
+class VectorGameEnvironment:
+    """
+    A batch of game environments stepped together in one process. Observations, rewards and flags are returned
+    as arrays with one row per environment. An environment whose episode ended is reset on the same step,
+    its last observation and info are kept in the info under 'final_observation' and 'final_info'.
+    """
+
+    def __init__(self, count : int, action_repeat : int = configuration.environment_action_repeat,
+                 observed_platforms : int = configuration.environment_observed_platforms,
+                 max_ticks : int = configuration.headless_max_ticks):
+        self.environments : list[GameEnvironment] = [GameEnvironment(action_repeat, observed_platforms, max_ticks)
+                                                     for _ in range(count)]
+        self.count : int = count
+        self.observation_shape : (int, int) = (count,) + self.environments[0].observation_shape
+
+        # Reused batch buffers, the returned observations are copies
+        self._observations : np.ndarray = np.zeros(self.observation_shape, dtype=np.float32)
+        self._rewards : np.ndarray = np.zeros(count, dtype=np.float32)
+        self._terminated : np.ndarray = np.zeros(count, dtype=bool)
+        self._truncated : np.ndarray = np.zeros(count, dtype=bool)
+
+    def reset(self, seed : int = None) -> (np.ndarray, list[dict]):
+        """
+        :param seed: seed of the first environment, the others use the next seeds; None for random towers
+        :return: the observations and the info of each environment
+        """
+        infos : list[dict] = []
+        for index, environment in enumerate(self.environments):
+            self._observations[index], info = environment.reset(None if seed is None else seed + index)
+            infos.append(info)
+        return self._observations.copy(), infos
+
+    def step(self, actions : np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray, list[dict]):
+        """
+        :param actions: the action of each environment
+        :return: observations, rewards, terminated and truncated flags, and the info of each environment
+        """
+        infos : list[dict] = []
+        for index, (environment, action) in enumerate(zip(self.environments, np.asarray(actions).tolist())):
+            observation, reward, terminated, truncated, info = environment.step(action)
+            if terminated or truncated:
+                self._observations[index], reset_info = environment.reset()
+                info = dict(reset_info, final_observation=observation, final_info=info)
+            else:
+                self._observations[index] = observation
+            self._rewards[index] = reward
+            self._terminated[index] = terminated
+            self._truncated[index] = truncated
+            infos.append(info)
+        return self._observations.copy(), self._rewards.copy(), self._terminated.copy(), self._truncated.copy(), infos
+#endregion
+
+#region Network
+@dataclass
+class NetworkPlayerState:
+    """
+    State of a player as sent in snapshots
+    """
+    x_coord : float = 0
+    y_coord : float = 0
+    scroll_offset : float = 0 # Accumulated platform scroll of the player's tower
+    score : int = 0
+    level : int = 1
+    animation : PlayerAnimationState = PlayerAnimationState.idle
+    game_over : bool = False
+
+class SnapshotCodec:
+    """
+    Binary snapshots of the players of a match, delta compressed against the previous snapshot of the same connection.
+
+    A snapshot is the message type, the server tick (uint32) and the number of players (uint8), then for each player
+    its id (uint8), a bit mask of the changed fields (uint8) and the change of each changed field as a zigzag LEB128
+    varint. Positions are sent in fixed point. The stream is ordered and reliable (TCP), so the previous snapshot is
+    always the baseline and no acknowledgements are needed.
+    """
+
+    animations : tuple = tuple(PlayerAnimationState)
+    field_count : int = 7
+    _header : struct.Struct = struct.Struct('<BIB')
+
+    def __init__(self):
+        self._baselines : dict = {} # player id -> field values of the previous snapshot
+
+    @staticmethod
+    def to_fields(state : NetworkPlayerState) -> tuple:
+        position_scale : int = configuration.network_position_scale
+        return (round(state.x_coord * position_scale), round(state.y_coord * position_scale),
+                round(state.scroll_offset * position_scale), state.score, state.level,
+                SnapshotCodec.animations.index(state.animation), int(state.game_over))
+
+    @staticmethod
+    def from_fields(fields : tuple) -> NetworkPlayerState:
+        position_scale : int = configuration.network_position_scale
+        return NetworkPlayerState(fields[0] / position_scale, fields[1] / position_scale, fields[2] / position_scale,
+                                  fields[3], fields[4], SnapshotCodec.animations[fields[5]], bool(fields[6]))
+
+    def encode(self, tick : int, states : dict) -> bytes:
+        """
+        :param states: player id -> NetworkPlayerState
+        """
+        data : bytearray = bytearray(self._header.pack(MatchServer.snapshot_message, tick, len(states)))
+        for player_id, state in states.items():
+            fields : tuple = self.to_fields(state)
+            baseline : tuple = self._baselines.get(player_id, (0,) * len(fields))
+            mask : int = 0
+            for index, (value, previous) in enumerate(zip(fields, baseline)):
+                if value != previous:
+                    mask |= 1 << index
+            data.append(player_id)
+            data.append(mask)
+            for value, previous in zip(fields, baseline):
+                if value != previous:
+                    change : int = value - previous
+                    encode_varint(change << 1 if change >= 0 else (-change << 1) - 1, data)
+            self._baselines[player_id] = fields
+        return bytes(data)
+
+    def decode(self, data : bytes) -> (int, dict):
+        """
+        :return: the server tick and player id -> NetworkPlayerState
+        """
+        _, tick, count = self._header.unpack_from(data)
+        offset : int = self._header.size
+        states : dict = {}
+        for _ in range(count):
+            player_id, mask = data[offset], data[offset + 1]
+            offset += 2
+            fields : list = list(self._baselines.get(player_id, (0,) * self.field_count))
+            for index in range(len(fields)):
+                if mask & (1 << index):
+                    change, offset = decode_varint(data, offset)
+                    fields[index] += change >> 1 if not change & 1 else -((change + 1) >> 1)
+            self._baselines[player_id] = tuple(fields)
+            states[player_id] = self.from_fields(fields)
+        return tick, states
+
+class NetworkConnection:
+    """
+    A non-blocking TCP connection exchanging messages framed by their length (uint16). Sending is locked,
+    so a simulation thread may send while the render loop flushes and receives.
+    """
+
+    _length : struct.Struct = struct.Struct('<H')
+
+    def __init__(self, connection : socket.socket):
+        connection.setblocking(False)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket : socket.socket = connection
+        self.closed : bool = False
+        self.bytes_sent : int = 0
+        self.bytes_received : int = 0
+        self._incoming : bytearray = bytearray()
+        self._outgoing : bytearray = bytearray()
+        self._send_lock : threading.Lock = threading.Lock()
+
+    def send(self, message : bytes, flush : bool = True) -> None:
+        with self._send_lock:
+            self._outgoing += self._length.pack(len(message))
+            self._outgoing += message
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._send_lock:
+            if self.closed or not self._outgoing:
+                return
+            try:
+                sent : int = self.socket.send(self._outgoing)
+            except BlockingIOError:
+                return
+            except OSError:
+                self.close()
+                return
+            self.bytes_sent += sent
+            del self._outgoing[:sent]
+
+    def receive(self) -> list[bytes]:
+        """
+        :return: the complete messages received since the last call
+        """
+        while not self.closed:
+            try:
+                data : bytes = self.socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b''
+            if not data:
+                self.close()
+                break
+            self.bytes_received += len(data)
+            self._incoming += data
+
+        messages : list[bytes] = []
+        offset : int = 0
+        while len(self._incoming) - offset >= self._length.size:
+            length : int = self._length.unpack_from(self._incoming, offset)[0]
+            if len(self._incoming) - offset - self._length.size < length:
+                break
+            offset += self._length.size
+            messages.append(bytes(self._incoming[offset:offset + length]))
+            offset += length
+        del self._incoming[:offset]
+        return messages
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.socket.close()
+
+def get_network_player_state(simulation : GameSimulation) -> NetworkPlayerState:
+    player : Player = simulation.player
+    return NetworkPlayerState(player.x_coord, player.y_coord, simulation.platform_manager.scroll_offset,
+                              simulation.score_controller.get_score, simulation.score_controller.get_level,
+                              player.character_animation_controller.current_animation, simulation.is_game_over)
+
+class NetworkMatch:
+    """
+    Two players racing up towers of the same seed, each simulated by the server from the input of its client
+    """
+
+    def __init__(self, connections : list[NetworkConnection], seed : int = None, start_delay : int = 0):
+        """
+        :param start_delay: number of ticks between the last player being ready and the first step of the match
+        """
+        self.seed : int = seed if seed is not None else random.randrange(2 ** 32)
+        self.connections : list[NetworkConnection] = connections
+        self.simulations : list[GameSimulation] = [GameSimulation(seed=self.seed) for _ in connections]
+        self.inputs : list[PlayerInput] = [PlayerInput() for _ in connections]
+        # Received input changes not applied yet, as (client tick, input state)
+        self.pending_inputs : list[deque] = [deque() for _ in connections]
+        self.ready : list[bool] = [False for _ in connections]
+        self.start_delay : int = start_delay
+        self.codecs : list[SnapshotCodec] = [SnapshotCodec() for _ in connections]
+        self.ticks : int = 0
+        self.cpu_time : float = 0 # s, thread CPU time spent on the match
+        self.finished : bool = False
+
+    def is_player_finished(self, player_id : int) -> bool:
+        return self.connections[player_id].closed or self.simulations[player_id].is_game_over
+
+class MatchServer:
+    """
+    Authoritative head-to-head server. Clients are paired into matches in the order they connect, each match
+    is stepped at the simulation tick rate and sends each client a snapshot of both players at the snapshot rate.
+    Many matches share one thread.
+
+    Clients send their input changes stamped with the tick of their own simulation. A match starts
+    network_input_delay after both clients are ready to simulate, so the server normally holds a change before reaching its tick and
+    steps exactly the input sequence the client predicted; a change arriving late is applied at once.
+    """
+
+    # Message types
+    welcome_message : int = 1
+    input_message : int = 2
+    snapshot_message : int = 3
+    end_message : int = 4
+    ready_message : int = 5
+
+    _welcome : struct.Struct = struct.Struct('<BBqHH')
+    _input : struct.Struct = struct.Struct('<BIB')
+
+    def __init__(self, host : str = configuration.network_host, port : int = configuration.network_port,
+                 snapshot_rate : int = configuration.network_snapshot_rate, seed : int = None):
+        """
+        :param port: the listening port, 0 for any free port (see address)
+        :param seed: seed of the first match, the following matches use the next seeds; random towers if None
+        """
+        self.listener : socket.socket = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.address : (str, int) = self.listener.getsockname()
+        self.step_delta : float = configuration.simulation_step_delta
+        self.snapshot_interval : int = max(1, round(configuration.simulation_tick_rate / snapshot_rate))
+        self.start_delay : int = round(configuration.network_input_delay / self.step_delta)
+        self.seed : int = seed
+        self.waiting : list[NetworkConnection] = []
+        self.matches : list[NetworkMatch] = []
+        self.finished_matches : list[NetworkMatch] = []
+        self._selector : selectors.DefaultSelector = selectors.DefaultSelector()
+        self._selector.register(self.listener, selectors.EVENT_READ)
+        self._running : bool = True
+
+    def accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except BlockingIOError:
+                return
+            # Client sockets are read by the ticks of their match, only the listener wakes the selector
+            self.waiting.append(NetworkConnection(connection))
+            if len(self.waiting) == 2:
+                self.start_match(self.waiting)
+                self.waiting = []
+
+    def start_match(self, connections : list[NetworkConnection]) -> None:
+        match_seed : int = None if self.seed is None else self.seed + len(self.matches) + len(self.finished_matches)
+        match : NetworkMatch = NetworkMatch(connections, match_seed, self.start_delay)
+        for player_id, connection in enumerate(connections):
+            connection.send(self._welcome.pack(self.welcome_message, player_id, match.seed,
+                                               configuration.simulation_tick_rate, self.snapshot_interval))
+        self.matches.append(match)
+
+    def read_inputs(self, match : NetworkMatch) -> None:
+        for player_id, connection in enumerate(match.connections):
+            for message in connection.receive():
+                if message[0] == self.input_message:
+                    _, tick, state = self._input.unpack(message)
+                    match.pending_inputs[player_id].append((tick, state & 7))
+                elif message[0] == self.ready_message:
+                    match.ready[player_id] = True
+            # Apply the changes due at the next step of the player
+            pending : deque = match.pending_inputs[player_id]
+            while pending and pending[0][0] <= match.simulations[player_id].ticks:
+                match.inputs[player_id] = InputRecording.decode_input(pending.popleft()[1])
+
+    def tick(self, match : NetworkMatch) -> None:
+        """
+        Steps the players of the match once, sends the snapshots on snapshot ticks and ends the finished match
+        """
+        cpu_start : float = thread_time()
+        self.read_inputs(match)
+        waiting : bool = not all(ready or connection.closed for ready, connection in zip(match.ready, match.connections))
+        if waiting or match.start_delay > 0:
+            match.start_delay -= 0 if waiting else 1
+            match.cpu_time += thread_time() - cpu_start
+            return
+        for player_id, simulation in enumerate(match.simulations):
+            if not match.is_player_finished(player_id):
+                simulation.step(self.step_delta, match.inputs[player_id])
+        match.ticks += 1
+
+        match.finished = all(match.is_player_finished(player_id) for player_id in range(len(match.connections))) or \
+                         match.ticks >= configuration.headless_max_ticks
+        if match.finished or match.ticks % self.snapshot_interval == 0:
+            states : dict = {player_id : get_network_player_state(simulation)
+                             for player_id, simulation in enumerate(match.simulations)}
+            for codec, connection in zip(match.codecs, match.connections):
+                connection.send(codec.encode(match.ticks, states))
+                if match.finished:
+                    connection.send(bytes([self.end_message]))
+        match.cpu_time += thread_time() - cpu_start
+
+    def serve(self, duration : float = None) -> None:
+        """
+        Runs the matches in real time until stopped or the duration elapsed
+        :param duration: the serving time in s, None to serve until stop is called
+        """
+        step : float = self.step_delta / 1000
+        start_time : float = perf_counter()
+        next_tick : float = start_time
+        while self._running and (duration is None or perf_counter() - start_time < duration):
+            for key, _ in self._selector.select(max(0.0, next_tick - perf_counter())):
+                if key.fileobj is self.listener:
+                    self.accept()
+            while perf_counter() >= next_tick:
+                for match in self.matches:
+                    self.tick(match)
+                for match in [match for match in self.matches if match.finished]:
+                    self.end_match(match)
+                next_tick += step
+            for match in self.matches:
+                for connection in match.connections:
+                    connection.flush()
+        self.close()
+
+    def end_match(self, match : NetworkMatch) -> None:
+        """
+        Sends the last snapshot and the end of the match, then closes its connections, the match is kept for the statistics
+        """
+        self.matches.remove(match)
+        self.finished_matches.append(match)
+        for connection in match.connections:
+            connection.flush()
+            connection.close()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def close(self) -> None:
+        for match in self.matches:
+            for connection in match.connections:
+                connection.close()
+        for connection in self.waiting:
+            connection.close()
+        self._selector.close()
+        self.listener.close()
+
+    def get_stats(self) -> dict:
+        """
+        :return: bandwidth per client and CPU time per match, ready for JSON
+        """
+        matches : list[NetworkMatch] = self.finished_matches + self.matches
+        match_seconds : float = sum(match.ticks for match in matches) * self.step_delta / 1000
+        connections : list[NetworkConnection] = [connection for match in matches for connection in match.connections]
+        cpu_ms_per_match_second : float = 1000 * sum(match.cpu_time for match in matches) / max(match_seconds, 1e-9)
+        return {'matches' : len(matches),
+                'match_seconds' : match_seconds,
+                'snapshot_rate' : configuration.simulation_tick_rate / self.snapshot_interval,
+                'downstream_bytes_per_client_second' : sum(connection.bytes_sent for connection in connections) / max(match_seconds * len(connections), 1e-9),
+                'upstream_bytes_per_client_second' : sum(connection.bytes_received for connection in connections) / max(match_seconds * len(connections), 1e-9),
+                'server_cpu_ms_per_match_second' : cpu_ms_per_match_second,
+                'matches_per_core' : 1000 / max(cpu_ms_per_match_second, 1e-9)}
+
+class MatchClient:
+    """
+    Client of a head-to-head match. Sends the local input when it changes and keeps the recent snapshots,
+    the players are interpolated between the snapshots surrounding a render tick shortly behind the latest one.
+    """
+
+    def __init__(self, host : str = configuration.network_host, port : int = configuration.network_port):
+        self.connection : NetworkConnection = NetworkConnection(socket.create_connection((host, port)))
+        self.codec : SnapshotCodec = SnapshotCodec()
+        self.player_id : int = None
+        self.seed : int = None
+        self.tick_rate : int = configuration.simulation_tick_rate
+        self.snapshot_interval : int = 1
+        self.ended : bool = False
+        self.snapshots : deque = deque(maxlen=configuration.network_snapshot_buffer) # (server tick, player id -> state)
+        self._latest_arrival : float = 0
+        self._input_state : int = None
+
+    def wait_for_match(self, timeout : float = None) -> bool:
+        """
+        Blocks until the server paired this client with an opponent
+        :return: True when the match started
+        """
+        deadline : float = math.inf if timeout is None else perf_counter() + timeout
+        while self.player_id is None and not self.connection.closed and perf_counter() < deadline:
+            select.select([self.connection.socket], [], [], min(0.1, max(0.0, deadline - perf_counter())))
+            self.poll()
+        return self.player_id is not None
+
+    def send_ready(self) -> None:
+        """
+        Tells the server the local simulation starts, the match starts when both players are ready
+        """
+        self.connection.send(bytes([MatchServer.ready_message]))
+
+    def send_input(self, tick : int, player_input : PlayerInput, flush : bool = True) -> None:
+        """
+        Sends the input when it changed
+        :param tick: the tick of the local simulation from which the input applies
+        :param flush: write to the socket now, else the input waits for the next flush
+        """
+        state : int = InputRecording.encode_input(player_input)
+        if state != self._input_state:
+            self.connection.send(MatchServer._input.pack(MatchServer.input_message, tick, state), flush)
+            self._input_state = state
+        elif flush:
+            self.connection.flush()
+
+    def poll(self) -> None:
+        for message in self.connection.receive():
+            if message[0] == MatchServer.welcome_message:
+                _, self.player_id, self.seed, self.tick_rate, self.snapshot_interval = MatchServer._welcome.unpack(message)
+            elif message[0] == MatchServer.snapshot_message:
+                self.snapshots.append(self.codec.decode(message))
+                self._latest_arrival = perf_counter()
+            elif message[0] == MatchServer.end_message:
+                self.ended = True
+        self.ended = self.ended or self.connection.closed
+
+    def get_render_tick(self) -> float:
+        """
+        :return: the server tick to draw, interpolation_snapshots snapshot intervals behind the latest snapshot
+        """
+        latest_tick : int = self.snapshots[-1][0]
+        elapsed_ticks : float = min((perf_counter() - self._latest_arrival) * self.tick_rate, self.snapshot_interval)
+        return latest_tick + elapsed_ticks - configuration.network_interpolation_snapshots * self.snapshot_interval
+
+    def get_player_state(self, player_id : int, render_tick : float = None) -> NetworkPlayerState:
+        """
+        :param render_tick: the server tick to interpolate at, get_render_tick if None
+        :return: the interpolated state of the player, None before the first snapshot
+        """
+        if not self.snapshots:
+            return None
+        render_tick = self.get_render_tick() if render_tick is None else render_tick
+        previous_tick, previous_states = self.snapshots[0]
+        if render_tick <= previous_tick:
+            return previous_states.get(player_id)
+        for tick, states in self.snapshots:
+            if tick >= render_tick:
+                before : NetworkPlayerState = previous_states.get(player_id)
+                after : NetworkPlayerState = states.get(player_id)
+                if before is None or after is None:
+                    return after
+                alpha : float = (render_tick - previous_tick) / (tick - previous_tick)
+                return NetworkPlayerState(before.x_coord + (after.x_coord - before.x_coord) * alpha,
+                                          before.y_coord + (after.y_coord - before.y_coord) * alpha,
+                                          before.scroll_offset + (after.scroll_offset - before.scroll_offset) * alpha,
+                                          after.score, after.level, after.animation, after.game_over)
+            previous_tick, previous_states = tick, states
+        return previous_states.get(player_id)
+
+    @property
+    def rival_id(self) -> int:
+        return 1 - self.player_id
+
+    def get_results(self) -> dict:
+        """
+        :return: the authoritative score of each player from the latest snapshot
+        """
+        if not self.snapshots:
+            return {}
+        return {player_id : state.score for player_id, state in self.snapshots[-1][1].items()}
+
+    def close(self) -> None:
+        self.connection.close()
+
+def run_network_bot(host : str, port : int, input_provider : Callable[[GameSimulation], PlayerInput] = platform_climber_input,
+                    frame_rate : float = configuration.target_FPS, duration : float = None) -> dict:
+    """
+    Plays a match as a headless client. The input provider plays a local simulation of the tower in real time
+    and each input change is sent stamped with its tick, the changes of a frame are flushed together.
+    :param duration: the maximum playing time in s, None to play until the match ends
+    :return: the authoritative results of the match
+    """
+    client : MatchClient = MatchClient(host, port)
+    if not client.wait_for_match(timeout=duration):
+        client.close()
+        return {}
+    simulation : GameSimulation = GameSimulation(seed=client.seed)
+
+    def send_input(simulation : GameSimulation) -> PlayerInput:
+        player_input : PlayerInput = input_provider(simulation)
+        client.send_input(simulation.ticks, player_input, flush=False)
+        return player_input
+
+    simulation.input_provider = send_input
+    client.send_ready()
+    start_time : float = perf_counter()
+    last_time : float = start_time
+    while not client.ended and (duration is None or perf_counter() - start_time < duration):
+        now : float = perf_counter()
+        simulation.advance((now - last_time) * 1000)
+        last_time = now
+        client.connection.flush()
+        client.poll()
+        sleep(max(0.0, 1 / frame_rate - (perf_counter() - now)))
+    results : dict = client.get_results()
+    client.close()
+    return results
+
+def run_network_benchmark(duration : float = configuration.network_benchmark_seconds, matches : int = 1,
+                          seed : int = configuration.benchmark_seed) -> dict:
+    """
+    Serves matches of climber bots on localhost for the duration
+    :return: the server bandwidth and CPU statistics and the results of each bot
+    """
+    server : MatchServer = MatchServer(port=0, seed=seed)
+    server_thread : threading.Thread = threading.Thread(target=server.serve, args=(duration + 1,), name='server')
+    server_thread.start()
+    bot_results : list = [None] * (2 * matches)
+
+    def play(index : int) -> None:
+        bot_results[index] = run_network_bot(*server.address, duration=duration)
+
+    bots : list[threading.Thread] = [threading.Thread(target=play, args=(index,), name=f'bot-{index}') for index in range(2 * matches)]
+    for bot in bots:
+        bot.start()
+    for bot in bots:
+        bot.join()
+    server.stop()
+    server_thread.join()
+    return dict(server.get_stats(), bot_results=bot_results)
+#endregion
+
+#region Profiling
+class FrameProfiler:
+    """
+    Times the consecutive stages of each frame with perf_counter marks.
+
+    A frame starts with start_frame, each mark attributes the time since the previous mark to a stage and
+    end_frame stores the frame in a rolling window (for the percentiles) and in chunked storage (for the CSV export).
+    All methods return immediately when the profiler is disabled.
+    """
+
+    # Number of frames per storage chunk of the CSV export
+    chunk_size : int = 4096
+
+    def __init__(self, stages : tuple, enabled : bool = configuration.profiler_enabled,
+                 window_size : int = configuration.profiler_window_size, track_allocations : bool = False):
+        """
+        :param stages: the stage names in frame order
+        :param enabled: False to disable all measurements
+        :param window_size: number of frames the percentiles are computed on
+        :param track_allocations: also count the allocations of each stage, tracemalloc must be tracing
+        """
+        self.stages : tuple = stages
+        self.enabled : bool = enabled
+        self._stage_index : dict = {stage : index for index, stage in enumerate(stages)}
+
+        # Rolling window, the first column is the full frame time
+        self._window : np.ndarray = np.zeros((window_size, len(stages) + 1))
+        self._window_row : int = 0
+        self._frame_count : int = 0
+
+        # All frames for the CSV export
+        self._chunks : list[np.ndarray] = []
+
+        # Current frame
+        self._current : list[float] = [0.0] * len(stages)
+        self._frame_start : float = None
+        self._last_mark : float = 0
+
+        # Allocations of each stage summed over all frames: net allocated blocks and transient peak bytes
+        self.track_allocations : bool = track_allocations
+        self._allocations : np.ndarray = np.zeros((len(stages), 2))
+        self._last_blocks : int = 0
+        self._last_traced : int = 0
+
+    def _reset_allocation_counters(self) -> None:
+        tracemalloc.reset_peak()
+        self._last_blocks = sys.getallocatedblocks()
+        self._last_traced = tracemalloc.get_traced_memory()[0]
+
+    def discard_frame(self) -> None:
+        """
+        Drops the running frame, e.g. after the game was idle
+        """
+        self._frame_start = None
+
+    def start_frame(self) -> None:
+        if not self.enabled:
+            return
+        now : float = perf_counter()
+        if self._frame_start is not None:
+            self._store_frame((now - self._frame_start) * 1000)
+        self._frame_start = now
+        self._last_mark = now
+        if self.track_allocations:
+            self._reset_allocation_counters()
+
+    def mark(self, stage : str) -> None:
+        """
+        Attributes the time since the previous mark to the stage
+        """
+        if not self.enabled:
+            return
+        now : float = perf_counter()
+        self._current[self._stage_index[stage]] += (now - self._last_mark) * 1000
+        if self.track_allocations:
+            peak : int = tracemalloc.get_traced_memory()[1]
+            self._allocations[self._stage_index[stage]] += (sys.getallocatedblocks() - self._last_blocks,
+                                                            peak - self._last_traced)
+            self._reset_allocation_counters()
+        self._last_mark = perf_counter()
+
+    def _store_frame(self, frame_time : float) -> None:
+        row : list = [frame_time] + self._current
+        self._window[self._window_row] = row
+        self._window_row = (self._window_row + 1) % len(self._window)
+
+        chunk_row : int = self._frame_count % self.chunk_size
+        if chunk_row == 0:
+            self._chunks.append(np.zeros((self.chunk_size, len(row))))
+        self._chunks[-1][chunk_row] = row
+
+        self._frame_count += 1
+        self._current = [0.0] * len(self.stages)
+
+    @property
+    def frame_count(self) -> int:
+        return self._frame_count
+
+    def get_window(self) -> np.ndarray:
+        """
+        :return: the frames of the rolling window, one row per frame, the frame time first then each stage (ms)
+        """
+        return self._window[:min(self._frame_count, len(self._window))]
+
+    def get_percentiles(self, percentiles : tuple = (50, 99)) -> dict:
+        """
+        :return: stage name -> percentiles of the stage time over the rolling window (ms), 'frame' for the full frame
+        """
+        window : np.ndarray = self.get_window()
+        if len(window) == 0:
+            return {}
+        values : np.ndarray = np.percentile(window, percentiles, axis=0)
+        return {name : tuple(values[:, column].tolist()) for column, name in enumerate(('frame',) + self.stages)}
+
+    def get_allocations_per_frame(self) -> dict:
+        """
+        :return: stage name -> mean net allocated blocks and mean transient peak of traced bytes per frame
+        """
+        frames : int = max(self._frame_count, 1)
+        return {stage : {'net_blocks' : float(self._allocations[index, 0] / frames),
+                         'peak_bytes' : float(self._allocations[index, 1] / frames)}
+                for index, stage in enumerate(self.stages)}
+
+    @property
+    def fps(self) -> float:
+        window : np.ndarray = self.get_window()
+        return 1000 / window[:, 0].mean() if len(window) else 0
+
+    def export_csv(self, csv_path : str = None) -> None:
+        """
+        Writes every recorded frame to a CSV file, one row per frame
+        :param csv_path: the CSV file, configuration.profiler_csv_path if None
+        """
+        csv_path = csv_path if csv_path is not None else configuration.profiler_csv_path
+        if not self.enabled or not csv_path or self._frame_count == 0:
+            return
+        frames : np.ndarray = np.concatenate(self._chunks)[:self._frame_count]
+        np.savetxt(csv_path, frames, delimiter=',', fmt='%.4f', comments='',
+                   header=','.join(('frame',) + self.stages))
+
+class ProfilerOverlay:
+    """
+    Renders the p50/p99 of each profiled stage and the FPS, refreshed at a fixed interval to keep its own cost low
+    """
+
+    def __init__(self, profiler : FrameProfiler, visible : bool = configuration.profiler_overlay,
+                 input_pipeline : 'InputPipeline' = None, pacer : 'FramePacer' = None):
+        """
+        :param input_pipeline: adds a row with the input-to-photon latency of the pipeline
+        :param pacer: adds a row with the frame time jitter and the missed deadlines of the pacer
+        """
+        self.profiler : FrameProfiler = profiler
+        self.input_pipeline : InputPipeline = input_pipeline
+        self.pacer : FramePacer = pacer
+        self.visible : bool = visible
+        self.font : font.Font = pygame.font.Font(None, configuration.profiler_font_size)
+        self._surface : surface = None
+        self._last_refresh : float = -math.inf
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+
+    def _render(self) -> surface:
+        # One row per stage, the percentiles are right aligned in their columns
+        rows : list[tuple] = [(f'FPS {self.profiler.fps:.1f}', 'p50', 'p99')]
+        for stage, (p50, p99) in self.profiler.get_percentiles().items():
+            rows.append((stage, f'{p50:.2f}', f'{p99:.2f}'))
+        latency : tuple = None if self.input_pipeline is None else self.input_pipeline.get_latency_percentiles()
+        if latency is not None:
+            rows.append(('input latency', f'{latency[0]:.2f}', f'{latency[1]:.2f}'))
+        if self.pacer is not None and len(self.pacer.get_window()):
+            pacing : dict = self.pacer.get_stats()
+            rows.append((f'{pacing["strategy"]} jitter / missed', f'{pacing["jitter_ms"]:.2f}', f'{pacing["missed_deadline_ratio"]:.0%}'))
+        cells : list[list[surface]] = [[self.font.render(text, True, (255, 255, 255)) for text in row] for row in rows]
+        column_widths : list[int] = [max(row[column].get_width() for row in cells) + 8 for column in range(3)]
+        line_height : int = self.font.get_linesize()
+
+        overlay : surface = surface.Surface((sum(column_widths) + 4, line_height * len(cells) + 8), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 160))
+        for row_index, row in enumerate(cells):
+            y_coord : int = 4 + row_index * line_height
+            overlay.blit(row[0], (4, y_coord))
+            overlay.blit(row[1], (column_widths[0] + column_widths[1] - row[1].get_width(), y_coord))
+            overlay.blit(row[2], (sum(column_widths) - row[2].get_width(), y_coord))
+        return overlay
+
+    def get_render_items(self) -> list[RenderItem]:
+        if not self.visible or not self.profiler.enabled:
+            return []
+        now : float = perf_counter() * 1000
+        if self._surface is None or now - self._last_refresh >= configuration.profiler_overlay_refresh:
+            self._surface = self._render()
+            self._last_refresh = now
+        return [RenderItem(self._surface, (0, configuration.platform_render_height), 'profiler')]
+#endregion
+
+#region Frame Pacing
+class FramePacing(Enum):
+    sleep = 'sleep' # clock.tick, sleeps until the frame deadline
+    busy_loop = 'busy_loop' # clock.tick_busy_loop, spins until the frame deadline
+    vsync = 'vsync' # the display flip waits for the vertical blank, clock.tick only measures
+
+class FramePacer:
+    """
+    Waits for the frame deadline with the selected strategy and measures every frame with perf_counter:
+    frame time jitter, missed deadlines and the wall and CPU time spent waiting.
+
+    Frame deltas are snapped to a whole number of frame periods and the difference is carried to the next frames,
+    up to the snap tolerance, so the simulation sees steady deltas without losing time. The period is the median
+    of the recent frame times, the actual cadence of the display or of the millisecond clock.
+    """
+
+    def __init__(self, strategy : FramePacing = FramePacing(configuration.frame_pacing),
+                 target_fps : float = configuration.target_FPS,
+                 snap_tolerance : float = configuration.frame_delta_snap_tolerance,
+                 missed_deadline_ratio : float = configuration.frame_missed_deadline_ratio,
+                 window_size : int = configuration.frame_pacing_window):
+        """
+        :param strategy: the waiting strategy, vsync falls back to sleep when the display has no vsync
+        :param snap_tolerance: the largest carried difference (ms), 0 to feed the measured deltas as is
+        :param missed_deadline_ratio: a frame longer than this many frame periods missed its deadline
+        :param window_size: number of frames the statistics are computed on
+        """
+        self.strategy : FramePacing = strategy
+        # Why the requested strategy was replaced by sleep, None if it was not
+        self.fallback_reason : str = None
+        self.target_fps : float = target_fps
+        self.period : float = 1000 / target_fps # ms
+        self.snap_tolerance : float = snap_tolerance
+        self.missed_deadline_ratio : float = missed_deadline_ratio
+        self.clock : Clock = time.Clock()
+
+        # Rolling window of frame time, wait time and wait CPU time (ms)
+        self._window : np.ndarray = np.zeros((window_size, 3))
+        self._window_row : int = 0
+        self._frame_count : int = 0
+        self.missed_deadlines : int = 0
+
+        # Measured frame time not yet fed to the simulation and the recent frame times the cadence is taken from (ms)
+        self._residual : float = 0
+        self._recent : deque = deque(maxlen=configuration.frame_delta_snap_frames)
+        self._last_frame : float = None
+
+    def open_window(self, size : (int, int)) -> surface:
+        """
+        Creates the window, with vsync for the vsync strategy (scaled window). The strategy falls back to sleep
+        when the window cannot be created or SDL warns that it has no hardware renderer, it then presents
+        without vsync. pygame cannot tell whether a hardware renderer honours vsync.
+        :return: the window surface
+        """
+        if self.strategy is FramePacing.vsync:
+            try:
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter('always')
+                    window : surface = display.set_mode(size, pygame.SCALED, vsync=1)
+            except pygame.error as error:
+                self.fallback_reason = str(error)
+            else:
+                if not caught:
+                    return window
+                self.fallback_reason = str(caught[0].message)
+            self.strategy = FramePacing.sleep
+        return display.set_mode(size)
+
+    def reset(self) -> None:
+        """
+        Restarts the frame timing, e.g. after the game was idle
+        """
+        self.clock.tick()
+        self._last_frame = None
+        self._residual = 0
+        self._recent.clear()
+
+    def wait(self, capped : bool = True, poll : Callable[[], None] = None,
+             poll_interval : float = configuration.input_poll_interval) -> float:
+        """
+        Waits for the frame deadline and measures the frame
+        With vsync the display flip blocks until the vertical blank, so the frame is only measured here.
+        :param capped: False to only measure, for runs without frame cap
+        :param poll: called every poll interval while waiting, e.g. to timestamp the input events
+        :param poll_interval: the interval between two polls (ms)
+        :return: the frame delta fed to the simulation (ms)
+        """
+        capped = capped and self.strategy is not FramePacing.vsync
+        wait_start : float = perf_counter()
+        cpu_start : float = thread_time()
+        if capped and poll is not None:
+            self.poll_until_deadline(poll, poll_interval / 1000)
+        if not capped:
+            self.clock.tick()
+        elif self.strategy is FramePacing.busy_loop:
+            self.clock.tick_busy_loop(self.target_fps)
+        else:
+            self.clock.tick(self.target_fps)
+        now : float = perf_counter()
+
+        if self._last_frame is None:
+            self._last_frame = now
+            return self.period
+        frame_time : float = (now - self._last_frame) * 1000
+        self._last_frame = now
+        self._store_frame(frame_time, (now - wait_start) * 1000, (thread_time() - cpu_start) * 1000)
+        return self.snap(frame_time)
+
+    def poll_until_deadline(self, poll : Callable[[], None], poll_interval : float) -> None:
+        """
+        Waits with the strategy and polls until the frame deadline is one poll interval away, the clock waits the rest
+        :param poll_interval: the interval between two polls (s)
+        """
+        if self._last_frame is None:
+            return
+        deadline : float = self._last_frame + self.period / 1000
+        while deadline - perf_counter() > poll_interval:
+            poll()
+            next_poll : float = min(perf_counter() + poll_interval, deadline - poll_interval)
+            if self.strategy is FramePacing.busy_loop:
+                while perf_counter() < next_poll:
+                    pass
+            else:
+                sleep(max(0.0, next_poll - perf_counter()))
+        poll()
+
+    def snap(self, frame_time : float) -> float:
+        """
+        :return: the delta of the frame, snapped to whole frame periods
+        """
+        self._recent.append(frame_time)
+        period : float = sorted(self._recent)[len(self._recent) // 2]
+        self._residual += frame_time
+        periods : int = round(self._residual / period)
+        if periods >= 1:
+            # Up to the tolerance of the difference is carried over, beyond it the delta catches up
+            carried : float = max(-self.snap_tolerance, min(self.snap_tolerance, self._residual - periods * period))
+            delta : float = self._residual - carried
+        else:
+            delta : float = self._residual
+        self._residual -= delta
+        return delta
+
+    def _store_frame(self, frame_time : float, wait_time : float, wait_cpu_time : float) -> None:
+        self._window[self._window_row] = (frame_time, wait_time, wait_cpu_time)
+        self._window_row = (self._window_row + 1) % len(self._window)
+        self._frame_count += 1
+        if frame_time > self.period * self.missed_deadline_ratio:
+            self.missed_deadlines += 1
+
+    def get_window(self) -> np.ndarray:
+        """
+        :return: the frames of the rolling window, one row per frame: frame time, wait time and wait CPU time (ms)
+        """
+        return self._window[:min(self._frame_count, len(self._window))]
+
+    def get_stats(self) -> dict:
+        """
+        :return: the pacing statistics of the rolling window, ready for JSON
+        """
+        # vsync is paced by the display refresh, not by a frame cap
+        stats : dict = {'strategy' : self.strategy.value,
+                        'frame_cap_fps' : None if self.strategy is FramePacing.vsync else self.target_fps}
+        if self.fallback_reason is not None:
+            stats['fallback_reason'] = self.fallback_reason
+        window : np.ndarray = self.get_window()
+        if len(window) == 0:
+            stats['frames'] = 0
+            return stats
+        frame_times : np.ndarray = window[:, 0]
+        p50, p99 = np.percentile(frame_times, (50, 99)).tolist()
+        wait_time : float = float(window[:, 1].sum())
+        return {**stats,
+                'frames' : self._frame_count,
+                'frames_per_second' : 1000 / float(frame_times.mean()),
+                'frame_time_ms' : {'p50' : p50, 'p99' : p99, 'max' : float(frame_times.max())},
+                'jitter_ms' : float(frame_times.std()),
+                'missed_deadline_ratio' : float(np.count_nonzero(frame_times > self.period * self.missed_deadline_ratio)) / len(window),
+                'missed_deadlines' : self.missed_deadlines,
+                'wait_ms_per_frame' : wait_time / len(window),
+                'wait_cpu_ms_per_frame' : float(window[:, 2].mean()),
+                'wait_cpu_ratio' : float(window[:, 2].sum()) / wait_time if wait_time > 0 else 0.0}
+#endregion
+
+#region Quality
+@dataclass
+class QualityTier:
+    """
+    Render settings traded for frame time
+    """
+    render_scale : float = 1 # Internal render resolution as a fraction of the window size
+    character_sprite_fps : float = configuration.character_sprite_fps # Animation rate of the character
+    parallax_background : bool = True # Scroll the background layers, False for the static background
+
+class QualityGovernor:
+    """
+    Watches the frame work time (the frame time without the frame cap wait) and steps the quality tier down when
+    frames come close to the frame budget, and back up after several windows of frames well within it.
+    """
+
+    def __init__(self, tiers : list[QualityTier], tier : int = configuration.quality_tier, enabled : bool = configuration.quality_governor_enabled,
+                 target_fps : float = configuration.target_FPS, window_frames : int = configuration.quality_window_frames):
+        self.tiers : list[QualityTier] = tiers
+        self.tier : int = min(max(tier, 0), len(tiers) - 1)
+        self.enabled : bool = enabled
+        self.frame_budget : float = 1000 / target_fps # ms
+        self.window_frames : int = window_frames
+        self._work_times : np.ndarray = np.zeros(window_frames)
+        self._frame_count : int = 0
+        self._calm_windows : int = 0
+
+    @property
+    def current(self) -> QualityTier:
+        return self.tiers[self.tier]
+
+    def add_frame(self, work_time : float) -> bool:
+        """
+        :param work_time: the time spent on the frame without waiting for the frame cap (ms)
+        :return: True if the tier changed
+        """
+        if not self.enabled:
+            return False
+        self._work_times[self._frame_count] = work_time
+        self._frame_count += 1
+        if self._frame_count < self.window_frames:
+            return False
+        self._frame_count = 0
+
+        slow_frame_time : float = float(np.percentile(self._work_times, 90))
+        if slow_frame_time > configuration.quality_downgrade_ratio * self.frame_budget and self.tier < len(self.tiers) - 1:
+            self.tier += 1
+            self._calm_windows = 0
+            return True
+        if slow_frame_time < configuration.quality_upgrade_ratio * self.frame_budget and self.tier > 0:
+            self._calm_windows += 1
+            if self._calm_windows >= configuration.quality_upgrade_windows:
+                self.tier -= 1
+                self._calm_windows = 0
+                return True
+        else:
+            self._calm_windows = 0
+        return False
+
+    def reset_window(self) -> None:
+        """
+        Drops the frames measured so far, e.g. after the game was idle
+        """
+        self._frame_count = 0
+#endregion
+
+#region Audio
+class AudioManager:
+    """
+    Sound effects and music. The mixer is opened once with a small buffer, every effect is decoded (or synthesized
+    when it has no file) into a Sound up front, and effects play on a fixed pool of channels. When all channels
+    are busy the effect takes over the channel of the lowest priority effect, the oldest one among equals, unless
+    every playing effect ranks above it. The music is loaded and started on a background thread.
+    """
+
+    # Effect priorities, a higher priority may take over the channel of a lower one
+    effect_priorities : dict = {GameEvent.land : 0, GameEvent.jump : 1, GameEvent.combo : 2, GameEvent.booster : 3,
+                                GameEvent.level_up : 4, GameEvent.game_over : 5}
+
+    # Synthesized effects as (start frequency, end frequency (Hz), duration (s), steps of a pitch sequence, 0 for a sweep)
+    synthesized_effects : dict = {GameEvent.jump : (400, 800, 0.12, 0), GameEvent.land : (180, 90, 0.06, 0),
+                                  GameEvent.combo : (660, 990, 0.15, 2), GameEvent.booster : (500, 1500, 0.3, 0),
+                                  GameEvent.level_up : (523, 1047, 0.36, 4), GameEvent.game_over : (440, 110, 0.6, 0)}
+
+    @staticmethod
+    def pre_init() -> None:
+        """
+        Sets the mixer settings, must be called before pygame.init
+        """
+        mixer.pre_init(frequency=configuration.audio_frequency, size=-16, channels=2, buffer=configuration.audio_buffer_size)
+
+    def __init__(self, enabled : bool = configuration.audio_enabled):
+        """
+        :param enabled: False for a silent manager, audio is also disabled when the mixer cannot be opened
+        """
+        self.enabled : bool = enabled
+        self.sounds : dict = {} # game event -> Sound
+        self.channels : list = []
+        self._channel_priorities : list[int] = []
+        self._channel_starts : list[int] = [] # play counter when each channel started its effect
+        self._play_count : int = 0
+        self._music_thread : threading.Thread = None
+        if not enabled:
+            return
+
+        try:
+            if mixer.get_init() is None:
+                mixer.init()
+            mixer.set_num_channels(configuration.audio_channel_count)
+            self.channels = [mixer.Channel(index) for index in range(configuration.audio_channel_count)]
+            self._channel_priorities = [-1] * len(self.channels)
+            self._channel_starts = [0] * len(self.channels)
+            self.load_effects()
+        except (pygame.error, ValueError):
+            # No audio device, or a mixer layout the sounds cannot be built for, play silently
+            self.enabled = False
+
+    def load_effects(self) -> None:
+        effect_paths : dict = dict(configuration.sound_effect_paths)
+        for game_event in GameEvent:
+            effect_path : str = effect_paths.get(game_event.name)
+            sound : mixer.Sound = mixer.Sound(effect_path) if effect_path is not None else self.synthesize(*self.synthesized_effects[game_event])
+            sound.set_volume(configuration.sound_effect_volume)
+            self.sounds[game_event] = sound
+
+    @staticmethod
+    def synthesize(start_frequency : float, end_frequency : float, duration : float, steps : int) -> mixer.Sound:
+        """
+        :return: a square-ish tone sweeping (or stepping when steps > 0) from the start to the end frequency, faded out
+        """
+        frequency, _, channels = mixer.get_init()
+        sample_count : int = int(frequency * duration)
+        progress : np.ndarray = np.linspace(0, 1, sample_count, endpoint=False)
+        if steps > 0:
+            progress = np.floor(progress * steps) / (steps - 1)
+        pitch : np.ndarray = start_frequency * (end_frequency / start_frequency) ** progress
+        phase : np.ndarray = 2 * np.pi * np.cumsum(pitch) / frequency
+        wave : np.ndarray = np.tanh(3 * np.sin(phase)) * (1 - np.linspace(0, 1, sample_count)) ** 2
+        samples : np.ndarray = (wave * 0.5 * 32767).astype(np.int16)
+        # make_sound expects a 1D array for a mono mixer and one column per channel otherwise
+        if channels > 1:
+            samples = np.ascontiguousarray(np.tile(samples[:, None], (1, channels)))
+        return pygame.sndarray.make_sound(samples)
+
+    def play_effect(self, game_event : GameEvent) -> None:
+        """
+        Plays the effect of the game event on a free channel, or steals the channel of a lower priority effect
+        """
+        if not self.enabled:
+            return
+        priority : int = self.effect_priorities[game_event]
+        index : int = -1
+        for channel_index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                index = channel_index
+                break
+            if self._channel_priorities[channel_index] <= priority and (index == -1 or
+                    (self._channel_priorities[channel_index], self._channel_starts[channel_index]) <
+                    (self._channel_priorities[index], self._channel_starts[index])):
+                index = channel_index
+        if index == -1:
+            return
+
+        self._play_count += 1
+        self.channels[index].play(self.sounds[game_event])
+        self._channel_priorities[index] = priority
+        self._channel_starts[index] = self._play_count
+
+    def start_music(self, music_path : str = configuration.background_music_path) -> None:
+        """
+        Loads and loops the music on a background thread, so decoding does not delay the first frame
+        """
+        if not self.enabled:
+            return
+        self._music_thread = threading.Thread(target=self._load_music, args=(music_path,), daemon=True, name='music')
+        self._music_thread.start()
+
+    @staticmethod
+    def _load_music(music_path : str) -> None:
+        try:
+            mixer.music.load(music_path)
+            mixer.music.play(-1)
+        except pygame.error:
+            pass
+#endregion
+
+#region Input
+class InputPipeline:
+    """
+    Keyboard input of the windowed game. Every frame the whole event queue is drained, held keys are read once
+    the queue is empty and a jump press is buffered for a grace window, so a press shortly before landing,
+    or pressed and released within one frame, still jumps.
+
+    pygame events carry no timestamp: each event is timestamped when it is collected from the queue. The frame
+    pacer collects the events every input_poll_interval while it waits for the frame deadline, so an event that
+    arrives during the wait is timestamped within that interval, one arriving during the frame work when the
+    queue is drained. The input-to-photon latency of each input change is measured from the first key event of
+    the change to the presentation of the first frame showing a simulation state that used the input.
+    """
+
+    # Keys read by the player
+    left_key : int = pygame.K_LEFT
+    right_key : int = pygame.K_RIGHT
+    jump_key : int = pygame.K_SPACE
+
+    def __init__(self, jump_buffer_time : float = configuration.input_jump_buffer_time,
+                 latency_window : int = configuration.input_latency_window):
+        """
+        :param jump_buffer_time: time a jump press is kept until the player can jump (ms), 0 to disable
+        :param latency_window: number of latencies the statistics are computed on
+        """
+        self.jump_buffer_time : float = jump_buffer_time
+        self.player_input : PlayerInput = PlayerInput()
+
+        # perf_counter time until which a jump press is kept (s)
+        self._jump_buffered_until : float = -math.inf
+
+        # Input changes not presented yet as [first event time (s), tick of the state the input was handed to]
+        self._pending_changes : deque = deque()
+        self.latencies : deque = deque(maxlen=latency_window) # ms
+
+        # Events collected from the queue since the last drain, with the perf_counter time they were collected at
+        self._collected : list[tuple] = []
+
+    def collect(self) -> None:
+        """
+        Moves the queued events to the pipeline, timestamped now
+        """
+        collect_time : float = perf_counter()
+        self._collected.extend((e, collect_time) for e in event.get())
+
+    def drain(self) -> list[tuple]:
+        """
+        Empties the event queue and updates the player input
+        :return: each event with the perf_counter time it was collected at, in queue order
+        """
+        self.collect()
+        events : list[tuple] = self._collected
+        self._collected = []
+
+        # First key event of this frame that may change the input
+        first_key_time : float = None
+        for e, event_time in events:
+            if e.type in (pygame.KEYDOWN, pygame.KEYUP) and e.key in (self.left_key, self.right_key, self.jump_key):
+                first_key_time = event_time if first_key_time is None else first_key_time
+                if e.type == pygame.KEYDOWN and e.key == self.jump_key:
+                    self._jump_buffered_until = event_time + self.jump_buffer_time / 1000
+
+        keys : ScancodeWrapper = pygame.key.get_pressed()
+        player_input : PlayerInput = PlayerInput(left=bool(keys[self.left_key]), right=bool(keys[self.right_key]),
+                                                 jump=bool(keys[self.jump_key]) or perf_counter() < self._jump_buffered_until)
+        if player_input != self.player_input and first_key_time is not None:
+            self._pending_changes.append([first_key_time, None])
+        self.player_input = player_input
+        return events
+
+    def consume_jump(self) -> None:
+        """
+        Ends the buffered jump once the player jumped
+        """
+        self._jump_buffered_until = -math.inf
+
+    def handed_over(self, tick : int) -> None:
+        """
+        :param tick: the tick of the simulation state the current input is handed to
+        """
+        for change in self._pending_changes:
+            if change[1] is None:
+                change[1] = tick
+
+    def presented(self, tick : int) -> None:
+        """
+        Records the latency of the input changes used by the presented frame
+        :param tick: the tick of the presented simulation state
+        """
+        now : float = perf_counter()
+        while self._pending_changes and self._pending_changes[0][1] is not None and self._pending_changes[0][1] < tick:
+            self.latencies.append((now - self._pending_changes.popleft()[0]) * 1000)
+
+    def discard_pending(self) -> None:
+        """
+        Drops the unpresented changes, e.g. when the game pauses
+        """
+        self._pending_changes.clear()
+
+    def get_latency_percentiles(self, percentiles : tuple = (50, 99)) -> tuple:
+        """
+        :return: the percentiles of the input-to-photon latency (ms), None before the first measurement
+        """
+        if not self.latencies:
+            return None
+        return tuple(np.percentile(np.array(self.latencies), percentiles).tolist())
+#endregion
+
+#region Capture
+class FrameCapture:
+    """
+    Records the presented frames of the window without changing their timing. The game thread copies each
+    frame through the surface buffer interface into a free buffer of a preallocated ring, a single copy of the
+    window pixels, and a writer thread writes the filled buffers to disk. When the writer falls behind and the
+    ring is full, the frame waits for a buffer rather than being dropped, the waits are counted in the statistics.
+
+    The 'raw' format writes the buffers as is to a single file, 4 bytes per pixel in the window format, to be read
+    with ffmpeg -f rawvideo -pixel_format FORMAT -video_size WIDTHxHEIGHT. An image format writes one numbered image
+    per frame into the output directory. An index JSON file (next to the raw file, in the image directory)
+    holds the frame size and the pixel format. The frames are not evenly spaced, the presentation time of every
+    frame is streamed to a timestamp file as it is written (mkvmerge timestamp format v2), so a long capture
+    does not keep them in memory.
+    """
+
+    def __init__(self, window : surface, output_path : str, output_format : str = configuration.capture_format,
+                 ring_frames : int = configuration.capture_ring_frames,
+                 stats_window : int = configuration.capture_stats_window):
+        """
+        :param window: the window surface, its size and pixel format are fixed for the capture
+        :param output_path: the raw video file, or the directory of the images
+        :param output_format: 'raw', or the extension of the images
+        :param ring_frames: number of preallocated frame buffers
+        :param stats_window: number of recent frames the copy time statistics are computed on
+        """
+        if window.get_bytesize() != 4:
+            raise ValueError(f'Only 32-bit windows can be captured, not {window.get_bitsize()}-bit')
+        self.output_path : str = output_path
+        self.output_format : str = output_format
+        self.size : (int, int) = window.get_size()
+        width, height = self.size
+
+        # Byte of the red, green and blue channels in a pixel of the window format, and the name of the format
+        # in ffmpeg terms (e.g. bgr0) the raw frames are written in without conversion
+        self.channels : list[int] = [shift // 8 if sys.byteorder == 'little' else 3 - shift // 8
+                                     for shift in window.get_shifts()[:3]]
+        pixel_bytes : list[str] = ['0'] * 4
+        for channel, byte in zip('rgb', self.channels):
+            pixel_bytes[byte] = channel
+        self.pixel_format : str = ''.join(pixel_bytes)
+
+        # Frame buffers in the window pixel format, one row of pixels per window row, and their presentation times (ms).
+        # A buffer is either free, or filled and waiting for the writer.
+        self._ring : np.ndarray = np.empty((ring_frames, height, width), np.uint32)
+        self._ring_times : np.ndarray = np.zeros(ring_frames)
+        self._free : deque = deque(range(ring_frames))
+        self._filled : deque = deque()
+        self._condition : threading.Condition = threading.Condition()
+        self._closed : bool = False
+        self._start : float = None
+
+        # Statistics: copy and wait times of the game thread, write time of the writer thread (ms)
+        self.frames_captured : int = 0
+        self.copy_times : deque = deque(maxlen=stats_window)
+        self.stalls : int = 0
+        self.stall_time : float = 0
+        self.frames_written : int = 0
+        self.write_time : float = 0
+        self.bytes_written : int = 0
+        self.error : Exception = None
+
+        # RGB frame of the writer thread, a buffer is converted to it before it is saved as an image
+        self._rgb : np.ndarray = np.empty((height, width, 3), np.uint8)
+
+        if output_format == 'raw':
+            self.index_path : str = output_path + '.json'
+            self.timestamps_path : str = output_path + '.timestamps.txt'
+            self._file = open(output_path, 'wb')
+        else:
+            self.index_path : str = path.join(output_path, 'index.json')
+            self.timestamps_path : str = path.join(output_path, 'timestamps.txt')
+            self._file = None
+            os.makedirs(output_path, exist_ok=True)
+        self._timestamps_file = open(self.timestamps_path, 'w')
+        self._timestamps_file.write('# timestamp format v2\n')
+        self._thread : threading.Thread = threading.Thread(target=self.run, name='capture', daemon=True)
+        self._thread.start()
+
+    def capture(self, window : surface) -> None:
+        """
+        Copies the presented frame into a free buffer of the ring, waiting for one when the ring is full
+        """
+        start : float = perf_counter()
+        if self._start is None:
+            self._start = start
+        with self._condition:
+            if self.error is not None:
+                return
+            if not self._free:
+                self.stalls += 1
+                while not self._free and self.error is None:
+                    self._condition.wait()
+                if self.error is not None:
+                    return
+            slot : int = self._free.popleft()
+        copy_start : float = perf_counter()
+
+        # The window pixels are columns of rows, transposed they are the rows of the buffer and the copy is a memcpy.
+        # The view locks the window until it is released at the end of the statement.
+        np.copyto(self._ring[slot], np.asarray(window.get_view('2')).T)
+        self._ring_times[slot] = (start - self._start) * 1000
+        with self._condition:
+            self._filled.append(slot)
+            self._condition.notify_all()
+        self.frames_captured += 1
+        self.copy_times.append((perf_counter() - copy_start) * 1000)
+        self.stall_time += (copy_start - start) * 1000
+
+    def run(self) -> None:
+        """
+        Writes the filled buffers in order until the capture is closed and the ring is drained
+        """
+        while True:
+            with self._condition:
+                while not self._filled and not self._closed:
+                    self._condition.wait()
+                if not self._filled:
+                    return
+                slot : int = self._filled[0]
+
+            write_start : float = perf_counter()
+            try:
+                self.write_frame(self._ring[slot], self.frames_written)
+            except Exception as error:
+                # The capture stops, the game no longer waits for buffers that would never be freed
+                with self._condition:
+                    self.error = error
+                    self._condition.notify_all()
+                return
+            self.write_time += (perf_counter() - write_start) * 1000
+            self._timestamps_file.write(f'{self._ring_times[slot]:.3f}\n')
+            self.frames_written += 1
+
+            with self._condition:
+                self._filled.popleft()
+                self._free.append(slot)
+                self._condition.notify_all()
+
+    def write_frame(self, frame : np.ndarray, index : int) -> None:
+        """
+        :param frame: a frame buffer in the window pixel format
+        :param index: the number of the frame in the capture
+        """
+        if self._file is not None:
+            # Written as is, the file write releases the GIL so the game thread is not held up
+            self._file.write(frame)
+            self.bytes_written += frame.nbytes
+            return
+        width, height = self.size
+        np.take(frame.view(np.uint8).reshape(height, width, 4), self.channels, axis=2, out=self._rgb)
+        image.save(image.frombuffer(self._rgb, self.size, 'RGB'),
+                   path.join(self.output_path, f'frame_{index:06d}.{self.output_format}'))
+        self.bytes_written += self._rgb.nbytes
+
+    def close(self) -> dict:
+        """
+        Waits for the writer to write the captured frames, then writes the index
+        :return: the capture statistics
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+        self._timestamps_file.close()
+        width, height = self.size
+        with open(self.index_path, 'w') as index_file:
+            json.dump({'format' : self.output_format, 'width' : width, 'height' : height,
+                       'pixel_format' : self.pixel_format if self._file is not None else 'rgb24',
+                       'frames' : self.frames_written, 'timestamps' : path.basename(self.timestamps_path)}, index_file)
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        """
+        :return: the capture statistics, ready for JSON
+        """
+        frames : int = self.frames_written
+        stats : dict = {'frames' : self.frames_captured,
+                        'frames_written' : frames,
+                        'ring_frames' : len(self._ring),
+                        'copy_time_ms' : summarize_times(np.array(self.copy_times)),
+                        'stalls' : self.stalls,
+                        'stall_ms' : self.stall_time,
+                        'write_ms_per_frame' : self.write_time / frames if frames else 0.0,
+                        'bytes_written' : self.bytes_written}
+        if self.error is not None:
+            stats['error'] = str(self.error)
+        return stats
+#endregion
+
 #region Icy Tower Remake
+class GameState(Enum):
+    running = 0
+    paused = 1
+    game_over = 2
+
 
 class IcyTowerRemake():
-    def __init__(self):
-        # Initialize Pygame
+    """
+    The windowed game. While running every frame steps the simulation and renders, while paused or after
+    game over the last frame is kept as a cached surface and the loop blocks on events, only presenting
+    the cached frame again when the window needs it.
+    """
+
+    # Profiled stages of a frame, in frame order
+    frame_stages : tuple = ('frame_wait', 'process_events', 'simulation', 'render_background', 'render_platforms',
+                            'render_player', 'render_score', 'render_overlay', 'present', 'capture')
+
+    # Window events after which the cached frame of the paused and game over screens is presented again
+    redraw_events : tuple = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWSHOWN,
+                             pygame.WINDOWRESTORED, pygame.WINDOWSIZECHANGED)
+
+    def __init__(self, profile : bool = configuration.profiler_enabled, audio : bool = configuration.audio_enabled,
+                 input_provider : Callable[[GameSimulation], PlayerInput] = None, frame_delta : float = None,
+                 seed : int = None, persistent : bool = True, record_path : str = None,
+                 replay : InputRecording = None, time_scale : float = 1,
+                 governor : bool = configuration.quality_governor_enabled, match_client : MatchClient = None,
+                 simulation_thread : bool = configuration.simulation_thread,
+                 pacing : FramePacing = FramePacing(configuration.frame_pacing), capture_path : str = None,
+                 capture_format : str = configuration.capture_format):
+        """
+        :param profile: time the frame stages and show the profiler overlay
+        :param audio: play the background music and the sound effects
+        :param input_provider: scripted input used in place of the keyboard, None to play with the keyboard
+        :param frame_delta: fixed time fed to the simulation each frame without frame cap, None to run in real time
+        :param seed: seed of the tower, None for a random tower
+        :param persistent: load and save the high score, disabled for scripted runs
+        :param record_path: record the input of each session to this file, the sessions after the first to numbered
+                            files next to it (e.g. session-2.rec), None to not record
+        :param replay: a recording played back in place of the keyboard, its seed overrides the seed
+        :param time_scale: multiplies the real frame time, above 1 to replay faster than real time
+        :param governor: adapt the quality tier to the frame times, disabled for fixed workloads
+        :param match_client: a client paired in a head-to-head match, its tower seed overrides the seed
+        :param simulation_thread: step the simulation on its own thread and render from its snapshots
+        :param pacing: the frame pacing strategy
+        :param capture_path: capture the presented frames to this raw video file or image directory, None to not capture
+        :param capture_format: 'raw' or the extension of the captured images
+        """
+        self.persistent : bool = persistent and replay is None and match_client is None
+        self.record_path : str = record_path
+        self.recorded_sessions : int = 0
+        self.replay : InputReplay = None
+        self.time_scale : float = time_scale
+
+        # Initialize Pygame, the mixer settings must be set before
+        if audio:
+            AudioManager.pre_init()
         pygame.init()
 
         # Set the window title
         display.set_caption(configuration.title)
 
-        # Create the window
-        self.window : display = display.set_mode(configuration.window_size)
-
-        # Load background texture
-        self.background_image : surface = image.load(configuration.background_image_path)
-
-        # Init platforms
-        self.platform_manager : PlatformManager = PlatformManager(self.window)
+        # Frame pacing, it creates the window as the vsync strategy needs
+        self.pacer : FramePacer = FramePacer(pacing)
+        self.window : display = self.pacer.open_window(configuration.window_size)
+
+        # Capture of the presented frames, written on its own thread
+        self.capture : FrameCapture = None
+        if capture_path is not None:
+            self.capture = FrameCapture(self.window, capture_path, capture_format)
+
+        # Load the sprites once, they are shared by every session
+        self.atlas : SpriteAtlas = load_sprite_atlas()
+
+        # Load background texture, scrolled in parallax layers or drawn as is
+        self.background_image : surface = load_background_image(self.window.get_size())
+        self.parallax_background : ParallaxBackground = None
+        if configuration.parallax_background:
+            self.parallax_background = build_parallax_background(self.window.get_size(), self.background_image, self.atlas)
+
+        # Init frame renderer
+        self.renderer : FrameRenderer = FrameRenderer(self.window, self.background_image)
+
+        # Quality tiers adapted to the frame times
+        self.quality_governor : QualityGovernor = QualityGovernor([QualityTier(*tier) for tier in configuration.quality_tiers],
+                                                                  enabled=governor)
+
+        # Fixed frame delta without frame cap, None to run in real time
+        self.frame_delta : float = frame_delta
+
+        # Input state of the current frame and the time spent processing the events (ms)
+        self.events_time : float = 0
+        self.input_pipeline : InputPipeline = InputPipeline()
+        self.player_input : PlayerInput = PlayerInput()
+        self.input_provider : Callable[[GameSimulation], PlayerInput] = input_provider
+
+        # Frame profiler
+        self.profiler : FrameProfiler = FrameProfiler(self.frame_stages, enabled=profile)
+        self.profiler_overlay : ProfilerOverlay = ProfilerOverlay(self.profiler, input_pipeline=self.input_pipeline,
+                                                                  pacer=self.pacer)
+
+        # Game state and the last frame presented while not running
+        self.state : GameState = GameState.running
+        self.idle_frame : surface = None
+
+        # Simulation thread of the session and the snapshot of the last rendered frame, None when stepping in the frame.
+        # The player sprite is animated on the render side from the snapshot animation state.
+        self.threaded : bool = simulation_thread
+        self.simulation_thread : SimulationThread = None
+        self.snapshot : SimulationSnapshot = None
+        self.snapshot_animator : PlayerAnimations = PlayerAnimations(atlas=self.atlas) if simulation_thread else None
+
+        # Sound effects, decoded before the first session so none is loaded during play
+        self.audio : AudioManager = AudioManager(enabled=audio)
+
+        # Head-to-head match, the rival is drawn as a translucent ghost of its animation frames
+        self.match_client : MatchClient = match_client
+        self.rival_sprites : dict = {}
+        if match_client is not None:
+            seed = match_client.seed
+            for animation in PlayerAnimationState:
+                sprite : surface = self.atlas.get_frames(animation.value)[0].copy()
+                sprite.set_alpha(configuration.network_ghost_alpha)
+                self.rival_sprites[animation] = sprite
+
+        # Init game core (platforms, player and score)
+        self.simulation : GameSimulation = None
+        self.platform_manager : PlatformManager = None
+        self.player : Player = None
+        if replay is None:
+            self.restart(seed)
+        else:
+            self.start_replay(replay)
+        self.apply_quality(self.quality_governor.current)
 
-        # Init player
-        self.player : Player = Player(self.window, self.platform_manager)
+        # Play the music, loaded in the background
+        self.audio.start_music()
 
-        # Init clock
-        self.clock : Clock = time.Clock()
+        if self.match_client is not None:
+            self.pacer.reset()
+            self.match_client.send_ready()
 
-        # Load an play music
-        mixer.music.load(configuration.background_music_path)
+    def restart(self, seed : int = None) -> None:
+        """
+        Starts a new session on a new tower
+        :param seed: seed of the tower, None for a random tower
+        """
+        if self.simulation is not None:
+            # Save the recording of the finished session once its thread no longer steps it
+            if self.simulation_thread is not None:
+                self.simulation_thread.stop()
+                self.simulation_thread = None
+            self.save_recording()
+        self.simulation = GameSimulation(self.window, seed=seed, atlas=self.atlas, persistent=self.persistent,
+                                         event_listener=self.handle_game_event)
+        self.platform_manager = self.simulation.platform_manager
+        self.player = self.simulation.player
+        self.player.character_animation_controller.character_sprite_fps = self.quality_governor.current.character_sprite_fps
+        self.set_state(GameState.running)
+        if self.record_path is not None:
+            self.simulation.start_recording()
+        self.start_simulation_thread()
+
+    def start_replay(self, recording : InputRecording) -> None:
+        """
+        Restarts on the recorded tower and feeds the recorded input to every simulation step
+        """
+        self.simulation = GameSimulation(self.window, step_delta=recording.step_delta, seed=recording.seed,
+                                         atlas=self.atlas, persistent=False, event_listener=self.handle_game_event)
+        self.platform_manager = self.simulation.platform_manager
+        self.player = self.simulation.player
+        self.player.character_animation_controller.character_sprite_fps = self.quality_governor.current.character_sprite_fps
+        self.replay = InputReplay(recording)
+        self.simulation.input_provider = self.replay
+        self.simulation.tick_limit = recording.tick_count
+        self.set_state(GameState.running)
+        self.start_simulation_thread()
+
+    def start_simulation_thread(self) -> None:
+        """
+        Moves the stepping of the new session to a simulation thread when threaded, a scripted input is then
+        asked on every step of the thread
+        """
+        if self.simulation_thread is not None:
+            self.simulation_thread.stop()
+            self.simulation_thread = None
+        if not self.threaded:
+            return
+        if self.input_provider is not None and self.replay is None:
+            self.simulation.input_provider = self.input_provider
+        self.simulation_thread = SimulationThread(self.simulation, self.time_scale,
+                                                  None if self.match_client is None else self.match_client.send_input)
+        self.snapshot = self.simulation_thread.snapshot
+        self.simulation_thread.start()
+
+    def handle_game_event(self, game_event : GameEvent) -> None:
+        """
+        Plays the sound effect of the event, a jump ends the buffered jump press
+        """
+        self.audio.play_effect(game_event)
+        if game_event is GameEvent.jump:
+            self.input_pipeline.consume_jump()
 
-        # Play the music, the argument -1 makes it loop indefinitely
-        mixer.music.play(-1)
+    def apply_quality(self, tier : QualityTier) -> None:
+        """
+        Applies the internal resolution, animation rate and background of the quality tier
+        """
+        parallax : bool = tier.parallax_background and self.parallax_background is not None
+        self.renderer.background = self.parallax_background.surface if parallax else self.background_image
+        self.renderer.set_scale(tier.render_scale)
+        self.player.character_animation_controller.character_sprite_fps = tier.character_sprite_fps
+        if self.snapshot_animator is not None:
+            self.snapshot_animator.character_sprite_fps = tier.character_sprite_fps
+
+    def save_recording(self) -> None:
+        """
+        Saves the recording of the current session, the first session to record_path and the next ones numbered after it
+        """
+        if self.record_path is None or self.simulation.recording is None:
+            return
+        record_path : str = self.record_path
+        if self.recorded_sessions > 0:
+            root, extension = path.splitext(self.record_path)
+            record_path = f'{root}-{self.recorded_sessions + 1}{extension}'
+        self.simulation.recording.save(record_path, self.simulation.result())
+        self.recorded_sessions += 1
+
+    def set_state(self, state : GameState) -> None:
+        """
+        Switches between running, paused and game over. Leaving the running state keeps the presented
+        frame (with the paused text) as the idle frame, entering it redraws the full window.
+        """
+        if self.simulation_thread is not None:
+            if state is GameState.paused:
+                self.simulation_thread.pause()
+            elif state is GameState.running:
+                self.simulation_thread.resume()
+
+        if state is GameState.running:
+            if self.state is not GameState.running:
+                # Drop the idle time from the next frame delta and timings
+                self.pacer.reset()
+                self.profiler.discard_frame()
+                self.quality_governor.reset_window()
+            self.idle_frame = None
+            self.renderer.request_full_redraw()
+        else:
+            self.input_pipeline.discard_pending()
+            if state is GameState.paused:
+                self.window.blit(self.player.score_controller.hud.render_paused(), configuration.game_over_coordinates)
+                display.flip()
+            self.idle_frame = self.window.copy()
+        self.state = state
 
     def key_down_event(self, e : event) -> bool:
         if e.key == pygame.K_ESCAPE:
             return True
+        elif e.key == pygame.K_F3:
+            self.profiler_overlay.toggle()
+        elif e.key == pygame.K_p and self.state is GameState.running and self.match_client is None:
+            self.set_state(GameState.paused)
+        elif e.key == pygame.K_p and self.state is GameState.paused:
+            self.set_state(GameState.running)
+        elif e.key == pygame.K_RETURN and self.state is GameState.game_over and self.replay is None and self.match_client is None:
+            self.restart()
         else:
             pass
             #player.player_key_down(e)
         return False
 
     def key_press_update(self):
-        # Get all pressed keys
-        all_keys : ScancodeWrapper = pygame.key.get_pressed()
-        self.player.player_key_press(all_keys)
-
-    def Render_Background(self):
-        # Define the blue color
-        #blue_color = (0, 0, 255)
+        if self.replay is not None:
+            # The replay feeds each simulation step
+            self.player_input = None
+            self.input_pipeline.discard_pending()
+            return
 
-        # Fill the window with blue color
-        #self.window.fill(blue_color)
+        if self.input_provider is not None:
+            # A simulation thread asks the scripted input on each step
+            self.player_input = None if self.simulation_thread is not None else self.input_provider(self.simulation)
+            self.input_pipeline.discard_pending()
+            return
 
-        # Draw the background image
-        self.window.blit(self.background_image, (0, 0))
+        # Pressed keys and buffered jump of the drained events
+        self.player_input = self.input_pipeline.player_input
 
-    def Render(self):
-        # Update the FPS
-        delta = self.clock.tick(configuration.target_FPS)
-        if delta == 0:
-            delta = 1 / 60 * 1000
+    def wait_for_frame(self) -> float:
+        """
+        Waits for the frame cap
+        :return: the frame delta fed to the simulation (ms)
+        """
+        if self.frame_delta is None:
+            return self.pacer.wait(poll=self.input_pipeline.collect) * self.time_scale
+        self.pacer.wait(capped=False)
+        return self.frame_delta
 
-        # Render the background
-        self.Render_Background()
+    def Render(self, delta : float = None):
+        """
+        Updates the game core by the frame delta and renders the frame
+        :param delta: the frame delta (ms), None to wait for the frame cap first
+        """
+        if delta is None:
+            delta = self.wait_for_frame()
+        work_start : float = perf_counter()
+
+        # Update the game core in fixed steps, in a match the input is sent first stamped with the next tick.
+        # A simulation thread steps on its own, the frame takes its newest snapshot.
+        if self.simulation_thread is not None:
+            self.simulation_thread.set_input(self.player_input)
+            self.snapshot = self.simulation_thread.snapshot
+            self.input_pipeline.handed_over(self.snapshot.ticks)
+            if self.snapshot.game_over:
+                # The game over screen reads the leaderboard written by the last step
+                self.simulation_thread.join()
+        else:
+            self.input_pipeline.handed_over(self.simulation.ticks)
+        if self.simulation_thread is None and self.match_client is not None:
+            self.match_client.send_input(self.simulation.ticks, self.player_input)
+        if self.match_client is not None:
+            self.match_client.poll()
+        alpha : float = self.simulation.advance(delta, self.player_input) if self.simulation_thread is None else 1
+        self.profiler.mark('simulation')
+        scroll_offset : float = self.platform_manager.scroll_offset if self.snapshot is None else self.snapshot.scroll_offset
+
+        # Move the background bands with the accumulated platform scroll
+        background_dirty : list[Rect] = None
+        if self.renderer.background is not self.background_image:
+            background_dirty = self.parallax_background.update(scroll_offset)
+        self.profiler.mark('render_background')
+
+        # Collect the platforms, then the player and the score panel on top
+        if self.snapshot is None:
+            render_items : list[RenderItem] = self.platform_manager.get_render_items()
+            self.profiler.mark('render_platforms')
+            render_items.extend(self.get_rival_render_items(scroll_offset))
+            render_items.extend(self.player.get_render_items(delta, alpha, include_score=False))
+            self.profiler.mark('render_player')
+            render_items.append(self.player.score_controller.get_render_item())
+        else:
+            render_items : list[RenderItem] = self.get_snapshot_platform_items(self.snapshot)
+            self.profiler.mark('render_platforms')
+            render_items.extend(self.get_rival_render_items(scroll_offset))
+            render_items.extend(self.get_snapshot_player_items(self.snapshot, delta))
+            self.profiler.mark('render_player')
+            render_items.append(RenderItem(self.player.score_controller.hud.render_score_panel(
+                self.snapshot.score, self.snapshot.level, self.snapshot.speed_multiplier), (0, 0), 'score'))
+        self.profiler.mark('render_score')
+        render_items.extend(self.profiler_overlay.get_render_items())
+        self.profiler.mark('render_overlay')
+
+        # Restore the changed regions from the background, redraw them and update the display
+        self.renderer.present(render_items, background_dirty)
+        self.input_pipeline.presented(self.simulation.ticks if self.snapshot is None else self.snapshot.ticks)
+        self.profiler.mark('present')
+        if self.capture is not None:
+            self.capture.capture(self.window)
+        self.profiler.mark('capture')
+
+        # Step the quality with the time the frame took without the frame cap wait
+        if self.quality_governor.add_frame((perf_counter() - work_start) * 1000 + self.events_time):
+            self.apply_quality(self.quality_governor.current)
+
+    def get_snapshot_platform_items(self, snapshot : SimulationSnapshot) -> list[RenderItem]:
+        """
+        :return: a render item per platform of the snapshot
+        """
+        strip_cache : PlatformStripCache = self.platform_manager.strip_cache
+        return [RenderItem(strip_cache.get_strip(width), (x_coord, y_coord), serial)
+                for x_coord, y_coord, width, serial in snapshot.platforms]
 
-        # Render the platforms
-        self.platform_manager.render_platforms()
+    def get_snapshot_player_items(self, snapshot : SimulationSnapshot, delta : float) -> list[RenderItem]:
+        """
+        Advances the sprite animation of the snapshot animation state
+        :return: the interpolated player and the game over text
+        """
+        self.snapshot_animator.change_animation_state(snapshot.animation)
+        if not snapshot.game_over:
+            self.player.character_sprite = self.snapshot_animator.update_player_sprite(delta)
+        items : list[RenderItem] = [RenderItem(self.player.character_sprite,
+                                               snapshot.interpolated_player_position(self.time_scale), 'player')]
+        if snapshot.game_over:
+            items.append(self.player.get_game_over_render_item())
+        return items
+
+    def get_rival_render_items(self, scroll_offset : float) -> list[RenderItem]:
+        """
+        :param scroll_offset: the accumulated platform scroll of the local tower
+        :return: the interpolated rival on the local tower and its score, nothing outside a match
+        """
+        if self.match_client is None:
+            return []
+        rival : NetworkPlayerState = self.match_client.get_player_state(self.match_client.rival_id)
+        if rival is None:
+            return []
+        # The towers are the same, only the scroll differs
+        y_coord : float = rival.y_coord - rival.scroll_offset + scroll_offset
+        return [RenderItem(self.rival_sprites[rival.animation], (rival.x_coord, y_coord), 'rival'),
+                RenderItem(self.player.score_controller.hud.render_rival(rival.score, rival.level, rival.game_over),
+                           configuration.network_rival_coordinates, 'rival_score')]
 
-        # Render the player
-        self.player.render_player(delta)
+    def process_events(self) -> bool:
+        """
+        Handles every queued event, then updates the input of the frame
+        :return: True when the game should quit
+        """
+        events_start : float = perf_counter()
+        quit_game : bool = False
+        for e, _ in self.input_pipeline.drain():
+            if e.type == pygame.KEYDOWN:
+                quit_game = self.key_down_event(e) or quit_game
+            elif e.type == pygame.QUIT:
+                quit_game = True
+        self.key_press_update()
+        self.events_time = (perf_counter() - events_start) * 1000
+        return quit_game
 
-        # Update the display
-        pygame.display.flip()
+    def run_frame(self) -> bool:
+        """
+        Waits for the frame cap, processes the events, then updates and renders one frame.
+        The events are drained after the wait so the input is as recent as possible when the frame is simulated.
+        :return: True when the game should quit
+        """
+        if self.state is not GameState.running:
+            return self.run_idle_frame()
 
-    def process_events(self) -> bool:
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                return self.key_down_event(event)
-            if event.type == pygame.QUIT:
+        self.profiler.start_frame()
+        delta : float = self.wait_for_frame()
+        self.profiler.mark('frame_wait')
+        if self.process_events():
+            return True
+        if self.state is not GameState.running:
+            return False
+        self.profiler.mark('process_events')
+        self.Render(delta)
+
+        # The state of the rendered frame, read from its snapshot when the simulation runs on its own thread
+        ticks, game_over = (self.simulation.ticks, self.simulation.is_game_over) if self.snapshot is None else \
+                           (self.snapshot.ticks, self.snapshot.game_over)
+        if game_over:
+            self.set_state(GameState.game_over)
+        return self.replay is not None and (ticks >= self.simulation.tick_limit or game_over)
+
+    def run_idle_frame(self) -> bool:
+        """
+        Blocks until an event arrives or the idle tick elapses, the simulation does not advance
+        :return: True when the game should quit
+        """
+        events : list = [pygame.event.wait(int(1000 / configuration.idle_tick_rate))] + pygame.event.get()
+        redraw : bool = False
+        for e in events:
+            if e.type == pygame.QUIT:
                 return True
-        self.key_press_update()
+            if e.type == pygame.KEYDOWN and self.key_down_event(e):
+                return True
+            redraw = redraw or e.type in self.redraw_events
+
+        if redraw and self.state is not GameState.running:
+            self.window.blit(self.idle_frame, (0, 0))
+            display.flip()
+        if self.match_client is not None:
+            self.match_client.poll()
         return False
 
     def update(self):
         # Main loop
         while True:
-            if(self.process_events()):
+            if self.run_frame():
+                if self.simulation_thread is not None:
+                    self.simulation_thread.stop()
+                self.profiler.export_csv()
+                if self.profiler.enabled:
+                    print(json.dumps({'input_latency' : summarize_times(np.array(self.input_pipeline.latencies)),
+                                      'frame_pacing' : self.pacer.get_stats()}))
+                if self.capture is not None:
+                    print(json.dumps({'capture' : self.capture.close()}))
+                self.save_recording()
+                if self.replay is not None:
+                    print(f'Replay matches the recording : {replay_matches(self.replay.recording, self.simulation.result())}')
+                if self.match_client is not None:
+                    self.match_client.close()
                 pygame.quit()
                 break
-            self.Render()
 
 #endregion
 
+#region Benchmark
+def summarize_times(times : np.ndarray) -> dict:
+    """
+    :param times: the measured times (ms)
+    :return: mean, percentiles and maximum of the times
+    """
+    if len(times) == 0:
+        return {}
+    p50, p90, p99 = np.percentile(times, (50, 90, 99)).tolist()
+    return {'mean' : float(np.mean(times)), 'p50' : p50, 'p90' : p90, 'p99' : p99, 'max' : float(np.max(times))}
+
+def run_frame_benchmark(video_driver : str = None, frames : int = configuration.benchmark_frames,
+                        warmup_frames : int = configuration.benchmark_warmup_frames,
+                        allocation_frames : int = configuration.benchmark_allocation_frames,
+                        seed : int = configuration.benchmark_seed) -> dict:
+    """
+    Runs the game with the scripted climber input, a fixed frame delta and no frame cap.
+    A new tower with the next seed is started after each game over, so the workload only depends on the seed.
+    :param video_driver: the SDL video driver, e.g. 'dummy', None for the default (windowed) driver
+    :return: frame rate, simulation tick rate, frame and stage times and allocations per frame of each stage
+    """
+    previous_driver : str = os.environ.get('SDL_VIDEODRIVER')
+    if video_driver is not None:
+        os.environ['SDL_VIDEODRIVER'] = video_driver
+    try:
+        game : IcyTowerRemake = IcyTowerRemake(profile=True, audio=False, input_provider=platform_climber_input,
+                                               frame_delta=1000 / configuration.target_FPS, seed=seed, persistent=False,
+                                               governor=False)
+    except pygame.error as error:
+        return {'error' : str(error)}
+    finally:
+        if previous_driver is None:
+            os.environ.pop('SDL_VIDEODRIVER', None)
+        else:
+            os.environ['SDL_VIDEODRIVER'] = previous_driver
+
+    game.profiler_overlay.visible = False
+    sessions : int = 1
+    finished_ticks : int = 0
+
+    def run_frames(count : int) -> None:
+        nonlocal sessions, finished_ticks
+        for _ in range(count):
+            game.run_frame()
+            if game.simulation.is_game_over:
+                finished_ticks += game.simulation.ticks
+                game.restart(seed + sessions)
+                sessions += 1
+
+    try:
+        run_frames(warmup_frames)
+
+        # Timed pass
+        game.profiler = FrameProfiler(IcyTowerRemake.frame_stages, enabled=True, window_size=frames + 1)
+        ticks_before : int = finished_ticks + game.simulation.ticks
+        start_time : float = perf_counter()
+        run_frames(frames)
+        game.profiler.start_frame() # Stores the last frame
+        wall_time : float = perf_counter() - start_time
+        ticks : int = finished_ticks + game.simulation.ticks - ticks_before
+        window : np.ndarray = game.profiler.get_window()
+
+        # Allocation pass
+        game.profiler = FrameProfiler(IcyTowerRemake.frame_stages, enabled=True, track_allocations=True)
+        tracemalloc.start()
+        try:
+            run_frames(allocation_frames)
+        finally:
+            tracemalloc.stop()
+
+        return {'video_driver' : display.get_driver(),
+                'frames' : frames,
+                'wall_time_s' : wall_time,
+                'frames_per_second' : frames / wall_time,
+                'simulation_ticks_per_second' : ticks / wall_time,
+                'frame_time_ms' : summarize_times(window[:, 0]),
+                'stage_time_ms' : {stage : summarize_times(window[:, index + 1])
+                                   for index, stage in enumerate(IcyTowerRemake.frame_stages)},
+                'allocations_per_frame' : game.profiler.get_allocations_per_frame(),
+                'sessions' : sessions}
+    finally:
+        pygame.quit()
+
+def run_simulation_benchmark(ticks : int = configuration.benchmark_frames,
+                             allocation_ticks : int = configuration.benchmark_allocation_frames,
+                             seed : int = configuration.benchmark_seed) -> dict:
+    """
+    Steps the headless simulation with the scripted climber input, a new tower with the next seed is started after each game over
+    :return: tick rate, step times and allocations per tick
+    """
+    simulation : GameSimulation = GameSimulation(seed=seed)
+    profiler : FrameProfiler = FrameProfiler(('input', 'simulation'), enabled=True, window_size=ticks + 1)
+    sessions : int = 1
+
+    def run_ticks(count : int) -> None:
+        nonlocal simulation, sessions
+        for _ in range(count):
+            profiler.start_frame()
+            player_input : PlayerInput = platform_climber_input(simulation)
+            profiler.mark('input')
+            simulation.step(simulation.step_delta, player_input)
+            profiler.mark('simulation')
+            if simulation.is_game_over:
+                simulation = GameSimulation(seed=seed + sessions)
+                sessions += 1
+
+    start_time : float = perf_counter()
+    run_ticks(ticks)
+    profiler.start_frame()
+    wall_time : float = perf_counter() - start_time
+    window : np.ndarray = profiler.get_window()
+
+    profiler = FrameProfiler(('input', 'simulation'), enabled=True, track_allocations=True)
+    tracemalloc.start()
+    try:
+        run_ticks(allocation_ticks)
+    finally:
+        tracemalloc.stop()
+
+    return {'ticks' : ticks,
+            'wall_time_s' : wall_time,
+            'simulation_ticks_per_second' : ticks / wall_time,
+            'tick_time_ms' : summarize_times(window[:, 0]),
+            'stage_time_ms' : {'input' : summarize_times(window[:, 1]), 'simulation' : summarize_times(window[:, 2])},
+            'allocations_per_tick' : profiler.get_allocations_per_frame(),
+            'sessions' : sessions}
+
+def run_pacing_benchmark(strategies : list[FramePacing] = tuple(FramePacing), video_driver : str = None,
+                         frames : int = configuration.frame_pacing_window, seed : int = configuration.benchmark_seed) -> dict:
+    """
+    Plays the climber input in real time with each frame pacing strategy, to pick the strategy of a machine
+    :param video_driver: the SDL video driver, e.g. 'dummy', None for the default (windowed) driver
+    :return: strategy -> the pacing statistics over the frames, ready for JSON
+    """
+    previous_driver : str = os.environ.get('SDL_VIDEODRIVER')
+    if video_driver is not None:
+        os.environ['SDL_VIDEODRIVER'] = video_driver
+    results : dict = {}
+    try:
+        for strategy in strategies:
+            game : IcyTowerRemake = IcyTowerRemake(audio=False, input_provider=platform_climber_input, seed=seed,
+                                                   persistent=False, governor=False, pacing=strategy)
+            game.pacer.reset()
+            sessions : int = 1
+            try:
+                for _ in range(frames + 1):
+                    game.run_frame()
+                    if game.simulation.is_game_over:
+                        game.restart(seed + sessions)
+                        sessions += 1
+                results[strategy.value] = game.pacer.get_stats()
+            finally:
+                pygame.quit()
+    finally:
+        if previous_driver is None:
+            os.environ.pop('SDL_VIDEODRIVER', None)
+        else:
+            os.environ['SDL_VIDEODRIVER'] = previous_driver
+    return results
+
+def run_benchmark(configurations : list[str], frames : int = configuration.benchmark_frames,
+                  seed : int = configuration.benchmark_seed) -> dict:
+    """
+    :param configurations: any of 'windowed' (default SDL video driver), 'dummy' (dummy SDL video driver) and 'headless'
+    :return: the results of each configuration with the build environment, ready for JSON
+    """
+    results : dict = {'seed' : seed,
+                      'frames' : frames,
+                      'python' : sys.version.split()[0],
+                      'pygame' : pygame.version.ver,
+                      'numpy' : np.__version__,
+                      'platform' : sys.platform,
+                      'configurations' : {}}
+    for name in configurations:
+        if name == 'headless':
+            results['configurations'][name] = run_simulation_benchmark(frames, seed=seed)
+        else:
+            results['configurations'][name] = run_frame_benchmark('dummy' if name == 'dummy' else None, frames, seed=seed)
+    return results
+#endregion
+
+#region Evaluation
+def parse_configuration_override(override : str) -> (str, object):
+    """
+    :param override: a configuration override as NAME=VALUE, the value is read as JSON or else kept as text
+    :return: the configuration name and value
+    """
+    name, separator, text = override.partition('=')
+    if not separator or not hasattr(configuration, name):
+        raise ValueError(f'{override} is not a NAME=VALUE override of a configuration setting')
+    try:
+        value : object = json.loads(text)
+    except ValueError:
+        value = text
+    return name, value
+
+def apply_configuration_overrides(overrides : dict) -> None:
+    """
+    Sets configuration values, used as initializer of the evaluation workers so each process
+    runs with the tuned constants. Values derived from an overridden setting are not recomputed.
+    """
+    for name, value in overrides.items():
+        setattr(configuration, name, value)
+
+def evaluate_seed(seed : int, input_provider : Callable[[GameSimulation], PlayerInput] = platform_climber_input,
+                  delta : float = configuration.headless_delta, max_ticks : int = configuration.headless_max_ticks) -> SimulationResult:
+    """
+    Runs one headless session, the task of an evaluation worker
+    """
+    return GameSimulation(seed=seed).run(input_provider, delta=delta, max_ticks=max_ticks)
+
+def evaluate_bot(sessions : int = configuration.headless_sessions,
+                 input_provider : Callable[[GameSimulation], PlayerInput] = platform_climber_input,
+                 seed : int = None, overrides : dict = None, workers : int = configuration.evaluation_workers,
+                 delta : float = configuration.headless_delta, max_ticks : int = configuration.headless_max_ticks) -> dict:
+    """
+    Plays one headless session per seed across a process pool and aggregates the outcomes.
+    The input provider must be picklable, i.e. a module level function or an instance of a module level class.
+    :param sessions: number of sessions, the seeds are consecutive from the first seed
+    :param seed: the first seed, a random one if None (reported for reproduction)
+    :param overrides: configuration values set in every worker, e.g. {'platform_speed' : 0.05}
+    :param workers: number of worker processes, 0 for one per core
+    :return: the aggregated report, ready for JSON
+    """
+    if sessions < 1:
+        raise ValueError(f'At least one session is needed, not {sessions}')
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    overrides = overrides or {}
+    workers = workers or os.cpu_count() or 1
+    batch_size : int = configuration.evaluation_batch_size or max(1, sessions // (8 * workers))
+    seeds : range = range(seed, seed + sessions)
+
+    start_time : float = perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=apply_configuration_overrides, initargs=(overrides,)) as executor:
+        results : list[SimulationResult] = list(executor.map(evaluate_seed, seeds, [input_provider] * sessions,
+                                                             [delta] * sessions, [max_ticks] * sessions, chunksize=batch_size))
+    wall_time : float = perf_counter() - start_time
+    return summarize_evaluation(results, wall_time, seed=seed, overrides=overrides, workers=workers)
+
+def summarize_evaluation(results : list[SimulationResult], wall_time : float, seed : int = None,
+                         overrides : dict = None, workers : int = 1) -> dict:
+    """
+    :return: the distribution of the final score, level reached and ticks survived of the sessions
+    """
+    scores : np.ndarray = np.array([result.score for result in results], dtype=float)
+    levels : np.ndarray = np.array([result.level for result in results], dtype=float)
+    ticks : np.ndarray = np.array([result.ticks for result in results], dtype=float)
+    worst : SimulationResult = min(results, key=lambda result: (result.score, result.ticks))
+    best : SimulationResult = max(results, key=lambda result: (result.score, result.ticks))
+
+    def distribution(values : np.ndarray) -> dict:
+        p10, p50, p90 = np.percentile(values, (10, 50, 90)).tolist()
+        return {'mean' : float(values.mean()), 'std' : float(values.std()), 'min' : float(values.min()),
+                'p10' : p10, 'p50' : p50, 'p90' : p90, 'max' : float(values.max())}
+
+    return {'sessions' : len(results),
+            'first_seed' : seed,
+            'overrides' : overrides or {},
+            'workers' : workers,
+            'game_overs' : sum(result.game_over for result in results),
+            'score' : distribution(scores),
+            'level' : distribution(levels),
+            'ticks' : distribution(ticks),
+            'survival_time_s' : distribution(ticks * configuration.headless_delta / 1000),
+            'best_seed' : best.seed,
+            'worst_seed' : worst.seed,
+            'wall_time_s' : wall_time,
+            'sessions_per_second' : len(results) / wall_time,
+            'ticks_per_second' : float(ticks.sum()) / wall_time}
+#endregion
+
+def print_headless_summary(results : list[SimulationResult], wall_time : float) -> None:
+    scores : np.ndarray = np.array([result.score for result in results])
+    levels : np.ndarray = np.array([result.level for result in results])
+    ticks : int = sum(result.ticks for result in results)
+    print(f'Sessions : {len(results)} - Game overs : {sum(result.game_over for result in results)}')
+    print(f'Score mean : {scores.mean():.1f} - max : {scores.max()} - Level mean : {levels.mean():.2f} - max : {levels.max()}')
+    print(f'Ticks : {ticks} in {wall_time:.2f} s ({ticks / max(wall_time, 1e-9):.0f} ticks/s)')
+
 # Main program loop
 if __name__ == '__main__':
-    game = IcyTowerRemake()
-    game.update()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=configuration.title)
+    parser.add_argument('--headless', action='store_true', help='run simulated sessions without a window, audio or frame cap')
+    parser.add_argument('--sessions', type=int, default=configuration.headless_sessions, help='number of headless sessions')
+    parser.add_argument('--max-ticks', type=int, default=configuration.headless_max_ticks, help='tick limit of each headless session')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the (first) tower')
+    parser.add_argument('--record', default=None, help='record the input of the session to this file')
+    parser.add_argument('--replay', default=None, help='replay a recording, in the window or with --headless')
+    parser.add_argument('--replay-speed', type=float, default=1, help='time scale of a windowed replay')
+    parser.add_argument('--benchmark', nargs='*', choices=('windowed', 'dummy', 'headless'), default=None,
+                        help='run the benchmark configurations (all if none given) and report JSON')
+    parser.add_argument('--benchmark-frames', type=int, default=configuration.benchmark_frames, help='frames of each benchmark pass')
+    parser.add_argument('--benchmark-output', default=configuration.benchmark_output_path, help='JSON file of the benchmark results')
+    parser.add_argument('--evaluate', action='store_true', help='evaluate the climber bot over --sessions seeds in parallel and report JSON')
+    parser.add_argument('--workers', type=int, default=configuration.evaluation_workers, help='evaluation worker processes, 0 for one per core')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', dest='overrides',
+                        help='configuration override of the evaluation workers, repeatable')
+    parser.add_argument('--serve', action='store_true', help='run a head-to-head match server, pairing clients as they connect')
+    parser.add_argument('--connect', action='store_true', help='play a head-to-head match on the server at --host and --port')
+    parser.add_argument('--host', default=configuration.network_host, help='address of the match server')
+    parser.add_argument('--port', type=int, default=configuration.network_port, help='port of the match server')
+    parser.add_argument('--network-benchmark', action='store_true',
+                        help='serve a match of two climber bots on localhost and report the bandwidth and server CPU as JSON')
+    parser.add_argument('--simulation-thread', action='store_true', default=configuration.simulation_thread,
+                        help='step the simulation on its own thread and render from its snapshots')
+    parser.add_argument('--pacing', choices=[strategy.value for strategy in FramePacing], default=configuration.frame_pacing,
+                        help='frame pacing strategy')
+    parser.add_argument('--pacing-benchmark', action='store_true',
+                        help='play the climber bot with each frame pacing strategy and report the pacing statistics as JSON')
+    parser.add_argument('--capture', default=None, metavar='PATH',
+                        help='capture the presented frames to this raw video file, or image directory with --capture-format')
+    parser.add_argument('--capture-format', default=configuration.capture_format,
+                        help="'raw' for video in a single file, or an image extension (png, bmp, tga)")
+    parser.add_argument('--profile', action='store_true', help='time the frame stages, show the overlay (F3) and export them to CSV on exit')
+    parser.add_argument('--profile-csv', default=configuration.profiler_csv_path, help='CSV file of the per-frame timings')
+    args = parser.parse_args()
+    if args.sessions < 1:
+        parser.error('--sessions must be at least 1')
+
+    if args.benchmark is not None:
+        benchmark_results : dict = run_benchmark(args.benchmark or ['windowed', 'dummy', 'headless'], frames=args.benchmark_frames,
+                                                 seed=configuration.benchmark_seed if args.seed is None else args.seed)
+        if args.benchmark_output:
+            with open(args.benchmark_output, 'w') as benchmark_file:
+                json.dump(benchmark_results, benchmark_file, indent=2)
+        else:
+            print(json.dumps(benchmark_results, indent=2))
+    elif args.pacing_benchmark:
+        print(json.dumps(run_pacing_benchmark(seed=configuration.benchmark_seed if args.seed is None else args.seed), indent=2))
+    elif args.evaluate:
+        try:
+            evaluation_overrides : dict = dict(parse_configuration_override(override) for override in args.overrides)
+        except ValueError as error:
+            parser.error(str(error))
+        print(json.dumps(evaluate_bot(args.sessions, seed=args.seed, overrides=evaluation_overrides, workers=args.workers,
+                                      max_ticks=args.max_ticks), indent=2))
+    elif args.serve:
+        server : MatchServer = MatchServer(args.host, args.port, seed=args.seed)
+        print(f'Serving head-to-head matches on {server.address[0]}:{server.address[1]}')
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            server.close()
+        print(json.dumps(server.get_stats(), indent=2))
+    elif args.network_benchmark:
+        print(json.dumps(run_network_benchmark(seed=configuration.benchmark_seed if args.seed is None else args.seed), indent=2))
+    elif args.connect:
+        match_client : MatchClient = MatchClient(args.host, args.port)
+        print('Waiting for an opponent')
+        if not match_client.wait_for_match():
+            sys.exit('The server closed the connection')
+        configuration.profiler_csv_path = args.profile_csv
+        game = IcyTowerRemake(profile=args.profile or configuration.profiler_enabled, record_path=args.record,
+                              match_client=match_client, simulation_thread=args.simulation_thread,
+                              pacing=FramePacing(args.pacing), capture_path=args.capture, capture_format=args.capture_format)
+        game.update()
+    elif args.replay is not None and args.headless:
+        replay_recording : InputRecording = InputRecording.load(args.replay)
+        start_time : float = perf_counter()
+        replay_result : SimulationResult = replay_headless(replay_recording)
+        print_headless_summary([replay_result], perf_counter() - start_time)
+        print(f'Replay matches the recording : {replay_matches(replay_recording, replay_result)}')
+    elif args.headless:
+        start_time : float = perf_counter()
+        headless_results = run_headless_sessions(sessions=args.sessions, max_ticks=args.max_ticks, seed=args.seed)
+        print_headless_summary(headless_results, perf_counter() - start_time)
+    else:
+        configuration.profiler_csv_path = args.profile_csv
+        game = IcyTowerRemake(profile=args.profile or configuration.profiler_enabled, record_path=args.record,
+                              replay=None if args.replay is None else InputRecording.load(args.replay),
+                              time_scale=args.replay_speed if args.replay is not None else 1,
+                              simulation_thread=args.simulation_thread, pacing=FramePacing(args.pacing),
+                              capture_path=args.capture, capture_format=args.capture_format)
+        game.update()
\ No newline at end of file
@@ -0,0 +1,21 @@
+import os
+import sys
+
+# Headless SDL, the tests never open a real window or audio device
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import main
+
+
+@pytest.fixture(autouse=True)
+def restore_configuration():
+    """
+    Restores the configuration settings a test overrides
+    """
+    saved : dict = {name : value for name, value in vars(main.configuration).items() if not name.startswith('__')}
+    yield
+    for name, value in saved.items():
+        setattr(main.configuration, name, value)
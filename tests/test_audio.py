@@ -0,0 +1,19 @@
+import pytest
+from pygame import mixer
+
+from main import AudioManager, GameEvent
+
+
+@pytest.fixture(params=[1, 2, 6])
+def mixer_channels(request) -> int:
+    mixer.quit()
+    mixer.init(frequency=22050, size=-16, channels=request.param)
+    yield request.param
+    mixer.quit()
+
+
+def test_effects_are_synthesized_for_the_mixer_channels(mixer_channels):
+    audio_manager : AudioManager = AudioManager()
+    assert audio_manager.enabled
+    assert set(audio_manager.sounds) == set(GameEvent)
+    assert all(sound.get_length() > 0 for sound in audio_manager.sounds.values())
@@ -0,0 +1,24 @@
+import json
+
+import pygame
+
+from main import FrameCapture
+
+
+def test_capture_streams_timestamps_and_bounds_statistics(tmp_path):
+    window : pygame.Surface = pygame.Surface((8, 6), depth=32)
+    frame_capture : FrameCapture = FrameCapture(window, str(tmp_path / 'capture.raw'), 'raw', ring_frames=2, stats_window=4)
+    for frame in range(10):
+        window.fill((frame, 0, 0))
+        frame_capture.capture(window)
+    stats : dict = frame_capture.close()
+
+    assert stats['frames'] == stats['frames_written'] == 10
+    assert len(frame_capture.copy_times) == 4
+    assert (tmp_path / 'capture.raw').stat().st_size == 10 * 8 * 6 * 4
+    index : dict = json.loads((tmp_path / 'capture.raw.json').read_text())
+    assert index['frames'] == 10
+    timestamps : list = (tmp_path / index['timestamps']).read_text().splitlines()
+    assert timestamps[0] == '# timestamp format v2'
+    times : list = [float(line) for line in timestamps[1:]]
+    assert len(times) == 10 and times == sorted(times)
@@ -0,0 +1,56 @@
+import pytest
+
+from main import GameSimulation, Player, PlayerJumpState
+
+
+@pytest.fixture
+def simulation() -> GameSimulation:
+    return GameSimulation(seed=1)
+
+
+def place_player(player : Player, x_coord : float, y_coord : float, jumping_state : PlayerJumpState) -> None:
+    player.x_coord, player.y_coord = x_coord, y_coord
+    player.player_jumping_state = jumping_state
+    player.tmp_jump_height = 0
+    player.collision_scroll_offset = player.platform_manager.scroll_offset
+
+
+def get_platform(simulation : GameSimulation, index : int = 2) -> (int, tuple):
+    slot : int = simulation.platform_manager.store.active_slots()[index]
+    return slot, simulation.platform_manager.get_platform_bounds(slot)
+
+
+@pytest.mark.parametrize('delta', [60, 120])
+def test_fast_fall_lands_on_the_crossed_platform(simulation, delta):
+    player : Player = simulation.player
+    slot, (left, top, right, bottom) = get_platform(simulation)
+    assert delta > bottom - top
+    place_player(player, left + 5, top - player.player_size[1] - 10, PlayerJumpState.jumping_down)
+    player.allow_jumping = False
+    player.process_player_state(delta)
+    assert player.y_coord + player.player_size[1] == pytest.approx(top)
+    assert player.allow_jumping
+    assert simulation.platform_manager.store.visited[slot]
+
+
+def test_fast_fall_beside_the_platform_passes_it(simulation):
+    player : Player = simulation.player
+    _, (left, top, right, bottom) = get_platform(simulation)
+    if left > player.player_size[0] + 1:
+        x_coord : float = 0
+    else:
+        x_coord : float = right + 1
+    place_player(player, x_coord, top - player.player_size[1] - 10, PlayerJumpState.jumping_down)
+    start_y : float = player.y_coord
+    player.process_player_state(60)
+    assert player.y_coord > start_y + (bottom - top)
+
+
+def test_fast_rise_is_stopped_by_the_platform_bottom(simulation):
+    player : Player = simulation.player
+    _, (left, top, right, bottom) = get_platform(simulation)
+    place_player(player, left + 5, bottom + 10, PlayerJumpState.jumping_up)
+    player.vertical_movement_speed = 1
+    player.process_player_state(60)
+    assert player.y_coord >= bottom
+    assert player.player_jumping_state is PlayerJumpState.jumping_down
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from main import GameEnvironment
+
+
+@pytest.fixture
+def environment() -> GameEnvironment:
+    environment : GameEnvironment = GameEnvironment()
+    environment.reset(seed=1)
+    return environment
+
+
+@pytest.mark.parametrize('action', [-1, 8, 1.5, 1.0, '1', None])
+def test_invalid_action_is_rejected(environment, action):
+    with pytest.raises(ValueError, match='Invalid action'):
+        environment.step(action)
+
+
+@pytest.mark.parametrize('action', [0, 7, np.int64(4)])
+def test_valid_action_steps(environment, action):
+    observation, reward, terminated, truncated, info = environment.step(action)
+    assert observation.shape == environment.observation_shape
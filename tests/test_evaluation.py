@@ -0,0 +1,39 @@
+import pytest
+
+from main import (TowerGenerator, apply_configuration_overrides, evaluate_bot, get_difficulty_profiles,
+                  parse_configuration_override)
+
+
+def generate_widths(seed : int = 7, count : int = 40) -> list:
+    return TowerGenerator(seed).take(count)[1].tolist()
+
+
+@pytest.mark.parametrize('override', ['platform_random_factor=[0.1, 0.15]',
+                                      'difficulty_profiles=[[2, [0.1, 0.15]]]'])
+def test_difficulty_override_changes_the_tower(override):
+    default_widths : list = generate_widths()
+    apply_configuration_overrides(dict([parse_configuration_override(override)]))
+    assert generate_widths() != default_widths
+
+
+def test_platform_random_factor_is_the_first_profile():
+    apply_configuration_overrides({'platform_random_factor' : [0.3, 0.4]})
+    assert get_difficulty_profiles()[0] == (1, (0.3, 0.4))
+
+
+def test_unknown_override_is_rejected():
+    with pytest.raises(ValueError):
+        parse_configuration_override('no_such_setting=1')
+
+
+def test_evaluation_report_reflects_the_override():
+    default_report : dict = evaluate_bot(sessions=2, seed=1, workers=1, max_ticks=5000)
+    override_report : dict = evaluate_bot(sessions=2, seed=1, workers=1, max_ticks=5000,
+                                          overrides={'platform_random_factor' : [0.1, 0.15]})
+    assert override_report['overrides'] == {'platform_random_factor' : [0.1, 0.15]}
+    assert override_report['ticks'] != default_report['ticks']
+
+
+def test_evaluation_needs_a_session():
+    with pytest.raises(ValueError):
+        evaluate_bot(sessions=0)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from main import Leaderboard, configuration
+
+
+@pytest.fixture
+def log_path(tmp_path) -> str:
+    configuration.score_data_file_path = str(tmp_path / 'missing_score_data.txt')
+    return str(tmp_path / 'leaderboard.log')
+
+
+def read_log(log_path : str) -> list:
+    with open(log_path) as log_file:
+        return [json.loads(line)[:2] for line in log_file]
+
+
+def test_scores_are_indexed_by_descending_score(log_path):
+    leaderboard : Leaderboard = Leaderboard(log_path, size=3)
+    for score in (5, 40, 12, 40, 1):
+        leaderboard.record(score, level=score // 10 + 1)
+    leaderboard.flush()
+    assert [entry.score for entry in leaderboard.get_top()] == [40, 40, 12]
+    assert leaderboard.get_personal_best == 40
+    assert [entry.score for entry in Leaderboard(log_path, size=3).get_top()] == [40, 40, 12]
+
+
+def test_log_is_compacted_to_the_best_entries(log_path):
+    leaderboard : Leaderboard = Leaderboard(log_path, size=3, compaction_lines=6)
+    for score in range(1, 6):
+        leaderboard.record(score, level=1)
+    leaderboard.flush()
+    assert len(read_log(log_path)) == 5
+
+    leaderboard.record(6, level=1)
+    leaderboard.flush()
+    assert read_log(log_path) == [[6, 1], [5, 1], [4, 1]]
+
+    leaderboard.record(7, level=2)
+    leaderboard.flush()
+    assert read_log(log_path) == [[6, 1], [5, 1], [4, 1], [7, 2]]
+    assert [entry.score for entry in Leaderboard(log_path, size=3).get_top()] == [7, 6, 5]
+
+
+def test_truncated_log_is_recovered(log_path):
+    leaderboard : Leaderboard = Leaderboard(log_path)
+    for score in (3, 9, 4):
+        leaderboard.record(score, level=1)
+    leaderboard.flush()
+    with open(log_path, 'rb+') as log_file:
+        log_file.truncate(log_file.seek(0, 2) - 5)
+
+    recovered : Leaderboard = Leaderboard(log_path)
+    recovered.flush()
+    assert [entry.score for entry in recovered.get_top()] == [9, 3]
+    assert read_log(log_path) == [[9, 1], [3, 1]]
+
+    recovered.record(8, level=2)
+    recovered.flush()
+    assert [entry.score for entry in Leaderboard(log_path).get_top()] == [9, 8, 3]
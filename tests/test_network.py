@@ -0,0 +1,42 @@
+from main import MatchServer, NetworkPlayerState, PlayerAnimationState, SnapshotCodec, configuration
+
+
+def make_state(frame : int, player_id : int) -> NetworkPlayerState:
+    # Positions on the fixed point grid, so they survive the encoding exactly
+    step : float = 1 / configuration.network_position_scale
+    animations : tuple = tuple(PlayerAnimationState)
+    return NetworkPlayerState(x_coord=100 + 3 * step * frame * (-1) ** player_id, y_coord=400 - 5 * step * frame,
+                              scroll_offset=2 * step * frame, score=frame // 10 + player_id, level=1 + frame // 50,
+                              animation=animations[(frame // 7) % len(animations)], game_over=frame == 99)
+
+
+def test_delta_snapshots_round_trip():
+    encoder : SnapshotCodec = SnapshotCodec()
+    decoder : SnapshotCodec = SnapshotCodec()
+    for frame in range(100):
+        states : dict = {player_id : make_state(frame, player_id) for player_id in (0, 1)}
+        data : bytes = encoder.encode(frame, states)
+        assert data[0] == MatchServer.snapshot_message
+        assert decoder.decode(data) == (frame, states)
+
+
+def test_unchanged_players_only_send_their_header():
+    encoder : SnapshotCodec = SnapshotCodec()
+    states : dict = {0 : make_state(20, 0), 1 : make_state(20, 1)}
+    first : bytes = encoder.encode(0, states)
+    repeated : bytes = encoder.encode(1, states)
+    assert len(repeated) == SnapshotCodec._header.size + 2 * len(states) < len(first)
+
+    decoder : SnapshotCodec = SnapshotCodec()
+    decoder.decode(first)
+    assert decoder.decode(repeated) == (1, states)
+
+
+def test_positions_are_rounded_to_the_fixed_point_grid():
+    encoder : SnapshotCodec = SnapshotCodec()
+    decoder : SnapshotCodec = SnapshotCodec()
+    state : NetworkPlayerState = NetworkPlayerState(x_coord=10.03, y_coord=-4.51, scroll_offset=0.2)
+    _, states = decoder.decode(encoder.encode(0, {3 : state}))
+    for decoded, sent in zip((states[3].x_coord, states[3].y_coord, states[3].scroll_offset),
+                             (state.x_coord, state.y_coord, state.scroll_offset)):
+        assert abs(decoded - sent) <= 0.5 / configuration.network_position_scale
@@ -0,0 +1,22 @@
+from time import perf_counter
+
+from main import FramePacer, FramePacing
+
+
+def time_frames(pacer : FramePacer, frames : int = 10) -> float:
+    start : float = perf_counter()
+    for _ in range(frames):
+        pacer.wait(poll=lambda: None)
+    return (perf_counter() - start) * 1000 / frames
+
+
+def test_vsync_leaves_the_wait_to_the_display_flip():
+    pacer : FramePacer = FramePacer(FramePacing.vsync, target_fps=20)
+    assert time_frames(pacer) < pacer.period / 2
+    assert pacer.get_stats()['frame_cap_fps'] is None
+
+
+def test_sleep_is_capped_at_the_target_rate():
+    pacer : FramePacer = FramePacer(FramePacing.sleep, target_fps=20)
+    assert time_frames(pacer) > pacer.period * 0.8
+    assert pacer.get_stats()['frame_cap_fps'] == 20
@@ -0,0 +1,59 @@
+import pytest
+
+from main import (GameSimulation, InputRecording, PlayerInput, SimulationResult, decode_varint, encode_varint,
+                  platform_climber_input, replay_headless, replay_matches)
+
+
+@pytest.fixture
+def recorded_session() -> (InputRecording, SimulationResult):
+    simulation : GameSimulation = GameSimulation(seed=5)
+    recording : InputRecording = simulation.start_recording()
+    while not simulation.is_game_over and simulation.ticks < 3000:
+        simulation.step(simulation.step_delta, platform_climber_input(simulation))
+    result : SimulationResult = simulation.result()
+    recording.result = result
+    return recording, result
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 2 ** 32 + 5])
+def test_varint_round_trip(value):
+    data : bytearray = bytearray(b'x')
+    encode_varint(value, data)
+    assert decode_varint(bytes(data), 1) == (value, len(data))
+
+
+def test_recording_runs_merge_identical_inputs():
+    recording : InputRecording = InputRecording(seed=1, step_delta=10)
+    for player_input in [PlayerInput(left=True)] * 3 + [PlayerInput(jump=True)] + [PlayerInput(left=True)] * 2:
+        recording.append(player_input)
+    assert recording.runs == [[1, 3], [4, 1], [1, 2]]
+    assert recording.tick_count == 6
+
+
+def test_save_load_round_trip(recorded_session, tmp_path):
+    recording, result = recorded_session
+    file_path : str = str(tmp_path / 'session.rec')
+    recording.save(file_path)
+    loaded : InputRecording = InputRecording.load(file_path)
+    assert (loaded.seed, loaded.step_delta, loaded.runs) == (recording.seed, recording.step_delta, recording.runs)
+    assert list(loaded.iter_inputs()) == list(recording.iter_inputs())
+    assert replay_matches(loaded, result)
+
+
+def test_replay_matches_the_recorded_session(recorded_session):
+    recording, result = recorded_session
+    assert result.ticks == recording.tick_count
+    assert replay_matches(recording, replay_headless(recording))
+
+
+def test_replay_with_changed_input_does_not_match(recorded_session):
+    recording, result = recorded_session
+    recording.runs[0][0] ^= InputRecording.left_bit | InputRecording.right_bit
+    assert not replay_matches(recording, replay_headless(recording))
+
+
+def test_load_rejects_other_files(tmp_path):
+    file_path = tmp_path / 'other.rec'
+    file_path.write_bytes(b'NOPE' + bytes(64))
+    with pytest.raises(ValueError):
+        InputRecording.load(str(file_path))
@@ -0,0 +1,27 @@
+import threading
+
+from main import GameEvent, GameSimulation, PlayerInput, SimulationThread
+
+
+def test_buffered_jump_is_applied_once_per_frame():
+    events : list = []
+    simulation : GameSimulation = GameSimulation(seed=1, persistent=False, event_listener=events.append)
+    recording = simulation.start_recording()
+    simulation.advance(10 * simulation.step_delta, PlayerInput(jump=True))
+    assert simulation.ticks == 10
+    assert [player_input.jump for player_input in recording.iter_inputs()] == [True] + [False] * 9
+    assert events.count(GameEvent.jump) == 1
+
+
+def test_simulation_thread_clears_the_consumed_jump():
+    jumped : threading.Event = threading.Event()
+    simulation : GameSimulation = GameSimulation(seed=1, persistent=False,
+                                                 event_listener=lambda game_event: game_event is GameEvent.jump and jumped.set())
+    simulation_thread : SimulationThread = SimulationThread(simulation, time_scale=10)
+    simulation_thread.set_input(PlayerInput(jump=True))
+    simulation_thread.start()
+    try:
+        assert jumped.wait(5)
+    finally:
+        simulation_thread.stop()
+    assert simulation_thread.player_input == PlayerInput()
@@ -0,0 +1,37 @@
+import numpy as np
+
+from main import TowerGenerator
+
+
+def take_tower(generator : TowerGenerator, count : int = 300) -> tuple:
+    x_coords, widths = generator.take(count)
+    return x_coords.tolist(), widths.tolist()
+
+
+def test_same_seed_generates_the_same_tower():
+    assert take_tower(TowerGenerator(42)) == take_tower(TowerGenerator(42))
+
+
+def test_tower_does_not_depend_on_chunking_or_prefetching():
+    tower : tuple = take_tower(TowerGenerator(42))
+    assert take_tower(TowerGenerator(42, chunk_size=7, lookahead=7)) == tower
+
+    prefetched : TowerGenerator = TowerGenerator(42)
+    while prefetched.prefetch():
+        pass
+    assert take_tower(prefetched) == tower
+
+    platforms : list = [platform for _, platform in zip(range(300), TowerGenerator(42))]
+    assert [x_coord for x_coord, _ in platforms] == tower[0]
+    assert [width for _, width in platforms] == tower[1]
+
+
+def test_different_seeds_generate_different_towers():
+    assert take_tower(TowerGenerator(42)) != take_tower(TowerGenerator(43))
+
+
+def test_platforms_fit_the_window():
+    generator : TowerGenerator = TowerGenerator(42, window_width=500, tile_size=20)
+    x_coords, widths = generator.take(300)
+    assert np.all(x_coords >= 0) and np.all(x_coords + widths <= 500)
+    assert np.all(widths % 20 == 0)